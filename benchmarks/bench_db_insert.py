@@ -0,0 +1,95 @@
+"""
+Benchmark transcript inserts into the summarizer database.
+
+Compares the old one ``execute`` per caption line path with the bulk
+``executemany`` path of ``SummarizeDb`` and the packed single record
+storage on a synthetic transcript, with the database size of each.
+
+    python -m benchmarks.bench_db_insert --lines 10000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import timeit
+
+from youtube_summarizer.database import SummarizeDb
+
+
+def synthetic_transcript(lines: int) -> list[dict]:
+    return [
+        {"text": f"caption line number {i} of the synthetic transcript", "start": i * 2.5,
+         "duration": 2.5}
+        for i in range(lines)
+    ]
+
+
+def legacy_insert(db_file: str, video_id: str, transcript: list[dict]):
+    """The insert path before the bulk writes: default pragmas, one execute and print per line."""
+    cn = sqlite3.connect(db_file)
+    cur = cn.cursor()
+    sql = """
+        INSERT INTO TRANSCRIPT_TEXT(
+            video_id, text_data, start_time, duration
+        ) VALUES (?,?,?,?)
+        """
+    for line in transcript:
+        print(line)
+        cur.execute(sql, (video_id, line["text"], float(line["start"]), float(line["duration"])))
+    cn.commit()
+    cn.close()
+
+
+def bulk_insert(db_file: str, video_id: str, transcript: list[dict]):
+    db = SummarizeDb(db_file)
+    db.insert_transcript(video_id, transcript)
+    db.cn.close()
+
+
+def packed_insert(db_file: str, video_id: str, transcript: list[dict]):
+    db = SummarizeDb(db_file)
+    db.insert_packed_transcript(video_id, transcript)
+    db.cn.close()
+
+
+def database_size(db_file: str) -> int:
+    cn = sqlite3.connect(db_file)
+    cn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    cn.execute("VACUUM")
+    cn.close()
+    return os.path.getsize(db_file)
+
+
+def run(insert, transcript: list[dict], repeat: int) -> tuple[float, int]:
+    best = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_file = os.path.join(tmp_dir, "bench.db")
+            with contextlib.redirect_stdout(io.StringIO()):
+                SummarizeDb.init_db(db_file, "schema.sql")
+                empty_size = database_size(db_file)
+                start_time = timeit.default_timer()
+                insert(db_file, "bench", transcript)
+                elapsed = timeit.default_timer() - start_time
+            size = database_size(db_file) - empty_size
+        best = elapsed if best is None else min(best, elapsed)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    transcript = synthetic_transcript(args.lines)
+    for name, insert in (("before", legacy_insert), ("after", bulk_insert), ("packed", packed_insert)):
+        elapsed, size = run(insert, transcript, args.repeat)
+        print(f"{name:>6}: {args.lines / elapsed:>12,.0f} rows/s ({elapsed * 1000:.1f} ms, "
+              f"{size / 1024:,.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark the export of a large LLM_METRICS table.
+
+Fills a temporary database with synthetic metric rows, then exports them
+to every available format and reports the rows per second and, from a
+second traced run, the peak Python memory, which stays at about one batch
+whatever the row count.
+
+    python -m benchmarks.bench_export --rows 500000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+from youtube_summarizer.export import FORMATS, export
+from youtube_summarizer.telemetry import LlmMetrics
+
+
+def fill(db_file: str, rows: int):
+    LlmMetrics(db_file).cn.close()
+    rng = random.Random(0)
+    now = time.time()
+    cn = sqlite3.connect(db_file)
+    with cn:
+        cn.executemany(
+            """
+            INSERT INTO LLM_METRICS(
+                model, source, video_id, chunk_chars, total_duration, load_duration,
+                prompt_eval_count, prompt_eval_duration, eval_count, eval_duration,
+                ttft_seconds, wall_seconds, created
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (
+                    rng.choice(("llama3.1", "mistral-openorca")), "summarise_async",
+                    f"video{i % 5000}", rng.randint(1000, 40000), rng.randint(10**9, 10**11),
+                    0, rng.randint(100, 8000), rng.randint(10**8, 10**10), rng.randint(50, 800),
+                    rng.randint(10**9, 10**11), rng.random(), rng.random() * 60,
+                    now - rng.random() * 86400 * 30,
+                )
+                for i in range(rows)
+            ),
+        )
+    cn.close()
+
+
+def run_export(db_file: str, fmt: str, path: str, batch_size: int) -> tuple:
+    cn = sqlite3.connect(db_file)
+    try:
+        start_time = timeit.default_timer()
+        if fmt == "parquet":
+            count = export("metrics", fmt, path, cn, batch_size)
+        else:
+            with open(path, "w", encoding="utf-8") as out:
+                count = export("metrics", fmt, out, cn, batch_size)
+        return count, timeit.default_timer() - start_time
+    finally:
+        cn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, "bench.db")
+        fill(db_file, args.rows)
+        print(f"{'format':<10} {'seconds':>8} {'rows/s':>10} {'peak MiB':>9}")
+        for fmt in FORMATS:
+            path = os.path.join(tmp_dir, f"metrics.{fmt}")
+            try:
+                count, elapsed = run_export(db_file, fmt, path, args.batch_size)
+            except RuntimeError as e:
+                print(f"{fmt:<10} skipped: {e}")
+                continue
+            tracemalloc.start()
+            run_export(db_file, fmt, path, args.batch_size)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{fmt:<10} {elapsed:>8.2f} {count / elapsed:>10.0f} {peak / 2**20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark the watch page extractors of ``VideoInfo``.
+
+Runs the BeautifulSoup extractor and the targeted ``fast`` extractor over
+saved watch pages and reports CPU time and peak memory of each. Without
+arguments it runs over the pages saved under tests/fixtures/watch_pages
+and a synthetic page the size of a real one.
+
+    python -m benchmarks.bench_extract saved/*.html
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import asdict
+
+from youtube_summarizer.video_info import VideoInfo
+
+WATCH_PAGES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tests", "fixtures", "watch_pages"
+)
+
+
+def synthetic_watch_page(video_id: str = "bench", padding_kb: int = 1024,
+                         like_label: str = "12,345 likes", dislike_label: str = "678 dislikes",
+                         dislike_first: bool = False) -> bytes:
+    """A watch page with the microdata and ytInitialData layout YouTube serves."""
+    buttons = [
+        {"toggleButtonRenderer": {
+            "defaultIcon": {"iconType": icon},
+            "defaultText": {"accessibility": {"accessibilityData": {"label": label}}},
+        }}
+        for icon, label in (("LIKE", like_label), ("DISLIKE", dislike_label))
+    ]
+    if dislike_first:
+        buttons.reverse()
+    initial_data = {
+        "contents": {"twoColumnWatchNextResults": {"results": {"results": {"contents": [
+            {"videoPrimaryInfoRenderer": {"videoActions": {"menuRenderer": {
+                "topLevelButtons": buttons,
+            }}}},
+        ]}}}},
+        "padding": ["x" * 100 for _ in range(padding_kb * 5)],
+    }
+    filler = "".join(
+        f'<div class="filler"><span>row {i}</span><a href="/watch?v={i}">link</a></div>'
+        for i in range(padding_kb * 8)
+    )
+    page = f"""<!DOCTYPE html><html><head><title>Bench</title>
+<script>var ytcfg = {{}};</script></head><body>{filler}
+<div id="watch7-content" class="watch-main-col" itemscope itemid="" itemtype="http://schema.org/VideoObject">
+<meta itemprop="name" content="Benchmark &amp; video">
+<meta itemprop="description" content="A synthetic watch page">
+<meta itemprop="paid" content="False">
+<meta itemprop="channelId" content="UCbench">
+<meta itemprop="videoId" content="{video_id}">
+<meta itemprop="duration" content="PT1H2M3S">
+<meta itemprop="unlisted" content="False">
+<span itemprop="author" itemscope itemtype="http://schema.org/Person">
+<link itemprop="url" href="http://www.youtube.com/@bench"><link itemprop="name" content="Bench Channel">
+</span>
+<link itemprop="thumbnailUrl" href="https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg">
+<meta itemprop="isFamilyFriendly" content="true">
+<meta itemprop="regionsAllowed" content="US,GB">
+<meta itemprop="interactionCount" content="987654">
+<meta itemprop="datePublished" content="2024-01-01">
+<meta itemprop="genre" content="Education">
+</div>
+<script nonce="n">var ytInitialData = {json.dumps(initial_data)};</script>
+</body></html>"""
+    return page.encode("utf-8")
+
+
+def measure(extractor: str, video_id: str, html: bytes, repeat: int):
+    tracemalloc.start()
+    start_time = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            info = VideoInfo.from_html(video_id, html, extractor=extractor)
+    cpu_time = (time.process_time() - start_time) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return info.video_data, cpu_time, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("fixtures", nargs="*", help="Saved watch page html files.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = args.fixtures or sorted(glob.glob(os.path.join(WATCH_PAGES_DIR, "*.html")))
+    pages = [
+        (os.path.splitext(os.path.basename(path))[0], open(path, "rb").read())
+        for path in paths
+    ]
+    if not args.fixtures:
+        pages.append(("synthetic", synthetic_watch_page()))
+
+    results = []
+    for video_id, html in pages:
+        row = {"fixture": video_id, "size_kb": len(html) // 1024}
+        data = {}
+        for extractor in ("soup", "fast"):
+            data[extractor], cpu_time, peak = measure(extractor, video_id, html, args.repeat)
+            row[f"{extractor}_cpu_ms"] = round(cpu_time * 1000, 2)
+            row[f"{extractor}_peak_kb"] = peak // 1024
+        row["same_result"] = asdict(data["soup"]) == asdict(data["fast"])
+        results.append(row)
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
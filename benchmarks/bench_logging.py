@@ -0,0 +1,72 @@
+"""
+Benchmark the cost of a log call on the logging thread.
+
+Compares a handler that inserts and commits every record on the calling
+thread, like the old ``DatabaseHandler``, with the queue handler and
+batching listener of ``configure_logging``.
+
+    python -m benchmarks.bench_logging --records 20000
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import tempfile
+import timeit
+
+from youtube_summarizer.logging_config import LOGGER_NAME, configure_logging
+
+
+class CommitPerRecordHandler(logging.Handler):
+    """The logging path before the queue: one insert and commit per record."""
+
+    def __init__(self, db_file: str):
+        super().__init__()
+        self.cn = sqlite3.connect(db_file)
+        self.cn.execute("CREATE TABLE IF NOT EXISTS logs (created TEXT, lvl INTEGER, msg TEXT)")
+
+    def emit(self, record):
+        self.cn.execute(
+            "INSERT INTO logs VALUES (?,?,?)",
+            (record.created, record.levelno, record.getMessage()),
+        )
+        self.cn.commit()
+
+
+def log_records(logger: logging.Logger, records: int) -> float:
+    start_time = timeit.default_timer()
+    for i in range(records):
+        logger.debug("Chunk %d: %d sentences, %d tokens", i, 12, 480)
+    return timeit.default_timer() - start_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        logger = logging.getLogger(f"{LOGGER_NAME}.bench_before")
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(CommitPerRecordHandler(os.path.join(tmp_dir, "before.db")))
+        before = log_records(logger, args.records)
+
+        db_file = os.path.join(tmp_dir, "after.db")
+        listener = configure_logging(
+            level=logging.DEBUG, db_file=db_file, queue_size=args.records + 1
+        )
+        after = log_records(logging.getLogger(f"{LOGGER_NAME}.bench_after"), args.records)
+        drain_start = timeit.default_timer()
+        listener.stop()
+        drain = timeit.default_timer() - drain_start
+        with sqlite3.connect(db_file) as cn:
+            written = cn.execute("SELECT COUNT(*) FROM LOG").fetchone()[0]
+
+    print(f"before: {before / args.records * 1e6:8.1f} us per record")
+    print(f" after: {after / args.records * 1e6:8.1f} us per record "
+          f"({written} written, background drain {drain * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark the adaptive limits of the Ollama calls against a fake server
+that serves a few generations at a time, queues a few more and answers 503
+beyond that, and fails some calls at random.
+
+Many threads send chat requests with responses from a few to a few
+hundred tokens long, first straight to the server and then through a
+``HostController`` judging congestion by the latency of the calls and by
+how long they waited for the model, as ``ollama_controller`` does. The
+controller retries the failures and finds the concurrency the server
+sustains; judged by latency, the long responses read as congestion.
+
+    python -m benchmarks.bench_ratelimit --requests 200 --threads 32 --parallel 4
+"""
+import argparse
+import random
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+import ollama
+
+from benchmarks.fake_ollama import FakeOllama
+from youtube_summarizer.ratelimit import (
+    OLLAMA_QUEUE_SLACK_SECONDS,
+    HostController,
+    host_of,
+    ollama_queue_seconds,
+)
+
+RESPONSE_TOKENS = (5, 50, 250)
+
+
+def run(fake: FakeOllama, requests: int, threads: int, controller: HostController = None):
+    client = ollama.Client(host=fake.url)
+    rng = random.Random(0)
+    lengths = [rng.choice(RESPONSE_TOKENS) for _ in range(requests)]
+
+    def call(tokens: int):
+        messages = [{"role": "user", "content": "Summarise this."}]
+        options = {"num_predict": tokens}
+        try:
+            if controller is None:
+                client.chat("mistral-openorca", messages, options=options)
+            else:
+                controller.call(client.chat, "mistral-openorca", messages, options=options)
+        except ollama.ResponseError:
+            return False
+        return True
+
+    start_time = timeit.default_timer()
+    with ThreadPoolExecutor(threads) as pool:
+        succeeded = sum(pool.map(call, lengths))
+    return timeit.default_timer() - start_time, succeeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=4)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with FakeOllama(latency=0.01, tokens_per_second=500, parallel=args.parallel,
+                    max_queue=args.max_queue, error_rate=args.error_rate) as fake:
+        print(f"{'':>12} {'seconds':>8} {'ok':>5} {'failed':>7} {'rejected':>9} {'limit':>6}")
+        for name in ("direct", "latency", "queue delay"):
+            controller = None
+            if name == "latency":
+                controller = HostController(host_of(fake.url), backoff_seconds=0.05, attempts=6,
+                                            failure_threshold=1000)
+            elif name == "queue delay":
+                controller = HostController(host_of(fake.url), backoff_seconds=0.05, attempts=6,
+                                            failure_threshold=1000,
+                                            delay_of=ollama_queue_seconds,
+                                            slack_seconds=OLLAMA_QUEUE_SLACK_SECONDS)
+            rejected = sum(fake.rejected.values())
+            elapsed, succeeded = run(fake, args.requests, args.threads, controller)
+            rejected = sum(fake.rejected.values()) - rejected
+            limit = f"{controller.limiter.limit:.1f}" if controller else "-"
+            print(f"{name:>12} {elapsed:>8.2f} {succeeded:>5} "
+                  f"{args.requests - succeeded:>7} {rejected:>9} {limit:>6}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark the model affinity scheduler against a fake Ollama server that
+can hold a single model and pays a load delay on every swap.
+
+Threads send interleaved requests for two models, first straight to the
+server and then through a ``ModelScheduler``.
+
+    python -m benchmarks.bench_scheduler --requests 40 --load-seconds 0.2
+"""
+import argparse
+import itertools
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+import ollama
+
+from benchmarks.fake_ollama import FakeOllama
+from youtube_summarizer.scheduler import ModelScheduler
+
+MODELS = ("mistral-openorca", "llama3.1")
+
+
+def run(fake: FakeOllama, requests: int, threads: int, scheduler: ModelScheduler = None):
+    client = ollama.Client(host=fake.url)
+    swaps_before = fake.model_swaps
+
+    def call(model: str):
+        with scheduler.slot(model, "bench") if scheduler else nullcontext() as slot:
+            response = client.chat(model, [{"role": "user", "content": "Summarise this."}])
+            if slot is not None:
+                slot.observe(response)
+
+    start_time = timeit.default_timer()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(call, itertools.islice(itertools.cycle(MODELS), requests)))
+    return timeit.default_timer() - start_time, fake.model_swaps - swaps_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--load-seconds", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with FakeOllama(latency=0.01, load_seconds=args.load_seconds) as fake:
+        elapsed, swaps = run(fake, args.requests, args.threads)
+        print(f"  arrival order: {elapsed:6.2f}s, {swaps} model swaps")
+        scheduler = ModelScheduler(parallel=args.threads, max_loaded_models=1)
+        elapsed, swaps = run(fake, args.requests, args.threads, scheduler)
+        print(f"      scheduled: {elapsed:6.2f}s, {swaps} model swaps")
+        print(scheduler.report())
+
+
+if __name__ == "__main__":
+    main()
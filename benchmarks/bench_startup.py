@@ -0,0 +1,70 @@
+"""
+Benchmark the cold start time of every CLI command.
+
+Each command is started with ``--help`` in a fresh interpreter, the best
+wall time over the runs is kept, and one extra run with ``-X importtime``
+reports the total import time and the slowest top level imports. Prints
+one JSON object per command, so results can be compared across commits.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+
+from youtube_summarizer import cli
+
+RUNNER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "runner.py")
+
+
+def wall_time(args: list[str], runs: int) -> float:
+    best = None
+    for _ in range(runs):
+        start_time = timeit.default_timer()
+        subprocess.run([sys.executable, RUNNER] + args, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = timeit.default_timer() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def import_times(args: list[str]) -> list[tuple[str, int]]:
+    """Cumulative import time in microseconds of the top level imports."""
+    result = subprocess.run([sys.executable, "-X", "importtime", RUNNER] + args,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            times.append((name.strip(), int(cumulative)))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("commands", nargs="*", help="Commands to time, all by default.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    for command in args.commands or sorted(cli.commands):
+        command_args = [command, "--help"]
+        times = import_times(command_args)
+        print(json.dumps({
+            "command": command,
+            "wall_ms": round(wall_time(command_args, args.runs) * 1000, 1),
+            "import_ms": round(sum(cumulative for _, cumulative in times) / 1000, 1),
+            "slowest_imports": [
+                [name, round(cumulative / 1000, 1)]
+                for name, cumulative in sorted(times, key=lambda t: -t[1])[:args.top]
+            ],
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+A local stand-in for the Ollama HTTP API.
+
+Serves ``/api/chat``, ``/api/generate``, ``/api/embeddings``, ``/api/tags``
+and ``/api/show`` with a configurable latency and token rate and reports the
+same timing fields as Ollama, so the summarizer can be benchmarked without
+a model. It can also inject the failures of a loaded server: a bounded
+number of parallel generations with a bounded queue, a rate limit and
+random errors. Can also be run on its own:
+
+    python -m benchmarks.fake_ollama --port 11434 --latency 0.2 --tokens-per-second 50
+    python -m benchmarks.fake_ollama --parallel 4 --max-queue 4 --error-rate 0.05
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllama:
+    """
+    :param latency: Seconds before the first token of every response.
+    :param tokens_per_second: Generation rate of the response tokens.
+    :param response_tokens: Number of tokens in a response without ``num_predict``.
+    :param load_seconds: Extra delay reported as ``load_duration`` when the
+        requested model differs from the loaded one. Like Ollama with a
+        single loaded model, requests are admitted in arrival order and a
+        swap waits for the requests in flight.
+    :param context_length: Context window reported by ``/api/show``.
+    :param parallel: Generations served at a time, the others wait, like
+        ``OLLAMA_NUM_PARALLEL``. Unlimited by default.
+    :param max_queue: Generations allowed to wait for ``parallel``, beyond
+        that the server answers 503 like ``OLLAMA_MAX_QUEUE``.
+    :param rate_limit: Generations accepted a second, beyond that the
+        server answers 429 with a ``Retry-After`` header.
+    :param error_rate: Share of the generations failed with a 500.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.05,
+                 tokens_per_second: float = 500.0, response_tokens: int = 50,
+                 load_seconds: float = 0.0, context_length: int = 32768,
+                 embedding_dim: int = 64, parallel: int = None, max_queue: int = None,
+                 rate_limit: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.load_seconds = load_seconds
+        self.context_length = context_length
+        self.embedding_dim = embedding_dim
+        self.parallel = parallel
+        self.max_queue = max_queue
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.rejected = {429: 0, 500: 0, 503: 0}
+        self._random = random.Random(seed)
+        self._slots = threading.Semaphore(parallel) if parallel else None
+        self._active = 0
+        self._rate_tokens = rate_limit
+        self._rate_updated = time.monotonic()
+        self.requests = 0
+        self.model_swaps = 0
+        self._loaded_model = None
+        self._in_flight = 0
+        self._loading = False
+        self._tickets = 0
+        self._serving = 0
+        self._lock = threading.Condition()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeOllama":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _admit(self):
+        """
+        Decide whether a generation fails.
+
+        :return: ``(status, error)`` of the failure, or None when the
+            generation is admitted and must be finished with ``_done``.
+        """
+        with self._lock:
+            if self.rate_limit:
+                now = time.monotonic()
+                self._rate_tokens = min(
+                    self.rate_limit, self._rate_tokens + (now - self._rate_updated) * self.rate_limit
+                )
+                self._rate_updated = now
+                if self._rate_tokens < 1:
+                    self.rejected[429] += 1
+                    return 429, "rate limit exceeded"
+                self._rate_tokens -= 1
+            if (self.parallel and self.max_queue is not None
+                    and self._active >= self.parallel + self.max_queue):
+                self.rejected[503] += 1
+                return 503, "server busy, please try again.  maximum pending requests exceeded"
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.rejected[500] += 1
+                return 500, "injected failure"
+            self._active += 1
+        return None
+
+    def _done(self):
+        with self._lock:
+            self._active -= 1
+
+    def _load(self, model: str) -> float:
+        """Wait until ``model`` is loaded and count the request in flight."""
+        with self._lock:
+            self.requests += 1
+            ticket = self._tickets
+            self._tickets += 1
+            while (ticket != self._serving or self._loading
+                   or (self._loaded_model != model and self._in_flight)):
+                self._lock.wait()
+            self._serving += 1
+            self._in_flight += 1
+            self._lock.notify_all()
+            if model == self._loaded_model:
+                return 0.0
+            if self._loaded_model is not None:
+                self.model_swaps += 1
+            self._loaded_model = model
+            self._loading = True
+        time.sleep(self.load_seconds)
+        with self._lock:
+            self._loading = False
+            self._lock.notify_all()
+        return self.load_seconds
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._lock.notify_all()
+
+    def _metrics(self, prompt: str, load: float, elapsed: float, response_tokens: int) -> dict:
+        prompt_tokens = max(1, len(prompt) // 4)
+        eval_seconds = response_tokens / self.tokens_per_second
+        return {
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int(elapsed * 1e9),
+            "load_duration": int(load * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(self.latency * 1e9),
+            "eval_count": response_tokens,
+            "eval_duration": int(eval_seconds * 1e9),
+        }
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, body: dict, status: int = 200, headers: dict = None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/":
+                    data = b"Ollama is running"
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                elif self.path == "/api/tags":
+                    self._send_json({"models": []})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path in ("/api/chat", "/api/generate"):
+                    failure = fake._admit()
+                    if failure is not None:
+                        status, error = failure
+                        headers = {"Retry-After": "1"} if status == 429 else None
+                        self._send_json({"error": error}, status, headers)
+                        return
+                    try:
+                        self._generate(body, chat=self.path == "/api/chat")
+                    finally:
+                        fake._done()
+                elif self.path in ("/api/embeddings", "/api/embed"):
+                    self._embed(body)
+                elif self.path == "/api/show":
+                    self._send_json({
+                        "modelfile": "",
+                        "parameters": "",
+                        "details": {"family": "fake"},
+                        "model_info": {"fake.context_length": fake.context_length},
+                    })
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def _generate(self, body: dict, chat: bool):
+                start_time = time.monotonic()
+                model = body.get("model", "")
+                if chat:
+                    prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+                else:
+                    prompt = body.get("prompt", "")
+                load = fake._load(model)
+                try:
+                    if fake._slots is None:
+                        self._respond(body, chat, model, prompt, load, start_time)
+                    else:
+                        with fake._slots:
+                            self._respond(body, chat, model, prompt, load, start_time)
+                finally:
+                    fake._release()
+
+            def _respond(self, body: dict, chat: bool, model: str, prompt: str, load: float,
+                         start_time: float):
+                time.sleep(fake.latency)
+                # ``num_predict`` sets the length of the response, like a token limit.
+                tokens = (body.get("options") or {}).get("num_predict") or fake.response_tokens
+                words = [f"w{i} " for i in range(tokens)]
+                created_at = datetime.now(timezone.utc).isoformat()
+
+                def part(text: str) -> dict:
+                    if chat:
+                        return {"model": model, "created_at": created_at,
+                                "message": {"role": "assistant", "content": text}, "done": False}
+                    return {"model": model, "created_at": created_at, "response": text,
+                            "done": False}
+
+                if body.get("stream", True):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for word in words:
+                        time.sleep(1 / fake.tokens_per_second)
+                        self._write_chunk(part(word))
+                    final = part("")
+                    final.update(
+                        fake._metrics(prompt, load, time.monotonic() - start_time, tokens)
+                    )
+                    self._write_chunk(final)
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    time.sleep(tokens / fake.tokens_per_second)
+                    response = part("".join(words))
+                    response.update(
+                        fake._metrics(prompt, load, time.monotonic() - start_time, tokens)
+                    )
+                    self._send_json(response)
+
+            def _write_chunk(self, body: dict):
+                data = json.dumps(body).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _embed(self, body: dict):
+                texts = body.get("input", body.get("prompt", ""))
+                single = isinstance(texts, str)
+                vectors = [fake.embedding(text) for text in ([texts] if single else texts)]
+                time.sleep(fake.latency)
+                if self.path == "/api/embeddings":
+                    self._send_json({"embedding": vectors[0]})
+                else:
+                    self._send_json({"model": body.get("model", ""), "embeddings": vectors})
+
+        return Handler
+
+    def embedding(self, text: str) -> list[float]:
+        """A deterministic bag of words vector, so similar texts get similar vectors."""
+        vector = [0.0] * self.embedding_dim
+        for word in text.lower().split():
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.embedding_dim] += 1.0
+        return vector
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=500.0)
+    parser.add_argument("--response-tokens", type=int, default=50)
+    parser.add_argument("--load-seconds", type=float, default=0.0)
+    parser.add_argument("--parallel", type=int, default=None)
+    parser.add_argument("--max-queue", type=int, default=None)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeOllama(args.host, args.port, args.latency, args.tokens_per_second,
+                      args.response_tokens, args.load_seconds, parallel=args.parallel,
+                      max_queue=args.max_queue, rate_limit=args.rate_limit,
+                      error_rate=args.error_rate)
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Deterministic synthetic transcripts for the benchmarks.
+
+The segments have the shape ``get_transcript()`` returns, about 2.5 seconds
+of speech each at roughly 150 words a minute.
+"""
+import os
+import random
+
+SIZES = {"10min": 10, "1h": 60, "10h": 600}
+
+WORDS = (
+    "the model summary video transcript people really think going know right "
+    "actually data point because system important question different example "
+    "work time way learn build interesting problem answer make going look "
+    "thing network training language understand result case kind idea"
+).split()
+
+
+def synthetic_transcript(minutes: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    segments = []
+    start = 0.0
+    sentence_length = 0
+    while start < minutes * 60:
+        duration = round(rng.uniform(1.5, 3.5), 2)
+        words = [rng.choice(WORDS) for _ in range(max(1, int(duration * 2.5)))]
+        sentence_length += len(words)
+        if sentence_length > rng.randint(12, 30):
+            words[-1] += "."
+            sentence_length = 0
+        segments.append({"text": " ".join(words), "start": round(start, 2), "duration": duration})
+        start += duration
+    return segments
+
+
+def transcript_text(segments: list[dict]) -> str:
+    return "\n".join(segment["text"] for segment in segments)
+
+
+def write_fixtures(directory: str, sizes=tuple(SIZES)) -> dict:
+    """Write the transcript text of every size and return the paths by size."""
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for size in sizes:
+        path = os.path.join(directory, f"transcript_{size}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(transcript_text(synthetic_transcript(SIZES[size])))
+        paths[size] = path
+    return paths
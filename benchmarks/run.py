@@ -0,0 +1,161 @@
+"""
+Reproducible benchmark suite of the summarizer.
+
+Starts a local fake Ollama server, writes the synthetic 10 minute, 1 hour
+and 10 hour transcripts and measures ``count_tokens``, ``count_batch``, ``split_text``,
+``summarise_all`` (sequential and concurrent), the ``SummarizeDb`` inserts
+the end to end ``summarise_transcript`` and its incremental re-run after a
+one line edit of the transcript. Results are written as JSON
+and can be compared with the results of another commit:
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --sizes 10min 1h --compare bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+from benchmarks.fake_ollama import FakeOllama
+from benchmarks.fixtures import SIZES, synthetic_transcript, transcript_text, write_fixtures
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def timed(function, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_time = timeit.default_timer()
+        result = function(*args, **kwargs)
+        return result, timeit.default_timer() - start_time
+
+
+def run(sizes, work_dir: str, concurrency: int) -> list[dict]:
+    # Imported here so the environment points at the fake server first.
+    from youtube_summarizer import ollama_summary
+    from youtube_summarizer.database import SummarizeDb
+    from youtube_summarizer.tokenizer import get_tokenizer
+    from youtube_summarizer.video_info import VideoInfoData
+
+    results = []
+    paths = write_fixtures(os.path.join(work_dir, "fixtures"), sizes)
+    with contextlib.redirect_stdout(io.StringIO()):
+        SummarizeDb.init_db(os.environ["DATABASE_PATH"], "schema.sql")
+
+    sentences = transcript_text(synthetic_transcript(10)).replace("\n", " ").split(". ")
+    ollama_summary.count_tokens("warm up the encoder")
+    _, elapsed = timed(lambda: [ollama_summary.count_tokens(s) for s in sentences])
+    results.append({"name": "count_tokens", "seconds": elapsed, "calls": len(sentences),
+                    "calls_per_second": len(sentences) / elapsed})
+    tokenizer = get_tokenizer(ollama_summary.MODEL)
+    _, elapsed = timed(tokenizer.count_batch, sentences)
+    results.append({"name": "count_batch", "seconds": elapsed, "texts": len(sentences),
+                    "texts_per_second": len(sentences) / elapsed})
+
+    for size in sizes:
+        text_chunks, elapsed = timed(ollama_summary.split_text, paths[size], title="Benchmark")
+        results.append({"name": f"split_text[{size}]", "seconds": elapsed,
+                        "chunks": len(text_chunks.chunks),
+                        "tokens": text_chunks.total_token_count})
+
+        _, elapsed = timed(ollama_summary.summarise_all, text_chunks.chunks, title="Benchmark")
+        results.append({"name": f"summarise_all[{size}]", "seconds": elapsed,
+                        "chunks": len(text_chunks.chunks)})
+        _, elapsed = timed(ollama_summary.summarise_all_concurrent, text_chunks.chunks,
+                           title="Benchmark", concurrency=concurrency)
+        results.append({"name": f"summarise_all_concurrent[{size}]", "seconds": elapsed,
+                        "chunks": len(text_chunks.chunks), "concurrency": concurrency})
+
+        segments = synthetic_transcript(SIZES[size])
+        db = SummarizeDb()
+        _, elapsed = timed(db.insert_video, VideoInfoData(id=f"bench-{size}"), segments,
+                           transcript_text(segments))
+        results.append({"name": f"db_insert[{size}]", "seconds": elapsed, "rows": len(segments),
+                        "rows_per_second": len(segments) / elapsed})
+
+        _, elapsed = timed(ollama_summary.summarise_transcript, paths[size], title="Benchmark",
+                           concurrency=concurrency, output_dir=os.path.join(work_dir, "out"),
+                           use_cache=False)
+        results.append({"name": f"summarise_transcript[{size}]", "seconds": elapsed,
+                        "concurrency": concurrency})
+
+        with open(paths[size], "r") as f:
+            lines = f.read().split("\n")
+        lines[len(lines) // 2] = "a corrected caption line."
+        edited_path = os.path.join(work_dir, f"{size}.edited.txt")
+        with open(edited_path, "w") as f:
+            f.write("\n".join(lines))
+        for path, name in ((paths[size], "summarise_video"), (edited_path, "resummarise_edit")):
+            _, elapsed = timed(ollama_summary.summarise_transcript, path, title="Benchmark",
+                               concurrency=concurrency, output_dir=os.path.join(work_dir, "out"),
+                               use_cache=False, video_id=f"bench-{size}")
+            results.append({"name": f"{name}[{size}]", "seconds": elapsed,
+                            "concurrency": concurrency})
+    return results
+
+
+def compare(results: list[dict], baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    before = {row["name"]: row["seconds"] for row in baseline["results"]}
+    print(f"{'benchmark':<40} {'before s':>10} {'after s':>10} {'speedup':>8}", file=sys.stderr)
+    for row in results:
+        if row["name"] in before:
+            speedup = before[row["name"]] / row["seconds"] if row["seconds"] else 0.0
+            print(f"{row['name']:<40} {before[row['name']]:>10.4f} {row['seconds']:>10.4f} "
+                  f"{speedup:>7.2f}x", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Seconds before the first token of every fake response.")
+    parser.add_argument("--tokens-per-second", type=float, default=1000.0)
+    parser.add_argument("--response-tokens", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir, FakeOllama(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+    ) as fake:
+        os.environ["OLLAMA_HOST"] = fake.url
+        os.environ["DATABASE_PATH"] = os.path.join(work_dir, "bench.db")
+        results = run(args.sizes, work_dir, args.concurrency)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "fake_ollama": {"latency": args.latency, "tokens_per_second": args.tokens_per_second,
+                        "response_tokens": args.response_tokens},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
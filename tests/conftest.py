@@ -0,0 +1,32 @@
+import ollama
+import pytest
+
+from benchmarks.fake_ollama import FakeOllama
+from youtube_summarizer import model_profile
+from youtube_summarizer.model_profile import ModelProfile
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    """A fresh summarizer database, used as the DATABASE_PATH config."""
+    path = str(tmp_path / "summarizer.db")
+    monkeypatch.setenv("DATABASE_PATH", path)
+    return path
+
+
+@pytest.fixture
+def fake_ollama(monkeypatch):
+    """
+    A local fake Ollama server the ``ollama`` module functions talk to,
+    with short retry backoffs and a known model profile.
+    """
+    with FakeOllama(latency=0.0, tokens_per_second=100_000, response_tokens=5) as fake:
+        monkeypatch.setenv("OLLAMA_HOST", fake.url)
+        monkeypatch.setenv("RETRY_BACKOFF_SECONDS", "0.01")
+        client = ollama.Client(host=fake.url)
+        for name in ("chat", "generate", "show", "embed"):
+            monkeypatch.setattr(ollama, name, getattr(client, name))
+        monkeypatch.setattr(model_profile, "_profiles", {})
+        for model in ("mistral-openorca",):
+            model_profile._profiles[model] = ModelProfile(model, 16384, calibrated=True)
+        yield fake
@@ -0,0 +1,78 @@
+import random
+
+from youtube_summarizer.chunker import chunk_sentences, chunk_sentences_stable
+
+
+def make_sentences(count: int, seed: int = 0) -> tuple[list[str], list[int]]:
+    rng = random.Random(seed)
+    sentences = [f"Sentence {i} says {rng.random():.6f}." for i in range(count)]
+    token_counts = [rng.randint(5, 40) for _ in sentences]
+    return sentences, token_counts
+
+
+def test_chunks_fit_the_budget():
+    sentences, token_counts = make_sentences(200)
+    result = chunk_sentences(sentences, 100, token_counts=token_counts)
+
+    assert " ".join(result.chunks) == " ".join(sentences)
+    assert result.total_token_count == sum(token_counts)
+    assert all(count <= 100 for count in result.token_counts)
+    # A chunk only ends when the next sentence would not fit.
+    assert len(result.chunks) < len(sentences)
+
+
+def test_oversized_sentence_gets_its_own_chunk():
+    result = chunk_sentences(["a.", "b.", "c."], 10, token_counts=[4, 25, 4])
+
+    assert result.chunks == ["a.", "b.", "c."]
+    assert result.token_counts == [4, 25, 4]
+
+
+def test_chunks_from_count_tokens_match_precomputed_counts():
+    sentences = ["one two three.", "four five.", "six seven eight nine."]
+
+    counted = chunk_sentences(sentences, 5, count_tokens=lambda text: len(text.split()))
+    precomputed = chunk_sentences(sentences, 5, token_counts=[3, 2, 4])
+
+    assert counted.chunks == precomputed.chunks == ["one two three. four five.",
+                                                    "six seven eight nine."]
+
+
+def test_stable_chunks_fit_the_budget():
+    sentences, token_counts = make_sentences(500)
+    result = chunk_sentences_stable(sentences, 200, token_counts)
+
+    assert " ".join(result.chunks) == " ".join(sentences)
+    assert all(count <= 200 for count in result.token_counts)
+    # Chunks that were not forced by the budget end past min_tokens.
+    assert all(count >= 100 for count in result.token_counts[:-1])
+
+
+def test_stable_chunks_realign_after_an_edit():
+    sentences, token_counts = make_sentences(500)
+    before = chunk_sentences_stable(sentences, 200, token_counts)
+
+    edited = list(sentences)
+    edited[250] = "A sentence that was rewritten."
+    after = chunk_sentences_stable(edited, 200, token_counts)
+
+    changed = set(after.chunks) - set(before.chunks)
+    assert len(changed) <= 2
+    assert len(set(before.chunks) & set(after.chunks)) >= len(before.chunks) - 2
+
+
+def test_greedy_chunks_shift_after_an_insert_but_stable_ones_do_not():
+    sentences, token_counts = make_sentences(500)
+    inserted = sentences[:10] + ["An extra sentence."] + sentences[10:]
+    inserted_counts = token_counts[:10] + [30] + token_counts[10:]
+
+    greedy_kept = set(chunk_sentences(sentences, 200, token_counts=token_counts).chunks) & set(
+        chunk_sentences(inserted, 200, token_counts=inserted_counts).chunks
+    )
+    stable_before = chunk_sentences_stable(sentences, 200, token_counts).chunks
+    stable_kept = set(stable_before) & set(
+        chunk_sentences_stable(inserted, 200, inserted_counts).chunks
+    )
+
+    assert len(stable_kept) >= len(stable_before) - 2
+    assert len(stable_kept) > len(greedy_kept)
@@ -0,0 +1,41 @@
+import numpy as np
+
+from youtube_summarizer import ollama_summary
+from youtube_summarizer.chunker import TextChunks
+from youtube_summarizer.embeddings import EmbeddingIndex, embed_video
+
+
+def split_lines(text, max_tokens=None, **options):
+    lines = text.splitlines()
+    return TextChunks(lines, [1] * len(lines))
+
+
+def test_the_search_finds_the_closest_chunks(tmp_path):
+    index = EmbeddingIndex(tmp_path / "index", model="model")
+    index.append("a", [[1, 0, 0], [0, 1, 0]])
+    index.append("b", [[0, 0, 1]])
+
+    matches = EmbeddingIndex(tmp_path / "index").search([[0, 0.1, 1]], k=2)[0]
+
+    assert [(match["video_id"], match["chunk"]) for match in matches] == [("b", 0), ("a", 1)]
+    assert index.video_ids() == {"a", "b"}
+
+
+def test_embedding_a_video_again_replaces_its_chunks(tmp_path, fake_ollama, monkeypatch):
+    monkeypatch.setattr(ollama_summary, "split_transcript_text", split_lines)
+    index = EmbeddingIndex(tmp_path / "index", model="embed-model")
+    embed_video("a", "first\nsecond\nthird", index, "embed-model")
+    embed_video("b", "other", index, "embed-model")
+
+    assert embed_video("a", "first\nsecond", index, "embed-model") == 2
+
+    assert len(index) == 6
+    assert index.video_ids() == {"a", "b"}
+    query = fake_ollama.embedding("third")
+    matches = index.search([query], k=10)[0]
+    assert sorted((match["video_id"], match["chunk"]) for match in matches) == [
+        ("a", 0), ("a", 1), ("b", 0)
+    ]
+    assert index.remove("a") == 2
+    assert [match["video_id"] for match in index.search([query], k=10)[0]] == ["b"]
+    assert np.isfinite([match["score"] for match in matches]).all()
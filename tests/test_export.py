@@ -0,0 +1,147 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+from click.testing import CliRunner
+
+from youtube_summarizer import export as exporter
+from youtube_summarizer.commands import export as export_command
+from youtube_summarizer.database import SummarizeDb
+from youtube_summarizer.telemetry import LlmMetrics
+from youtube_summarizer.video_info import VideoInfoData
+
+TRANSCRIPTS = {
+    "video-a": [
+        {"text": "Old, \"quoted\" line.", "start": 0.0, "duration": 2.0},
+        {"text": "Ünïcödé second line.", "start": 2.0, "duration": 2.0},
+    ],
+    "video-b": [
+        {"text": "A packed transcript.", "start": 0.0, "duration": 1.5},
+    ],
+}
+TITLES = {"video-a": 'Commas, "quotes"\nand lines', "video-b": "Plain title"}
+OLD, NEW = "2024-01-01 00:00:00", "2025-06-01 12:00:00"
+
+
+@pytest.fixture
+def db(db_file):
+    SummarizeDb.init_db(db_file, "schema.sql")
+    db = SummarizeDb(db_file)
+    for video_id, transcript in TRANSCRIPTS.items():
+        text = "\n".join(line["text"] for line in transcript)
+        data = VideoInfoData(id=video_id, title=TITLES[video_id], channel_id=f"channel-{video_id}",
+                             views=10)
+        db.insert_video(data, transcript, text, packed=video_id == "video-b")
+        db.insert_summary(video_id, "mistral", f"Summary of {video_id}.")
+    db.insert_summary("video-b", "llama", "Another summary.")
+    metrics = LlmMetrics(db_file)
+    for model in ("mistral", "llama"):
+        metrics.record({"eval_count": 5, "total_duration": 1000}, model, "summarise")
+    metrics.cn.close()
+    with db.cn:
+        for table in ("VIDEO_DATA", "TRANSCRIPT_FULL_TEXT", "TRANSCRIPT_PACKED",
+                      "VIDEO_SUMMARY"):
+            db.cn.execute(f"UPDATE {table} SET created = ?", (NEW,))
+            db.cn.execute(f"UPDATE {table} SET created = ? WHERE video_id = 'video-a'", (OLD,))
+        db.cn.execute("UPDATE LLM_METRICS SET created = ?",
+                      (datetime(2025, 6, 1, 12).timestamp(),))
+        db.cn.execute("UPDATE LLM_METRICS SET created = ? WHERE model = 'mistral'",
+                      (datetime(2024, 1, 1).timestamp(),))
+    yield db
+    db.cn.close()
+
+
+def export_text(db, name: str, fmt: str, **kwargs) -> tuple[int, str]:
+    out = io.StringIO(newline="")
+    count = exporter.export(name, fmt, out, db.cn, **kwargs)
+    return count, out.getvalue()
+
+
+def jsonl_rows(text: str) -> list[dict]:
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def test_videos_jsonl(db):
+    count, text = export_text(db, "videos", "jsonl")
+
+    rows = jsonl_rows(text)
+    assert count == len(rows) == 2
+    assert list(rows[0]) == [name for name, _ in exporter.DATASETS["videos"].columns]
+    assert {row["video_id"]: row["title"] for row in rows} == TITLES
+    assert rows[0]["views"] == 10 and rows[0]["created"] == OLD
+
+
+@pytest.mark.parametrize("name", ["videos", "summaries"])
+def test_sql_encoded_csv_matches_csv_module(db, name):
+    count, text = export_text(db, name, "csv", batch_size=1)
+
+    dataset = exporter.DATASETS[name]
+    sql, params = exporter.build_query(db.cn, dataset)
+    expected = io.StringIO(newline="")
+    writer = csv.writer(expected)
+    writer.writerow([column for column, _ in dataset.columns])
+    writer.writerows(
+        ["" if value is None else value for value in row] for row in db.cn.execute(sql, params)
+    )
+    assert text == expected.getvalue()
+    assert count == len(list(csv.reader(io.StringIO(text, newline="")))) - 1
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "csv"])
+def test_transcripts_of_both_storages(db, fmt):
+    count, text = export_text(db, "transcripts", fmt)
+
+    if fmt == "jsonl":
+        rows = jsonl_rows(text)
+    else:
+        rows = list(csv.DictReader(io.StringIO(text, newline="")))
+    assert count == 2
+    assert {row["video_id"]: row["text"] for row in rows} == {
+        video_id: "\n".join(line["text"] for line in transcript)
+        for video_id, transcript in TRANSCRIPTS.items()
+    }
+
+
+def test_filters(db):
+    since = datetime(2025, 1, 1)
+
+    _, summaries = export_text(db, "summaries", "jsonl", since=since, model="mistral")
+    _, metrics = export_text(db, "metrics", "jsonl", since=since)
+    _, videos = export_text(db, "videos", "jsonl", until=since)
+    _, channel = export_text(db, "transcripts", "jsonl", channel="channel-video-b")
+
+    assert [row["summary"] for row in jsonl_rows(summaries)] == ["Summary of video-b."]
+    assert [row["model"] for row in jsonl_rows(metrics)] == ["llama"]
+    assert [row["video_id"] for row in jsonl_rows(videos)] == ["video-a"]
+    assert [row["video_id"] for row in jsonl_rows(channel)] == ["video-b"]
+    with pytest.raises(ValueError):
+        export_text(db, "videos", "jsonl", model="mistral")
+
+
+def test_missing_tables_export_nothing(db):
+    db.cn.execute("DROP TABLE LLM_METRICS")
+
+    header = ",".join(column for column, _ in exporter.DATASETS["metrics"].columns)
+    assert export_text(db, "metrics", "jsonl") == (0, "")
+    assert export_text(db, "metrics", "csv") == (0, header + "\r\n")
+
+
+def test_export_command_since(db, tmp_path):
+    output = tmp_path / "summaries.jsonl"
+    result = CliRunner().invoke(
+        export_command, ["summaries", "--since", "2025-01-01", "--output", str(output)]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Exported 2 summaries rows" in result.output
+    rows = jsonl_rows(output.read_text(encoding="utf-8"))
+    assert sorted(row["summary"] for row in rows) == ["Another summary.", "Summary of video-b."]
+
+
+def test_export_command_parquet_needs_output(db):
+    result = CliRunner().invoke(export_command, ["videos", "--format", "parquet"])
+
+    assert result.exit_code == 2
+    assert "Parquet is written to a file" in result.output
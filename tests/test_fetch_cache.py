@@ -0,0 +1,81 @@
+import os
+import time
+
+import pytest
+
+from youtube_summarizer.fetch_cache import FetchCache, OfflineCacheMiss
+
+
+def size_on_disk(cache: FetchCache) -> int:
+    return sum(size for _, _, size in cache._entries())
+
+
+def test_an_entry_is_fetched_once(tmp_path):
+    cache = FetchCache(tmp_path)
+    fetches = []
+
+    for _ in range(2):
+        data = cache.get_or_fetch("html", "video", lambda: fetches.append(1) or b"page")
+
+    assert data == b"page"
+    assert len(fetches) == 1
+
+
+def test_an_expired_entry_is_refetched_unless_offline(tmp_path):
+    cache = FetchCache(tmp_path, ttls={"html": 60})
+    cache.put("html", "video", b"old")
+    path = cache._path("html", "video")
+    os.utime(path, (time.time(), time.time() - 120))
+
+    assert cache.get("html", "video") is None
+    assert FetchCache(tmp_path, offline=True).get("html", "video") == b"old"
+    with pytest.raises(OfflineCacheMiss):
+        FetchCache(tmp_path, offline=True).get_or_fetch("html", "other", lambda: b"")
+
+
+def test_the_size_tracks_replaced_entries(tmp_path):
+    cache = FetchCache(tmp_path)
+    cache.put("html", "a", b"first")
+    for data in (os.urandom(2048), b"small"):
+        cache.put("html", "a", data)
+        cache.put("transcript", "b", data)
+
+        assert cache._size == size_on_disk(cache)
+
+
+def test_the_least_recently_used_entries_are_evicted(tmp_path):
+    cache = FetchCache(tmp_path, max_bytes=3700)
+    for index, key in enumerate("abc"):
+        cache.put("html", key, os.urandom(1000))
+        os.utime(cache._path("html", key), (index, index))
+    cache.get("html", "a")
+
+    cache.put("html", "d", os.urandom(1000))
+
+    assert cache.get("html", "b") is None
+    assert all(cache.get("html", key) is not None for key in "acd")
+    assert cache._size == size_on_disk(cache) <= cache.max_bytes
+
+
+def test_files_the_cache_did_not_write_are_left_alone(tmp_path):
+    other = tmp_path / "html" / "ab" / "notes.gz"
+    other.parent.mkdir(parents=True)
+    other.write_bytes(os.urandom(4096))
+    (tmp_path / "archive.gz").write_bytes(os.urandom(4096))
+    cache = FetchCache(tmp_path, max_bytes=1000)
+
+    cache.put("html", "a", os.urandom(2000))
+
+    assert other.exists() and (tmp_path / "archive.gz").exists()
+    assert cache._size == 0
+
+
+def test_a_hit_survives_a_failed_access_time_update(tmp_path, monkeypatch):
+    cache = FetchCache(tmp_path)
+    cache.put("html", "a", b"page")
+
+    def utime(path, times):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "utime", utime)
+    assert cache.get("html", "a") == b"page"
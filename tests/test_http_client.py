@@ -0,0 +1,116 @@
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from youtube_summarizer.http_client import HttpClient
+
+PAGE = b"<html><body>" + b"<p>watch page</p>" * 200 + b"</body></html>"
+
+
+class FakeYouTube:
+    """A local stand-in for the watch pages, gzipped and with an ETag."""
+
+    def __init__(self):
+        self.connections = 0
+        self.answers = []
+        self.fail_next = 0
+        self.delay_seconds = 0.0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                time.sleep(fake.delay_seconds)
+                if fake.fail_next:
+                    fake.fail_next -= 1
+                    self._answer(503, b"", {"Retry-After": "0"})
+                elif self.headers.get("If-None-Match") == '"v1"':
+                    self._answer(304, b"", {"ETag": '"v1"'})
+                elif "gzip" in self.headers.get("Accept-Encoding", ""):
+                    self._answer(200, gzip.compress(PAGE),
+                                 {"ETag": '"v1"', "Content-Encoding": "gzip"})
+                else:
+                    self._answer(200, PAGE, {"ETag": '"v1"'})
+
+            def _answer(self, status, body, headers):
+                fake.answers.append((status, headers.get("Content-Encoding")))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        # The client of a timed out request is gone before its answer.
+        self.server.handle_error = lambda request, client_address: None
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        threading.Thread(
+            target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        ).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def youtube(monkeypatch):
+    monkeypatch.setenv("RETRY_BACKOFF_SECONDS", "0.01")
+    fake = FakeYouTube()
+    yield fake
+    fake.stop()
+
+
+def test_pages_are_fetched_compressed_over_one_connection(youtube):
+    client = HttpClient(youtube.url)
+
+    pages = [client.watch_page("a"), client.get(f"{youtube.url}/watch?v=b", conditional=False)]
+
+    assert pages == [PAGE, PAGE]
+    assert youtube.answers == [(200, "gzip"), (200, "gzip")]
+    assert youtube.connections == 1
+    client.close()
+
+
+def test_a_page_fetched_again_is_revalidated(youtube):
+    client = HttpClient(youtube.url)
+
+    assert client.watch_page("a") == PAGE
+    assert client.watch_page("a") == PAGE
+
+    assert youtube.answers == [(200, "gzip"), (304, None)]
+    client.close()
+
+
+def test_an_overloaded_answer_is_retried(youtube):
+    client = HttpClient(youtube.url)
+    youtube.fail_next = 1
+
+    assert client.watch_page("a") == PAGE
+    assert youtube.answers == [(503, None), (200, "gzip")]
+    client.close()
+
+
+def test_a_slow_answer_times_out(youtube, monkeypatch):
+    monkeypatch.setenv("RETRY_ATTEMPTS", "1")
+    # A host of its own, for a controller created with a single attempt.
+    client = HttpClient(youtube.url.replace("127.0.0.1", "localhost"), read_timeout=0.1)
+    youtube.delay_seconds = 0.5
+
+    with pytest.raises(requests.Timeout):
+        client.watch_page("a")
+    client.close()
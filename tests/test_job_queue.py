@@ -0,0 +1,141 @@
+import time
+
+import pytest
+
+from youtube_summarizer import jobs
+from youtube_summarizer.database import SummarizeDb
+
+
+@pytest.fixture
+def db(db_file):
+    db = SummarizeDb(db_file)
+    db.create_job_queue()
+    yield db
+    db.cn.close()
+
+
+def job_status(db: SummarizeDb, job_id: int) -> tuple:
+    return db.cn.execute(
+        "SELECT status, attempts, lease_owner FROM JOB WHERE id = ?", (job_id,)
+    ).fetchone()
+
+
+def test_duplicate_jobs_are_not_enqueued(db):
+    first = db.enqueue_job("chunk", {"video_id": "a"}, dedup_key="chunk:a")
+
+    assert first is not None
+    assert db.enqueue_job("chunk", {"video_id": "a"}, dedup_key="chunk:a") is None
+
+
+def test_a_job_is_claimed_by_one_worker(db):
+    job_id = db.enqueue_job("chunk", {"video_id": "a"})
+
+    job = db.claim_job("worker-1", lease_seconds=60)
+
+    assert job == {"id": job_id, "kind": "chunk", "payload": {"video_id": "a"},
+                   "attempts": 1, "max_attempts": 5}
+    assert db.claim_job("worker-2", lease_seconds=60) is None
+    assert db.complete_job(job_id, "worker-1")
+    assert job_status(db, job_id) == ("done", 1, None)
+
+
+def test_an_expired_lease_is_reclaimed(db):
+    job_id = db.enqueue_job("chunk", {"video_id": "a"})
+    db.claim_job("worker-1", lease_seconds=0.05)
+    assert db.claim_job("worker-2", lease_seconds=60) is None
+
+    time.sleep(0.1)
+    job = db.claim_job("worker-2", lease_seconds=60)
+
+    assert job["id"] == job_id
+    assert job["attempts"] == 2
+    # The first worker lost the lease, its result is left to the new owner.
+    assert not db.heartbeat_job(job_id, "worker-1", 60)
+    assert not db.complete_job(job_id, "worker-1")
+    assert db.complete_job(job_id, "worker-2")
+
+
+def test_a_heartbeat_keeps_the_lease(db):
+    job_id = db.enqueue_job("chunk", {"video_id": "a"})
+    db.claim_job("worker-1", lease_seconds=0.1)
+
+    for _ in range(3):
+        time.sleep(0.05)
+        assert db.heartbeat_job(job_id, "worker-1", 0.1)
+
+    assert db.claim_job("worker-2", lease_seconds=60) is None
+
+
+def test_a_failed_job_is_retried_after_a_backoff(db):
+    job_id = db.enqueue_job("summarize", {"video_id": "a"})
+    job = db.claim_job("worker-1", lease_seconds=60)
+
+    assert db.fail_job(job, "worker-1", "boom", backoff_seconds=0.05) == "pending"
+    assert db.claim_job("worker-1", lease_seconds=60) is None
+    time.sleep(0.1)
+    job = db.claim_job("worker-1", lease_seconds=60)
+
+    assert job["id"] == job_id
+    assert job["attempts"] == 2
+
+
+def test_a_job_out_of_attempts_is_dead_lettered(db):
+    job_id = db.enqueue_job("summarize", {"video_id": "a"}, max_attempts=2)
+    for _ in range(2):
+        job = db.claim_job("worker-1", lease_seconds=60)
+        status = db.fail_job(job, "worker-1", "boom", backoff_seconds=0.0)
+
+    assert status == "dead"
+    assert db.claim_job("worker-1", lease_seconds=60) is None
+    last_error = db.cn.execute("SELECT last_error FROM JOB WHERE id = ?", (job_id,)).fetchone()
+    assert last_error == ("boom",)
+
+    assert db.retry_dead_jobs() == 1
+    assert db.claim_job("worker-1", lease_seconds=60)["attempts"] == 1
+
+
+def test_a_lease_expiring_on_the_last_attempt_dead_letters_the_job(db):
+    job_id = db.enqueue_job("summarize", {"video_id": "a"}, max_attempts=1)
+    db.claim_job("worker-1", lease_seconds=0.05)
+    time.sleep(0.1)
+
+    assert db.claim_job("worker-2", lease_seconds=60) is None
+    assert job_status(db, job_id) == ("dead", 2, None)
+
+
+def test_a_released_job_keeps_its_attempts(db):
+    job_id = db.enqueue_job("summarize", {"video_id": "a"})
+    db.claim_job("worker-1", lease_seconds=60)
+
+    assert db.release_job(job_id, "worker-1")
+    assert db.claim_job("worker-2", lease_seconds=60)["attempts"] == 1
+
+
+def test_a_worker_prefers_the_kind_it_ran_last(db):
+    db.enqueue_job("chunk", {"video_id": "a"})
+    db.enqueue_job("summarize", {"video_id": "b"})
+
+    assert db.claim_job("worker-1", 60, prefer_kind="summarize")["kind"] == "summarize"
+    assert db.claim_job("worker-1", 60, kinds=["reduce"]) is None
+
+
+def test_a_summary_of_a_replaced_chunk_is_not_stored(db):
+    db.insert_chunks("a", ["one", "two"], [1, 1], ["hash-1", "hash-2"])
+    db.insert_chunks("a", ["three", "two"], [1, 1], ["hash-3", "hash-2"])
+
+    assert db.get_chunk("a", 0, "hash-1") is None
+    assert not db.set_chunk_summary("a", 0, "summary of one", "hash-1")
+    assert not db.set_chunk_summary("a", 1, "summary of two", "hash-2")
+    assert db.set_chunk_summary("a", 0, "summary of three", "hash-3")
+    assert db.get_chunk_summaries("a") == (
+        ["hash-3", "hash-2"], ["summary of three", "summary of two"]
+    )
+
+
+def test_a_summarize_job_queued_before_a_rechunk_is_skipped(db, fake_ollama):
+    db.insert_chunks("a", ["three"], [1], ["hash-3"])
+
+    jobs.run_summarize(db, None, {"video_id": "a", "chunk": 0, "hash": "hash-1"})
+
+    assert fake_ollama.requests == 0
+    assert db.get_chunk_summaries("a") == (["hash-3"], [None])
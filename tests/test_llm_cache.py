@@ -0,0 +1,115 @@
+import itertools
+
+import pytest
+
+from youtube_summarizer import database, ollama_summary
+from youtube_summarizer.database import ResponseCache, SummarizeDb
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Ticks one second on every ``time.time`` call of the database module."""
+    ticks = itertools.count(1_000_000)
+    monkeypatch.setattr(database.time, "time", lambda: float(next(ticks)))
+
+
+def response(text: str) -> dict:
+    return {"message": {"role": "assistant", "content": text}}
+
+
+def test_miss_then_hit(db_file):
+    cache = ResponseCache(max_entries=10)
+    key = ResponseCache.make_key("model", "prompt", "text")
+
+    assert cache.get(key) is None
+    cache.put(key, "model", response("summary"))
+
+    assert cache.get(key) == response("summary")
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.report() == "LLM cache: 1 hits, 1 misses."
+    cache.close()
+
+
+def test_key_depends_on_model_prompt_and_text():
+    keys = {
+        ResponseCache.make_key("model", "prompt", "text"),
+        ResponseCache.make_key("other", "prompt", "text"),
+        ResponseCache.make_key("model", "other", "text"),
+        ResponseCache.make_key("model", "prompt", "other"),
+        # The parts are delimited, moving a character between them changes the key.
+        ResponseCache.make_key("mode", "lprompt", "text"),
+    }
+    assert len(keys) == 5
+
+
+def test_least_recently_used_entry_is_evicted(db_file, clock):
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", "model", response("a"))
+    cache.put("b", "model", response("b"))
+    assert cache.get("a") is not None
+
+    cache.put("c", "model", response("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == response("a")
+    assert cache.get("c") == response("c")
+    cache.close()
+
+
+def test_summarise_reuses_the_cached_response(db_file, fake_ollama):
+    cache = ResponseCache()
+
+    first = ollama_summary.summarise("Some text.", title="Title", cache=cache)
+    requests = fake_ollama.requests
+    second = ollama_summary.summarise("Some text.", title="Title", cache=cache)
+
+    assert fake_ollama.requests == requests
+    assert second["message"]["content"] == first["message"]["content"]
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_resummarise_only_the_changed_chunks(db_file, fake_ollama, monkeypatch):
+    monkeypatch.setattr(ollama_summary, "count_tokens", lambda text: len(text.split()))
+    SummarizeDb.init_db(db_file, "schema.sql")
+    db = SummarizeDb()
+    chunks = [f"Chunk {i} of the transcript." for i in range(6)]
+
+    ollama_summary.summarise_video_chunks(db, "video", chunks, [5] * 6, title="Title")
+    requests = fake_ollama.requests
+    edited = chunks[:3] + ["An edited chunk."] + chunks[4:]
+    ollama_summary.summarise_video_chunks(db, "video", edited, [5] * 6, title="Title")
+
+    # The edited chunk, then the reduce of the new chunk summaries.
+    assert fake_ollama.requests - requests == 2
+    requests = fake_ollama.requests
+    final = ollama_summary.summarise_video_chunks(db, "video", edited, [5] * 6, title="Title")
+
+    assert fake_ollama.requests == requests
+    assert final == db.get_summary("video")
+    db.cn.close()
+
+
+def test_a_failed_resummary_is_not_mistaken_for_a_done_one(db_file, fake_ollama, monkeypatch):
+    monkeypatch.setattr(ollama_summary, "count_tokens", lambda text: len(text.split()))
+    SummarizeDb.init_db(db_file, "schema.sql")
+    db = SummarizeDb()
+    chunks = [f"Chunk {i} of the transcript." for i in range(4)]
+    ollama_summary.summarise_video_chunks(db, "video", chunks, [5] * 4, title="Title")
+    edited = chunks[:3] + ["An edited chunk."]
+
+    fake_ollama.error_rate = 1.0
+    with pytest.raises(Exception):
+        ollama_summary.summarise_video_chunks(db, "video", edited, [5] * 4, title="Title")
+    fake_ollama.error_rate = 0.0
+    requests = fake_ollama.requests
+    final = ollama_summary.summarise_video_chunks(db, "video", edited, [5] * 4, title="Title")
+
+    # The stored chunks already match, but their summary was never made.
+    assert fake_ollama.requests - requests == 2
+    assert None not in db.get_chunk_summaries("video")[1]
+    digest = ollama_summary.chunks_digest(
+        [ollama_summary.chunk_hash(chunk, "Title") for chunk in edited]
+    )
+    assert final == db.get_summary("video", chunks_digest=digest)
+    db.cn.close()
@@ -0,0 +1,142 @@
+import logging
+import queue
+import sqlite3
+
+import pytest
+
+from youtube_summarizer import logging_config
+from youtube_summarizer.logging_config import (
+    LOGGER_NAME,
+    BatchingQueueListener,
+    DatabaseHandler,
+    DroppingQueueHandler,
+    configure_logging,
+)
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.batches = []
+
+    def emit_batch(self, records):
+        self.batches.append([record.getMessage() for record in records])
+
+
+@pytest.fixture
+def logger(request):
+    logger = logging.getLogger(f"test_logging_config.{request.node.name}")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    yield logger
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+
+@pytest.fixture
+def package_logger():
+    logger = logging.getLogger(LOGGER_NAME)
+    handlers, level, propagate = list(logger.handlers), logger.level, logger.propagate
+    yield logger
+    if logging_config._listener is not None:
+        logging_config._listener.stop()
+        logging_config._listener = None
+    logger.handlers[:] = handlers
+    logger.setLevel(level)
+    logger.propagate = propagate
+
+
+def log_rows(db_file):
+    with sqlite3.connect(db_file) as cn:
+        return cn.execute("SELECT level_name, logger, message FROM LOG ORDER BY id").fetchall()
+
+
+def test_listener_starts_on_first_record(logger):
+    log_queue = queue.Queue()
+    recorder = RecordingHandler()
+    listener = BatchingQueueListener(log_queue, recorder, flush_interval=0.01)
+    logger.addHandler(DroppingQueueHandler(log_queue, listener))
+
+    assert listener._thread is None
+    logger.info("first %s", "record")
+    assert listener._thread is not None
+    listener.stop()
+
+    assert recorder.batches == [["first record"]]
+
+
+def test_records_written_in_one_batch(logger, tmp_path):
+    db_file = str(tmp_path / "log.db")
+    log_queue = queue.Queue()
+    recorder = RecordingHandler(logging.WARNING)
+    handler = DroppingQueueHandler(log_queue)
+    logger.addHandler(handler)
+    for i in range(10):
+        logger.info("record %d", i)
+    logger.warning("last record")
+
+    listener = BatchingQueueListener(log_queue, DatabaseHandler(db_file), recorder,
+                                     flush_interval=0.01)
+    listener.start()
+    listener.stop()
+
+    rows = log_rows(db_file)
+    assert [message for _, _, message in rows] == [f"record {i}" for i in range(10)] + [
+        "last record"
+    ]
+    assert rows[-1][:2] == ("WARNING", logger.name)
+    assert recorder.batches == [["last record"]]
+
+
+def test_full_queue_drops_and_reports(logger, tmp_path):
+    db_file = str(tmp_path / "log.db")
+    log_queue = queue.Queue(maxsize=2)
+    handler = DroppingQueueHandler(log_queue)
+    logger.addHandler(handler)
+    for i in range(5):
+        logger.info("record %d", i)
+
+    assert handler.dropped == 3
+    listener = BatchingQueueListener(log_queue, DatabaseHandler(db_file), flush_interval=0.01,
+                                     queue_handler=handler)
+    listener.start()
+    listener.stop()
+
+    assert log_rows(db_file) == [
+        ("INFO", logger.name, "record 0"),
+        ("INFO", logger.name, "record 1"),
+        ("WARNING", LOGGER_NAME, "Dropped 3 log records, the log queue was full."),
+    ]
+
+
+def test_exception_text_kept(logger, tmp_path):
+    db_file = str(tmp_path / "log.db")
+    log_queue = queue.Queue()
+    listener = BatchingQueueListener(log_queue, DatabaseHandler(db_file), flush_interval=0.01)
+    logger.addHandler(DroppingQueueHandler(log_queue, listener))
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        logger.exception("failed")
+    listener.stop()
+
+    [(level_name, _, message)] = log_rows(db_file)
+    assert level_name == "ERROR"
+    assert message.startswith("failed\nTraceback")
+    assert "ValueError: broken" in message
+
+
+def test_configure_logging_again_flushes_previous(package_logger, tmp_path):
+    first_db, second_db = str(tmp_path / "first.db"), str(tmp_path / "second.db")
+    first = configure_logging("DEBUG", db_file=first_db, queue_size=10, flush_interval=5.0)
+    package_logger.info("to the first database")
+    assert first._thread is not None
+
+    second = configure_logging("DEBUG", db_file=second_db, queue_size=10, flush_interval=0.01)
+    package_logger.info("to the second database")
+    second.stop()
+
+    assert first._thread is None
+    assert [type(h) for h in package_logger.handlers].count(DroppingQueueHandler) == 1
+    assert [message for _, _, message in log_rows(first_db)] == ["to the first database"]
+    assert [message for _, _, message in log_rows(second_db)] == ["to the second database"]
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from youtube_summarizer import model_profile
+from youtube_summarizer.config import appConfig
+from youtube_summarizer.model_profile import get_model_profile
+
+
+@pytest.fixture
+def calibrations(db_file, monkeypatch):
+    """An empty profile cache and a calibration that records its models."""
+    monkeypatch.setattr(model_profile, "_profiles", {})
+    monkeypatch.setattr(model_profile, "_retry_at", {})
+    calibrated = []
+    monkeypatch.setattr(
+        model_profile, "calibrate", lambda model, context_length: calibrated.append(model) or 1.25
+    )
+    return calibrated
+
+
+def test_a_fallback_profile_is_looked_up_again(calibrations, monkeypatch):
+    monkeypatch.setattr(model_profile, "FALLBACK_SECONDS", 0.1)
+    reachable = threading.Event()
+
+    def read_model_info(model):
+        if not reachable.is_set():
+            raise ConnectionError("Connection refused")
+        return 8192, "2024-01-01T00:00:00"
+
+    monkeypatch.setattr(model_profile, "read_model_info", read_model_info)
+    fallback = get_model_profile("model")
+    reachable.set()
+
+    assert not fallback.calibrated
+    assert fallback.context_length == int(appConfig.get("OLLAMA_MAX_CONTEXT"))
+    assert get_model_profile("model") is fallback
+    time.sleep(0.15)
+    profile = get_model_profile("model")
+    assert (profile.context_length, profile.token_ratio, profile.calibrated) == (8192, 1.25, True)
+    time.sleep(0.15)
+    assert get_model_profile("model") is profile
+    assert calibrations == ["model"]
+
+
+def test_a_slow_lookup_does_not_hold_up_other_models(calibrations, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    def read_model_info(model):
+        if model == "slow":
+            started.set()
+            release.wait(5)
+        return 8192, None
+
+    monkeypatch.setattr(model_profile, "read_model_info", read_model_info)
+    slow = threading.Thread(target=get_model_profile, args=("slow",))
+    slow.start()
+    assert started.wait(5)
+
+    start_time = time.monotonic()
+    assert get_model_profile("fast").calibrated
+    assert time.monotonic() - start_time < 1
+    release.set()
+    slow.join()
+    assert sorted(calibrations) == ["fast", "slow"]
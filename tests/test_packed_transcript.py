@@ -0,0 +1,62 @@
+import pytest
+
+from youtube_summarizer.database import SummarizeDb
+from youtube_summarizer.packed_transcript import PackedTranscript
+from youtube_summarizer.video_info import VideoInfoData
+
+TRANSCRIPT = [
+    {"text": "Welcome back to the channel.", "start": 0.0, "duration": 2.25},
+    {"text": "Ünïcödé captions survive — the round trip.", "start": 2.25, "duration": 3.5},
+    {"text": "", "start": 5.75, "duration": 0.5},
+    {"text": "See you next time.", "start": 6.25, "duration": 1.125},
+]
+
+
+@pytest.fixture
+def db(db_file):
+    SummarizeDb.init_db(db_file, "schema.sql")
+    db = SummarizeDb(db_file)
+    yield db
+    db.cn.close()
+
+
+def test_round_trip_through_blobs():
+    packed = PackedTranscript.from_segments(TRANSCRIPT)
+    restored = PackedTranscript(*packed.to_blobs())
+
+    assert len(restored) == len(TRANSCRIPT)
+    assert list(restored) == TRANSCRIPT
+    assert restored[-1] == TRANSCRIPT[-1]
+    assert restored[1:3] == TRANSCRIPT[1:3]
+    assert restored.text == "\n".join(line["text"] for line in TRANSCRIPT)
+    with pytest.raises(IndexError):
+        restored[len(TRANSCRIPT)]
+
+
+def test_empty_transcript():
+    packed = PackedTranscript(*PackedTranscript.from_segments([]).to_blobs())
+
+    assert len(packed) == 0
+    assert packed.text == ""
+
+
+def test_packed_insert_and_get(db, capsys):
+    db.insert_packed_transcript("video-a", TRANSCRIPT)
+    db.insert_packed_transcript("video-a", TRANSCRIPT[:2])
+
+    assert list(db.get_packed_transcript("video-a")) == TRANSCRIPT[:2]
+    assert db.get_packed_transcript("video-b") is None
+    assert "Inserted packed transcript video-a" in capsys.readouterr().out
+
+
+def test_get_transcript_falls_back_to_rows(db):
+    text = "\n".join(line["text"] for line in TRANSCRIPT)
+    db.insert_video(VideoInfoData(id="video-rows"), TRANSCRIPT, text, packed=False)
+    db.insert_video(VideoInfoData(id="video-packed"), TRANSCRIPT, text, packed=True)
+
+    assert db.get_packed_transcript("video-rows") is None
+    assert list(db.get_transcript("video-rows")) == TRANSCRIPT
+    assert isinstance(db.get_transcript("video-packed"), PackedTranscript)
+    assert list(db.get_transcript("video-packed")) == TRANSCRIPT
+    assert db.get_text("video-rows") == db.get_text("video-packed") == text
+    assert db.get_video_ids() == ["video-packed", "video-rows"]
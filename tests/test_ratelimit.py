@@ -0,0 +1,197 @@
+import time
+
+import ollama
+import pytest
+import requests
+
+from youtube_summarizer.ratelimit import (
+    AimdLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    HostController,
+    is_overload,
+    ollama_queue_seconds,
+    retry_after,
+)
+
+MESSAGES = [{"role": "user", "content": "Summarise this."}]
+
+
+def controller(**options) -> HostController:
+    options = {"backoff_seconds": 0.01, **options}
+    return HostController("test", **options)
+
+
+def post_chat(url: str) -> requests.Response:
+    response = requests.post(f"{url}/api/chat", json={
+        "model": "mistral-openorca", "messages": MESSAGES, "stream": False,
+    })
+    response.raise_for_status()
+    return response
+
+
+def test_overload_errors_are_retried(fake_ollama):
+    fake_ollama.error_rate = 0.5
+    limits = controller(attempts=20)
+
+    for _ in range(10):
+        limits.call(ollama.chat, "mistral-openorca", MESSAGES)
+
+    assert limits.calls == 10
+    assert limits.retries == fake_ollama.rejected[500] > 0
+    assert limits.breaker.state == "closed"
+
+
+def test_a_rate_limited_call_waits_for_retry_after(fake_ollama):
+    fake_ollama.rate_limit = 1.0
+    fake_ollama._rate_tokens = 1.0
+    limits = controller()
+
+    start_time = time.monotonic()
+    limits.call(post_chat, fake_ollama.url)
+    limits.call(post_chat, fake_ollama.url)
+
+    assert fake_ollama.rejected[429] >= 1
+    assert limits.retries >= 1
+    assert time.monotonic() - start_time >= 0.9
+
+
+def test_retry_after_and_overload_detection(fake_ollama):
+    fake_ollama.rate_limit = 1.0
+    fake_ollama._rate_tokens = 0.0
+    with pytest.raises(requests.HTTPError) as error:
+        post_chat(fake_ollama.url)
+
+    assert retry_after(error.value) == 1.0
+    assert is_overload(error.value)
+    assert is_overload(ollama.ResponseError("busy", 503))
+    assert is_overload(requests.ConnectionError())
+    assert is_overload(TimeoutError())
+    assert not is_overload(ollama.ResponseError("model not found", 404))
+    assert not is_overload(ValueError())
+
+
+def test_other_errors_are_raised_at_once():
+    limits = controller()
+    calls = []
+
+    def bad_request():
+        calls.append(1)
+        raise ollama.ResponseError("model not found", 404)
+
+    with pytest.raises(ollama.ResponseError):
+        limits.call(bad_request)
+
+    assert len(calls) == 1
+    assert limits.retries == 0
+    assert limits.breaker.state == "closed"
+
+
+def test_the_circuit_opens_then_closes_after_a_probe(fake_ollama):
+    fake_ollama.error_rate = 1.0
+    limits = controller(attempts=1, failure_threshold=2, reset_seconds=0.2)
+
+    for _ in range(2):
+        with pytest.raises(ollama.ResponseError):
+            limits.call(ollama.chat, "mistral-openorca", MESSAGES)
+    assert limits.breaker.state == "open"
+
+    requests_before = fake_ollama.requests
+    with pytest.raises(CircuitOpenError):
+        limits.call(ollama.chat, "mistral-openorca", MESSAGES)
+    assert fake_ollama.requests == requests_before
+
+    time.sleep(0.25)
+    fake_ollama.error_rate = 0.0
+    limits.call(ollama.chat, "mistral-openorca", MESSAGES)
+    assert limits.breaker.state == "closed"
+
+
+def test_a_failed_probe_opens_the_circuit_again():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.05)
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    time.sleep(0.06)
+    breaker.allow()
+    assert breaker.state == "half_open"
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+
+def test_the_limit_grows_until_calls_queue():
+    limiter = AimdLimiter(initial=4, max_limit=64)
+    for _ in range(40):
+        limiter.release(limiter.acquire(), delay=0.0)
+    grown = limiter.limit
+    assert grown > 4
+
+    limiter.release(limiter.acquire(), delay=1.0)
+    assert limiter.limit == pytest.approx(grown * limiter.latency_backoff)
+
+
+def test_one_congested_round_cuts_the_limit_once():
+    limiter = AimdLimiter(initial=8)
+    started = [limiter.acquire() for _ in range(4)]
+    for start in started:
+        limiter.release(start, overload=True)
+
+    assert limiter.limit == 8 * limiter.error_backoff
+    assert limiter.in_flight == 0
+
+
+def test_long_generations_are_not_congestion(fake_ollama):
+    limits = controller(delay_of=ollama_queue_seconds, slack_seconds=0.25)
+    limits.call(ollama.chat, "mistral-openorca", MESSAGES, options={"num_predict": 1})
+    fake_ollama.tokens_per_second = 100
+    limit = limits.limiter.limit
+
+    limits.call(ollama.chat, "mistral-openorca", MESSAGES, options={"num_predict": 50})
+
+    assert limits.limiter.limit > limit
+
+
+def test_a_stream_holds_its_slot_until_it_is_consumed(fake_ollama):
+    limits = controller(delay_of=ollama_queue_seconds)
+
+    parts = limits.call_stream(ollama.chat, "mistral-openorca", MESSAGES, stream=True)
+    assert limits.limiter.in_flight == 1
+    last = list(parts)[-1]
+
+    assert last["done"]
+    assert limits.limiter.in_flight == 0
+    assert limits.calls == 1
+    assert limits.limiter.baseline == ollama_queue_seconds(last)
+
+
+def test_a_closed_stream_gives_its_slot_back(fake_ollama):
+    limits = controller()
+    for consumed in (0, 2):
+        parts = limits.call_stream(ollama.chat, "mistral-openorca", MESSAGES, stream=True)
+        for _ in range(consumed):
+            next(parts)
+
+        parts.close()
+
+        assert limits.limiter.in_flight == 0
+    assert limits.calls == 0
+
+
+def test_a_stream_failing_midway_counts_as_a_failure():
+    def parts():
+        yield {"response": "a"}
+        raise requests.ConnectionError("dropped")
+
+    limits = controller()
+    stream = limits.call_stream(parts)
+
+    with pytest.raises(requests.ConnectionError):
+        list(stream)
+    assert limits.limiter.in_flight == 0
+    assert (limits.calls, limits.failures) == (0, 1)
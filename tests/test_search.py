@@ -0,0 +1,73 @@
+import pytest
+
+from youtube_summarizer.database import SummarizeDb
+from youtube_summarizer.video_info import VideoInfoData
+
+TRANSCRIPTS = {
+    "video-a": [
+        {"text": "Welcome back to the channel.", "start": 0.0, "duration": 2.0},
+        {"text": "Today we train neural networks on transcripts.", "start": 65.4, "duration": 3.0},
+        {"text": "The network learns the words slowly.", "start": 130.0, "duration": 3.0},
+    ],
+    "video-b": [
+        {"text": "A neural network in a single picture.", "start": 12.0, "duration": 2.5},
+    ],
+}
+
+
+def insert_videos(db: SummarizeDb):
+    for video_id, transcript in TRANSCRIPTS.items():
+        text = "\n".join(line["text"] for line in transcript)
+        db.insert_video(VideoInfoData(id=video_id), transcript, text, packed=False)
+
+
+@pytest.fixture
+def db(db_file):
+    SummarizeDb.init_db(db_file, "schema.sql")
+    db = SummarizeDb(db_file)
+    yield db
+    db.cn.close()
+
+
+def test_a_match_links_to_its_timestamp(db):
+    insert_videos(db)
+
+    matches = db.search("transcripts")
+
+    assert [(m["video_id"], m["start_time"]) for m in matches] == [("video-a", 65.4)]
+    assert matches[0]["snippet"] == "Today we train neural networks on [transcripts]."
+    assert matches[0]["url"] == "https://www.youtube.com/watch?v=video-a&t=65s"
+
+
+def test_words_match_their_stem_and_a_video_can_be_picked(db):
+    insert_videos(db)
+
+    assert {m["video_id"] for m in db.search("neural networks")} == {"video-a", "video-b"}
+    assert sorted(m["start_time"] for m in db.search("network", video_id="video-a")) == [65.4, 130.0]
+    assert len(db.search("network", limit=1)) == 1
+
+
+def test_plain_queries_are_quoted_and_raw_ones_are_fts5(db):
+    insert_videos(db)
+
+    assert db.search('network" OR "welcome') == []
+    assert db.search("NOT") == []
+    assert db.search("NEAR(neural transcripts, 1)", raw=True) == []
+    assert [m["start_time"] for m in db.search("NEAR(train transcripts, 3)", raw=True)] == [65.4]
+
+
+def test_rebuild_indexes_the_lines_stored_before_the_index(db):
+    db.cn.executescript(
+        """
+        DROP TRIGGER TRANSCRIPT_TEXT_AI;
+        DROP TRIGGER TRANSCRIPT_TEXT_AD;
+        DROP TRIGGER TRANSCRIPT_TEXT_AU;
+        DROP TABLE TRANSCRIPT_FTS;
+        """
+    )
+    insert_videos(db)
+
+    db.create_search_index(rebuild=True)
+    db.cn.execute("DELETE FROM TRANSCRIPT_TEXT WHERE video_id = 'video-b'")
+
+    assert [m["video_id"] for m in db.search("picture OR welcome", raw=True)] == ["video-a"]
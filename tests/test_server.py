@@ -0,0 +1,60 @@
+import asyncio
+import contextlib
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from youtube_summarizer.server import RequestOutput
+
+
+def request_output() -> RequestOutput:
+    """A ``RequestOutput`` over a buffer that stands for the daemon's own stdout."""
+    return RequestOutput(io.StringIO())
+
+
+def test_requests_side_by_side_get_their_own_output():
+    output = request_output()
+    barrier = threading.Barrier(2)
+    outputs = {}
+
+    def request(name):
+        with output.capture() as buffer:
+            barrier.wait()
+            for _ in range(3):
+                print(name)
+        outputs[name] = buffer.getvalue()
+
+    with contextlib.redirect_stdout(output):
+        threads = [threading.Thread(target=request, args=(name,)) for name in ("a", "b")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert outputs == {"a": "a\n" * 3, "b": "b\n" * 3}
+    assert output._stdout.getvalue() == ""
+
+
+def test_tasks_and_to_thread_calls_print_to_the_request():
+    output = request_output()
+
+    async def summarise():
+        print("task")
+        await asyncio.to_thread(print, "to_thread")
+
+    with contextlib.redirect_stdout(output), output.capture() as buffer:
+        asyncio.run(summarise())
+
+    assert buffer.getvalue() == "task\nto_thread\n"
+
+
+def test_executor_workers_print_to_the_daemon():
+    output = request_output()
+
+    # A known limitation: a worker thread does not copy the context of the request.
+    with contextlib.redirect_stdout(output), output.capture() as buffer, \
+            ThreadPoolExecutor(1) as pool:
+        pool.submit(print, "worker").result()
+
+    assert buffer.getvalue() == ""
+    assert output._stdout.getvalue() == "worker\n"
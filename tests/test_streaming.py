@@ -0,0 +1,26 @@
+import io
+
+from youtube_summarizer import ollama_summary, summarize
+
+
+def test_summarise_stream_writes_the_tokens_and_times_the_first_one(fake_ollama):
+    fake_ollama.latency = 0.2
+    out = io.StringIO()
+
+    result = ollama_summary.summarise_stream("Some text.", title="Title", out=out)
+
+    assert out.getvalue() == result["message"]["content"] == "w0 w1 w2 w3 w4 "
+    # The latency of the server is before the first token.
+    assert 0.2 <= result["ttft_seconds"] < 1.0
+    assert result["tokens_per_second"] > 0
+
+
+def test_summarize_streams_the_generate_endpoint(fake_ollama, monkeypatch):
+    monkeypatch.setattr(summarize, "api_base_url", fake_ollama.url)
+    fake_ollama.latency = 0.2
+    out = io.StringIO()
+
+    result = summarize.summarize("mistral-openorca", "Some text.", stream=True, out=out)
+
+    assert out.getvalue() == result["text"] == "w0 w1 w2 w3 w4 "
+    assert 0.2 <= result["ttft_seconds"] < 1.0
@@ -0,0 +1,67 @@
+import pytest
+
+from youtube_summarizer import ollama_summary, telemetry
+from youtube_summarizer.telemetry import LlmMetrics, metrics_context, percentile
+
+
+@pytest.fixture
+def metrics(db_file):
+    """The process wide recorder, on the database of the test."""
+    telemetry.get_metrics.cache_clear()
+    yield telemetry.get_metrics()
+    telemetry.get_metrics().cn.close()
+    telemetry.get_metrics.cache_clear()
+
+
+def rows(metrics: LlmMetrics) -> list[tuple]:
+    return metrics.cn.execute(
+        "SELECT model, source, video_id, chunk_chars, eval_count, total_duration IS NOT NULL,"
+        " wall_seconds > 0 FROM LLM_METRICS ORDER BY id"
+    ).fetchall()
+
+
+def test_a_summary_call_is_recorded(metrics, fake_ollama):
+    with metrics_context("video"):
+        ollama_summary.summarise("Some text.", title="Title")
+    ollama_summary.summarise_stream("Other text.", title="Title")
+
+    assert rows(metrics) == [
+        ("mistral-openorca", "summarise", "video", 10, 5, 1, 1),
+        ("mistral-openorca", "summarise_stream", None, 11, 5, 1, 1),
+    ]
+    ttft = metrics.cn.execute("SELECT ttft_seconds FROM LLM_METRICS ORDER BY id").fetchall()
+    assert ttft[0] == (None,) and ttft[1][0] > 0
+
+
+def test_recording_can_be_turned_off(metrics, fake_ollama, monkeypatch):
+    monkeypatch.setenv("LLM_METRICS", "false")
+
+    ollama_summary.summarise("Some text.", title="Title")
+
+    assert rows(metrics) == []
+
+
+def test_stats_per_model(metrics):
+    for seconds in range(1, 11):
+        metrics.record({"total_duration": seconds * 10**9, "load_duration": 10**8,
+                        "eval_count": 20, "eval_duration": 10**9}, "small", "summarise")
+    metrics.record({"total_duration": 4 * 10**9, "load_duration": 2 * 10**9,
+                    "eval_count": 100, "eval_duration": 2 * 10**9}, "large", "summarise")
+    metrics.record({"total_duration": None}, "large", "embed")
+
+    large, small = metrics.stats(since=0)
+
+    assert large == {
+        "model": "large", "calls": 1, "p50_seconds": 4.0, "p95_seconds": 4.0,
+        "p99_seconds": 4.0, "tokens_per_second": 50.0, "mean_load_seconds": 2.0,
+        "load_share": 0.5,
+    }
+    assert (small["calls"], small["p50_seconds"], small["p95_seconds"]) == (10, 5.0, 10.0)
+    assert small["tokens_per_second"] == 20.0
+    assert metrics.stats(since=0, model="small") == [small]
+
+
+def test_percentile_is_nearest_rank():
+    assert percentile([], 0.5) is None
+    assert percentile([1, 2, 3, 4], 0.5) == 2
+    assert percentile([1, 2, 3, 4], 0.99) == 4
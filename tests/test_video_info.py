@@ -0,0 +1,71 @@
+import contextlib
+import io
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+
+from benchmarks.bench_extract import synthetic_watch_page
+from youtube_summarizer.video_info import MissingIdError, VideoInfo
+
+# See tests/fixtures/watch_pages/README.md.
+WATCH_PAGES = sorted((Path(__file__).parent / "fixtures" / "watch_pages").glob("*.html"))
+
+
+def extract(html: bytes, extractor: str, video_id: str = "vid"):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return VideoInfo.from_html(video_id, html, extractor=extractor).video_data
+
+
+def test_extractors_agree_on_the_synthetic_page():
+    html = synthetic_watch_page("vid", padding_kb=4)
+
+    fast, soup = extract(html, "fast"), extract(html, "soup")
+
+    assert asdict(fast) == asdict(soup)
+    assert (fast.likes, fast.dislikes) == (12345, 678)
+    assert fast.title == "Benchmark & video"
+    assert fast.views == 987654
+
+
+def test_attribute_values_may_hold_a_closing_bracket():
+    html = synthetic_watch_page("vid", padding_kb=1).replace(
+        b'content="A synthetic watch page"', b'content="Input -> output, <b>bold</b>"'
+    ).replace(
+        b'<div id="watch7-content"', b"""<div data-config='{"a": "<i>"}' id='watch7-content'"""
+    )
+
+    fast, soup = extract(html, "fast"), extract(html, "soup")
+
+    assert fast.description == "Input -> output, <b>bold</b>"
+    assert asdict(fast) == asdict(soup)
+
+
+@pytest.mark.parametrize("path", WATCH_PAGES, ids=[path.stem for path in WATCH_PAGES])
+def test_extractors_agree_on_saved_pages(path):
+    html = path.read_bytes()
+
+    assert asdict(extract(html, "fast", path.stem)) == asdict(extract(html, "soup", path.stem))
+
+
+@pytest.mark.parametrize("options, fast_counts, soup_counts", [
+    ({"like_label": "1.2K likes"}, (0, 678), (0, 678)),
+    ({"dislike_label": "Dislike this video"}, (12345, 0), (12345, 0)),
+    # The cases documented in _find_like_counts where the soup parser reads 0.
+    ({"dislike_first": True}, (12345, 678), (0, 678)),
+    ({"like_label": "like this video along with 12,345 other people"}, (12345, 678), (0, 678)),
+    ({"like_label": "12.345 likes"}, (12345, 678), (0, 678)),
+])
+def test_like_counts_of_other_labels(options, fast_counts, soup_counts):
+    html = synthetic_watch_page("vid", padding_kb=1, **options)
+
+    fast, soup = extract(html, "fast"), extract(html, "soup")
+
+    assert (fast.likes, fast.dislikes) == fast_counts
+    assert (soup.likes, soup.dislikes) == soup_counts
+
+
+@pytest.mark.parametrize("extractor", ["fast", "soup"])
+def test_a_page_without_microdata_is_a_missing_video(extractor):
+    with pytest.raises(MissingIdError):
+        extract(b"<html><body><div id='player'></div></body></html>", extractor)
@@ -0,0 +1,147 @@
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TextChunks:
+    """
+    The result of splitting a text into token budgeted chunks.
+
+    Unpacks like the older ``(chunks, total_token_count)`` tuple so existing
+    callers keep working, while ``token_counts`` holds the per chunk counts.
+    """
+    chunks: list[str] = field(default_factory=list)
+    token_counts: list[int] = field(default_factory=list)
+
+    @property
+    def total_token_count(self) -> int:
+        return sum(self.token_counts)
+
+    def __iter__(self) -> Iterator:
+        return iter((self.chunks, self.total_token_count))
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+
+def chunk_sentences(
+    sentences: Iterable[str],
+    max_tokens: int,
+    count_tokens: Callable[[str], int] = None,
+    separator: str = " ",
+    token_counts: Sequence[int] = None,
+) -> TextChunks:
+    """
+    Group sentences into chunks of at most ``max_tokens`` tokens.
+
+    Every sentence is counted exactly once and the size of the current chunk
+    is kept as a running total, so the work is linear in the number of
+    sentences. A sentence that would push the chunk over the budget starts
+    a new chunk; a single sentence larger than the budget gets a chunk of
+    its own.
+
+    :param sentences: The sentences to group, in order.
+    :param max_tokens: Token budget of a single chunk.
+    :param count_tokens: Function returning the token count of a string.
+    :param separator: String used to join the sentences of a chunk.
+    :param token_counts: The token count of every sentence, computed up front
+        e.g. with ``Tokenizer.count_batch``, used instead of ``count_tokens``.
+    :return: The chunks and their token counts.
+    """
+    result = TextChunks()
+    current_chunk = []
+    current_tokens = 0
+
+    if token_counts is None:
+        counted = ((sentence, count_tokens(sentence)) for sentence in sentences)
+    else:
+        counted = zip(sentences, token_counts, strict=True)
+
+    for sentence, sent_tokens in counted:
+        if current_chunk and current_tokens + sent_tokens > max_tokens:
+            logger.debug("Chunk %d: %d sentences, %d tokens",
+                         len(result.chunks), len(current_chunk), current_tokens)
+            result.chunks.append(separator.join(current_chunk))
+            result.token_counts.append(current_tokens)
+            current_chunk = []
+            current_tokens = 0
+        current_chunk.append(sentence)
+        current_tokens += sent_tokens
+
+    if current_chunk:
+        result.chunks.append(separator.join(current_chunk))
+        result.token_counts.append(current_tokens)
+
+    return result
+
+
+def _sentence_point(sentence: str) -> float:
+    """A stable pseudo random point in [0, 1) derived from the sentence text."""
+    digest = hashlib.blake2b(sentence.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") / 2**64
+
+
+def chunk_sentences_stable(
+    sentences: Sequence[str],
+    max_tokens: int,
+    token_counts: Sequence[int],
+    separator: str = " ",
+    min_tokens: int = None,
+    target_tokens: int = None,
+) -> TextChunks:
+    """
+    Group sentences into chunks that end at content defined boundaries.
+
+    Once a chunk holds ``min_tokens`` tokens, it ends after a sentence
+    whose hash falls below the share of the remaining budget that sentence
+    takes, so chunks average about ``target_tokens``. The decision depends
+    only on the sentence itself: an edit changes the chunk it falls in,
+    and the boundaries after it realign at the next cut, instead of every
+    later chunk shifting as with ``chunk_sentences``. A chunk that would
+    exceed ``max_tokens`` is cut regardless.
+
+    :param sentences: The sentences to group, in order.
+    :param max_tokens: Token budget of a single chunk.
+    :param token_counts: The token count of every sentence.
+    :param separator: String used to join the sentences of a chunk.
+    :param min_tokens: Size before a chunk may end, half the budget by default.
+    :param target_tokens: Expected chunk size, between ``min_tokens`` and the
+        budget by default.
+    :return: The chunks and their token counts.
+    """
+    if min_tokens is None:
+        min_tokens = max_tokens // 2
+    if target_tokens is None:
+        target_tokens = (min_tokens + max_tokens) // 2
+    spread = max(1, target_tokens - min_tokens)
+
+    result = TextChunks()
+    current_chunk = []
+    current_tokens = 0
+
+    def cut():
+        logger.debug("Chunk %d: %d sentences, %d tokens",
+                     len(result.chunks), len(current_chunk), current_tokens)
+        result.chunks.append(separator.join(current_chunk))
+        result.token_counts.append(current_tokens)
+
+    for sentence, sent_tokens in zip(sentences, token_counts, strict=True):
+        if current_chunk and current_tokens + sent_tokens > max_tokens:
+            cut()
+            current_chunk = []
+            current_tokens = 0
+        current_chunk.append(sentence)
+        current_tokens += sent_tokens
+        if current_tokens >= min_tokens and _sentence_point(sentence) < sent_tokens / spread:
+            cut()
+            current_chunk = []
+            current_tokens = 0
+
+    if current_chunk:
+        cut()
+
+    return result
@@ -1,28 +1,40 @@
 import os
 import click
-from rich import print
-from rich.pretty import Pretty
 
 from youtube_summarizer.config import appConfig
-from youtube_summarizer.database import SummarizeDb
-from youtube_summarizer.ollama_call import chat_with_model
 
-from youtube_summarizer.video_info import VideoInfo, VideoInfoData
+# Every command imports what it needs when it runs, so starting the CLI only
+# costs click and the config module. The summarize, search and chat commands
+# hand the work to the serve daemon when one is running and run inline
+# otherwise.
+
+
+def config_default(key: str, type=str):
+    """Click default that reads the config only when the command needs it."""
+    return lambda: type(appConfig.get(key))
+
+
+def _default_concurrency() -> int:
+    from youtube_summarizer.scheduler import default_concurrency
+
+    return default_concurrency()
 
 
 @click.command()
-@click.option("--db", default=appConfig.get("DATABASE_PATH"), 
+@click.option("--db", default=config_default("DATABASE_PATH"),
               help="File path of the sqlite database to use.")
-@click.option("--schema", default=appConfig.get("SCHEMA_FILE"), 
+@click.option("--schema", default=config_default("SCHEMA_FILE"),
               help="The schema file used to create the database.")
 def init_db(db, schema):
     """
         Will generate the sqlite database using the schema file.
     """
+    from youtube_summarizer.database import SummarizeDb
+
     SummarizeDb.init_db(db, schema)
 
 @click.command()
-@click.option("--db", default=appConfig.get("DATABASE_PATH"), help="File path of the sqlite database to drop.")
+@click.option("--db", default=config_default("DATABASE_PATH"), help="File path of the sqlite database to drop.")
 def drop_db(db = 'summarizer.db'):
     """ Drop the database """
     click.echo("Dropping the database ...")
@@ -34,42 +46,376 @@ def drop_db(db = 'summarizer.db'):
 
 
 @click.command()
-def config():
+@click.option("--save", is_flag=True, help="Write the configuration to the config file.")
+def config(save: bool):
     """ Dump the configuration. """
+    from rich import print
+    from rich.pretty import Pretty
+
+    if save:
+        appConfig.save()
     print(Pretty(appConfig, expand_all=True))
 
 @click.command()
 @click.option("--id", default='KyD8VIK032o', help="The id of the video to get text from.")
-def video_text(id: str):
+@click.option("--offline", is_flag=True, help="Only use the fetch cache, never the network.")
+def video_text(id: str, offline: bool):
     """ Get video text. """
+    from rich import print
+    from youtube_summarizer.database import SummarizeDb
+    from youtube_summarizer.fetch_cache import get_fetch_cache
+    from youtube_summarizer.video_info import VideoInfo
+
+    get_fetch_cache().offline = offline
     info = VideoInfo(id)
     db = SummarizeDb()
-    db.insert_video_data(info.video_data)
-    db.insert_transcript(id, info.get_transcript())
-    db.insert_text(id, info.get_text())
+    db.insert_video(info.video_data, info.get_transcript(), info.get_text())
     txt = info.get_text()
     print(txt)
 
 
+@click.command()
+@click.option("--file", "id_file", type=click.File("r"), default="-",
+              help="File with one video id per line, reads stdin by default.")
+@click.option("--workers", type=int, default=config_default("INGEST_WORKERS", int),
+              help="Number of videos fetched in parallel.")
+@click.option("--retry-failed/--skip-failed", default=True,
+              help="Retry the videos that failed in a previous run.")
+@click.option("--offline", is_flag=True, help="Only use the fetch cache, never the network.")
+def ingest_batch(id_file, workers: int, retry_failed: bool, offline: bool):
+    """ Get the data and text of many videos. """
+    from youtube_summarizer.database import SummarizeDb
+    from youtube_summarizer.fetch_cache import get_fetch_cache
+    from youtube_summarizer.ingest import ingest_batch as run_ingest_batch, read_video_ids
+
+    get_fetch_cache().offline = offline
+    video_ids = read_video_ids(id_file)
+    run_ingest_batch(video_ids, SummarizeDb(), workers=workers, retry_failed=retry_failed)
+
+
 @click.command()
 @click.option("--model", default='llama3.1', help="The model used to chat.")
 @click.option("--prompt", default='Why is the sky blue?', help="The prompt used to chat.")
 @click.option("--role", default='user', help="The user type.")
-def chat(model: str, prompt: str, role :str):
+@click.option("--no-cache", is_flag=True, help="Bypass the LLM response cache.")
+def chat(model: str, prompt: str, role :str, no_cache: bool):
     """ Get video text. """
+    from rich import print
+    from youtube_summarizer.server import call_server
+
     messages = [{"role": role, "content": prompt}]
-    response = chat_with_model(model, messages)
+    result = call_server("/chat", {"model": model, "messages": messages, "use_cache": not no_cache})
+    if result is not None:
+        click.echo(result["output"], nl=False)
+        print(result["response"])
+        if result["cache_report"]:
+            print(result["cache_report"])
+        return
+
+    from youtube_summarizer.database import ResponseCache, SummarizeDb
+    from youtube_summarizer.ollama_call import chat_with_model
+
+    cache = None if no_cache else ResponseCache()
+    response = chat_with_model(model, messages, cache=cache)
     db = SummarizeDb()
     db.insert_chat_response(response)
     print(response)
+    if cache is not None:
+        print(cache.report())
+
+
+@click.command()
+@click.option("--path", required=True, help="File path of the transcript text to summarize.")
+@click.option("--title", default="", help="The title of the video.")
+@click.option("--concurrency", type=int, default=_default_concurrency,
+              help="Number of chunks summarized in parallel, 1 disables the async mode.")
+@click.option("--timeout", type=float, default=config_default("OLLAMA_TIMEOUT", float),
+              help="Timeout in seconds of each attempt of a chunk request in async mode.")
+@click.option("--reduce/--no-reduce", default=True,
+              help="Reduce the chunk summaries into a single summary.")
+@click.option("--no-cache", is_flag=True, help="Bypass the LLM response cache.")
+@click.option("--stream", is_flag=True,
+              help="Write the summaries as they are generated, one chunk at a time.")
+@click.option("--video-id", default=None, help="The id of the video, recorded with the LLM metrics.")
+def summarize(path: str, title: str, concurrency: int, timeout: float, reduce: bool,
+              no_cache: bool, stream: bool, video_id: str):
+    """ Summarize a transcript text file. """
+    from youtube_summarizer.server import call_server
+
+    # The daemon answers once the summary is done, streaming runs inline.
+    if not stream:
+        result = call_server("/summarize", {
+            "path": os.path.abspath(path),
+            "title": title,
+            "concurrency": concurrency,
+            "timeout": timeout,
+            "reduce": reduce,
+            "output_dir": os.path.abspath("outputs/summaries"),
+            "use_cache": not no_cache,
+            "video_id": video_id,
+        })
+        if result is not None:
+            click.echo(result["output"], nl=False)
+            return
+
+    from youtube_summarizer.ollama_summary import summarise_transcript
+
+    summarise_transcript(
+        path,
+        title,
+        concurrency=concurrency,
+        timeout=timeout,
+        reduce=reduce,
+        use_cache=not no_cache,
+        stream=stream,
+        video_id=video_id,
+    )
+
+
+@click.command()
+@click.argument("query")
+@click.option("--limit", default=20, help="Maximum number of matches.")
+@click.option("--video-id", default=None, help="Only search the transcript of this video.")
+@click.option("--raw", is_flag=True,
+              help="Pass the query to FTS5 as is, e.g. 'NEAR(neural network, 3)'.")
+def search(query: str, limit: int, video_id: str, raw: bool):
+    """ Full text search over the transcripts. """
+    from youtube_summarizer.server import call_server
+
+    result = call_server(
+        "/search", {"query": query, "limit": limit, "video_id": video_id, "raw": raw}
+    )
+    if result is not None:
+        matches = result["matches"]
+    else:
+        from youtube_summarizer.database import SummarizeDb
+
+        matches = SummarizeDb().search(query, limit=limit, video_id=video_id, raw=raw)
+    for match in matches:
+        minutes, seconds = divmod(int(match["start_time"] or 0), 60)
+        click.echo(f"{match['video_id']} {minutes:>4}:{seconds:02} {match['snippet']}")
+        click.echo(f"    {match['url']}")
+
+
+@click.command()
+@click.option("--id", "video_ids", multiple=True,
+              help="Id of a video to embed, or embed again in place of its chunks, "
+                   "all videos not in the index by default.")
+@click.option("--model", default=config_default("EMBEDDING_MODEL"), help="The embedding model.")
+def embed(video_ids, model: str):
+    """ Add the transcript chunks of videos to the semantic search index. """
+    from youtube_summarizer.database import SummarizeDb
+    from youtube_summarizer.embeddings import EmbeddingIndex, embed_video
+
+    db = SummarizeDb()
+    index = EmbeddingIndex(appConfig.get("EMBEDDING_INDEX"), model=model)
+    if index.model and index.model != model:
+        raise click.UsageError(f"The index was built with the model {index.model}.")
+    indexed = index.video_ids()
+    video_ids = video_ids or [id for id in db.get_video_ids() if id not in indexed]
+    chunk_tokens = int(appConfig.get("EMBEDDING_CHUNK_TOKENS"))
+    for video_id in video_ids:
+        text = db.get_text(video_id)
+        if text is None:
+            click.echo(f"No transcript stored for {video_id}.")
+            continue
+        count = embed_video(video_id, text, index, model, chunk_tokens=chunk_tokens)
+        click.echo(f"Embedded {count} chunks of {video_id}.")
+
+
+@click.command()
+@click.argument("query")
+@click.option("--top-k", default=10, help="Number of chunks to return.")
+def semantic_search(query: str, top_k: int):
+    """ Find the transcript chunks closest in meaning to the query. """
+    from youtube_summarizer.embeddings import EmbeddingIndex, embed_texts
+
+    index = EmbeddingIndex(appConfig.get("EMBEDDING_INDEX"))
+    if not len(index):
+        raise click.UsageError("The embedding index is empty, run the embed command first.")
+    vector = embed_texts([query], index.model or appConfig.get("EMBEDDING_MODEL"))
+    for match in index.search(vector, k=top_k)[0]:
+        click.echo(f"{match['score']:.3f} {match['video_id']} chunk {match['chunk']}")
+
+
+@click.command()
+@click.option("--rebuild", is_flag=True,
+              help="Rebuild the index from all transcript lines already in the database.")
+def search_index(rebuild: bool):
+    """ Create or rebuild the full text search index. """
+    from youtube_summarizer.database import SummarizeDb
+
+    SummarizeDb().create_search_index(rebuild=rebuild)
+    click.echo("Search index rebuilt." if rebuild else "Search index created.")
+
+
+@click.command()
+@click.option("--since", default=24.0, help="Only use the LLM calls of the last hours.")
+@click.option("--model", default=None, help="Only report this model.")
+def stats(since: float, model: str):
+    """ Report LLM latency, throughput and load overhead per model. """
+    import time
+    from rich import print
+    from rich.table import Table
+    from youtube_summarizer.telemetry import get_metrics
+
+    table = Table(title=f"LLM calls in the last {since:g} hours")
+    for column in ("model", "calls", "p50 s", "p95 s", "p99 s", "tokens/s", "load s", "load %"):
+        table.add_column(column, justify="left" if column == "model" else "right")
+    for row in get_metrics().stats(time.time() - since * 3600, model=model):
+        table.add_row(
+            row["model"],
+            str(row["calls"]),
+            f"{row['p50_seconds']:.2f}",
+            f"{row['p95_seconds']:.2f}",
+            f"{row['p99_seconds']:.2f}",
+            f"{row['tokens_per_second']:.1f}",
+            f"{row['mean_load_seconds']:.2f}",
+            f"{row['load_share'] * 100:.1f}",
+        )
+    print(table)
+
+
+@click.command()
+@click.argument("dataset", type=click.Choice(["videos", "transcripts", "summaries", "metrics"]))
+@click.option("--format", "fmt", type=click.Choice(["jsonl", "csv", "parquet"]), default="jsonl",
+              help="Parquet needs pyarrow.")
+@click.option("--output", "-o", default="-", help="File to write, stdout by default.")
+@click.option("--since", type=click.DateTime(), default=None,
+              help="Only the rows stored from this UTC date on.")
+@click.option("--until", type=click.DateTime(), default=None,
+              help="Only the rows stored before this UTC date.")
+@click.option("--channel", default=None, help="Only the videos of this channel id.")
+@click.option("--model", default=None, help="Only the summaries or metrics of this model.")
+@click.option("--batch-size", default=10000, help="Rows fetched and written at a time.")
+def export(dataset: str, fmt: str, output: str, since, until, channel: str, model: str,
+           batch_size: int):
+    """ Stream videos, transcripts, summaries or LLM metrics out of the database. """
+    import time
+    from youtube_summarizer import export as exporter
+    from youtube_summarizer.database import SummarizeDb
+
+    if fmt == "parquet" and output == "-":
+        raise click.UsageError("Parquet is written to a file, pass --output.")
+    start_time = time.monotonic()
+    cn = SummarizeDb().cn
+    try:
+        if fmt == "parquet":
+            count = exporter.export(dataset, fmt, output, cn, batch_size, since=since,
+                                    until=until, channel=channel, model=model)
+        else:
+            with click.open_file(output, "w", encoding="utf-8") as out:
+                count = exporter.export(dataset, fmt, out, cn, batch_size, since=since,
+                                        until=until, channel=channel, model=model)
+    except (ValueError, RuntimeError) as e:
+        raise click.UsageError(str(e))
+    finally:
+        cn.close()
+    elapsed = time.monotonic() - start_time
+    click.echo(f"Exported {count} {dataset} rows in {elapsed:.2f} seconds.", err=True)
+
+
+@click.command()
+@click.option("--model", default=None, help="The Ollama model, OLLAMA_MODEL by default.")
+@click.option("--refresh", is_flag=True, help="Calibrate again even when a profile is stored.")
+def calibrate(model: str, refresh: bool):
+    """ Measure the context window and token ratio used to size the chunks of a model. """
+    from youtube_summarizer.model_profile import get_model_profile
+    from youtube_summarizer.ollama_summary import OLLAMA_MODEL, RESPONSE_TOKENS
+
+    profile = get_model_profile(model or OLLAMA_MODEL, refresh=refresh)
+    click.echo(f"Model: {profile.model}")
+    click.echo(f"Context length: {profile.context_length}")
+    click.echo(f"Token ratio: {profile.token_ratio:.3f}"
+               + ("" if profile.calibrated else " (not calibrated)"))
+    click.echo(f"Response reserve: {profile.response_reserve(RESPONSE_TOKENS)} tokens")
+    click.echo(f"Chunk budget: {profile.chunk_budget(0, RESPONSE_TOKENS)} tiktoken tokens "
+               "before the prompt")
+
+
+@click.command()
+@click.argument("video_ids", nargs=-1)
+@click.option("--file", "id_file", type=click.File("r"), default=None,
+              help="File with one video id per line.")
+@click.option("--stage", type=click.Choice(["ingest", "chunk"]), default="ingest",
+              help="Start at ingest, or at chunk for videos whose text is stored.")
+def enqueue(video_ids, id_file, stage: str):
+    """ Queue videos for the workers. """
+    from youtube_summarizer.database import SummarizeDb
+    from youtube_summarizer.ingest import read_video_ids
+    from youtube_summarizer.jobs import enqueue_videos
+
+    video_ids = list(video_ids) + (read_video_ids(id_file) if id_file else [])
+    added = enqueue_videos(SummarizeDb(), video_ids, stage=stage)
+    click.echo(f"Queued {added} videos, {len(video_ids) - added} were already queued.")
+
+
+@click.command()
+@click.option("--processes", type=int, default=config_default("WORKER_PROCESSES", int),
+              help="Number of worker processes.")
+@click.option("--ollama-host", "ollama_hosts", multiple=True,
+              help="Ollama server of the workers, repeat to spread them over several.")
+@click.option("--stage", "stages", multiple=True,
+              type=click.Choice(["ingest", "chunk", "summarize", "reduce"]),
+              help="Only run these stages, all of them by default.")
+@click.option("--lease", type=float, default=config_default("JOB_LEASE_SECONDS", float),
+              help="Seconds a job is leased before another worker may take it over.")
+@click.option("--exit-when-idle", is_flag=True, help="Stop once the queue has no ready job.")
+def worker(processes: int, ollama_hosts, stages, lease: float, exit_when_idle: bool):
+    """ Run worker processes that pull jobs from the queue. """
+    from youtube_summarizer.jobs import run_workers
+
+    run_workers(processes, ollama_hosts, list(stages) or None, lease, exit_when_idle)
+
+
+@click.command()
+@click.option("--retry-dead", is_flag=True, help="Queue the dead lettered jobs again.")
+def jobs(retry_dead: bool):
+    """ Show the job queue. """
+    from youtube_summarizer.database import SummarizeDb
+
+    db = SummarizeDb()
+    db.create_job_queue()
+    if retry_dead:
+        click.echo(f"Queued {db.retry_dead_jobs()} dead jobs again.")
+    for kind, status, count in db.get_job_counts():
+        click.echo(f"{kind:>10} {status:>8} {count:>8}")
+
+
+@click.command()
+@click.option("--host", default=config_default("SERVER_HOST"), help="Address to listen on.")
+@click.option("--port", type=int, default=config_default("SERVER_PORT", int), help="Port to listen on.")
+@click.option("--preload/--no-preload", default=True,
+              help="Load the Ollama model at start up instead of on the first request.")
+@click.option("--pool-size", default=4, help="Number of database connections.")
+def serve(host: str, port: int, preload: bool, pool_size: int):
+    """ Run the daemon that keeps the models and resources warm. """
+    from youtube_summarizer.server import serve as run_server
+
+    run_server(host, port, preload_model=preload, pool_size=pool_size)
 
 
 @click.group()
 def cli():
-    pass
+    from youtube_summarizer.logging_config import configure_logging
+
+    configure_logging()
 
 cli.add_command(init_db)
 cli.add_command(drop_db)
 cli.add_command(config)
 cli.add_command(chat)
 cli.add_command(video_text)
+cli.add_command(ingest_batch)
+cli.add_command(summarize)
+cli.add_command(stats)
+cli.add_command(calibrate)
+cli.add_command(export)
+cli.add_command(search)
+cli.add_command(search_index)
+cli.add_command(embed)
+cli.add_command(semantic_search)
+cli.add_command(serve)
+cli.add_command(enqueue)
+cli.add_command(worker)
+cli.add_command(jobs)
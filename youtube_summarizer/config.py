@@ -1,22 +1,18 @@
-import json
 import os
-import logging
-from logging import Logger
 from pathlib import Path
-from typing import Any, Union, get_type_hints
+from typing import Any
 from dotenv import load_dotenv
 from tempfile import gettempdir
 from click import UsageError
 
 from youtube_summarizer.utils import get_default_data_dir
 
-load_dotenv()
-
 
 CONFIG_FOLDER = os.path.expanduser("~/.config")
 SUMMARIZER_CONFIG_FOLDER = Path(CONFIG_FOLDER) / "summarizer"
 TEMP_DATA_PATH = Path(gettempdir()) / "data"
 CACHE_PATH = Path(gettempdir()) / "cache"
+FETCH_CACHE_PATH = CACHE_PATH / "fetch"
 
 DEFAULT_CONFIG = {
     "ENV": "development",
@@ -28,33 +24,79 @@ DEFAULT_CONFIG = {
     "DATABASE_URL": os.environ.get("DATABASE_URL", "sqlite:///youtube_summarizer.db"),
     "OLLAMA_URL": os.environ.get("OLLAMA_URL", "http://127.0.0.1:5000"),
     "OLLAMA_MODEL": os.environ.get("OLLAMA_MODEL", "llama3.1"),
+    "OLLAMA_CONCURRENCY": os.environ.get("OLLAMA_CONCURRENCY", "auto"),
+    "OLLAMA_TIMEOUT": os.environ.get("OLLAMA_TIMEOUT", "600"),
+    "OLLAMA_KEEP_ALIVE": os.environ.get("OLLAMA_KEEP_ALIVE", "30m"),
+    "OLLAMA_NUM_PARALLEL": os.environ.get("OLLAMA_NUM_PARALLEL", "4"),
+    "OLLAMA_MAX_LOADED_MODELS": os.environ.get("OLLAMA_MAX_LOADED_MODELS", "1"),
+    "OLLAMA_MAX_CONTEXT": os.environ.get("OLLAMA_MAX_CONTEXT", "16384"),
+    "SERVER_HOST": os.environ.get("SERVER_HOST", "127.0.0.1"),
+    "SERVER_PORT": os.environ.get("SERVER_PORT", "8765"),
+    "YOUTUBE_BASE_URL": os.environ.get("YOUTUBE_BASE_URL", "https://www.youtube.com"),
+    "HTTP_CONNECT_TIMEOUT": os.environ.get("HTTP_CONNECT_TIMEOUT", "5"),
+    "HTTP_READ_TIMEOUT": os.environ.get("HTTP_READ_TIMEOUT", "30"),
+    "HTTP_POOL_SIZE": os.environ.get("HTTP_POOL_SIZE", "16"),
+    "FETCH_CACHE_HTML_TTL": os.environ.get("FETCH_CACHE_HTML_TTL", "86400"),
+    "FETCH_CACHE_TRANSCRIPT_TTL": os.environ.get("FETCH_CACHE_TRANSCRIPT_TTL", "2592000"),
+    "FETCH_CACHE_MAX_MB": os.environ.get("FETCH_CACHE_MAX_MB", "1024"),
+    "INGEST_WORKERS": os.environ.get("INGEST_WORKERS", "8"),
+    "HTTP_RATE_PER_SECOND": os.environ.get("HTTP_RATE_PER_SECOND", "5"),
+    "OLLAMA_RATE_PER_SECOND": os.environ.get("OLLAMA_RATE_PER_SECOND", "0"),
+    "ADAPTIVE_MAX_CONCURRENCY": os.environ.get("ADAPTIVE_MAX_CONCURRENCY", "64"),
+    "RETRY_ATTEMPTS": os.environ.get("RETRY_ATTEMPTS", "4"),
+    "RETRY_BACKOFF_SECONDS": os.environ.get("RETRY_BACKOFF_SECONDS", "0.5"),
+    "CIRCUIT_FAILURES": os.environ.get("CIRCUIT_FAILURES", "5"),
+    "CIRCUIT_RESET_SECONDS": os.environ.get("CIRCUIT_RESET_SECONDS", "30"),
+    "WORKER_PROCESSES": os.environ.get("WORKER_PROCESSES", str(os.cpu_count() or 1)),
+    "JOB_LEASE_SECONDS": os.environ.get("JOB_LEASE_SECONDS", "300"),
+    "JOB_MAX_ATTEMPTS": os.environ.get("JOB_MAX_ATTEMPTS", "5"),
+    "JOB_BACKOFF_SECONDS": os.environ.get("JOB_BACKOFF_SECONDS", "5"),
+    "TOKENIZER_THREADS": os.environ.get("TOKENIZER_THREADS", str(min(8, os.cpu_count() or 1))),
+    "TRANSCRIPT_STORAGE": os.environ.get("TRANSCRIPT_STORAGE", "rows"),
+    "EMBEDDING_MODEL": os.environ.get("EMBEDDING_MODEL", "nomic-embed-text"),
+    "EMBEDDING_CHUNK_TOKENS": os.environ.get("EMBEDDING_CHUNK_TOKENS", "512"),
+    "EMBEDDING_INDEX": os.environ.get(
+        "EMBEDDING_INDEX", str(Path(get_default_data_dir("youtube_summarizer")) / "embeddings")
+    ),
+    "LLM_METRICS": os.environ.get("LLM_METRICS", "true"),
+    "LLM_CACHE_MAX_ENTRIES": os.environ.get("LLM_CACHE_MAX_ENTRIES", "10000"),
     "DATA_DIR": Path(get_default_data_dir("youtube_summarizer")),
     "LOG_FILE": str(os.environ.get("LOG_FILENAME", "youtube_summarizer.log")),
+    "LOG_LEVEL": os.environ.get("LOG_LEVEL", "INFO"),
+    "LOG_DATABASE_PATH": os.environ.get("LOG_DATABASE_PATH", "youtube_summarizer_log.db"),
+    "LOG_QUEUE_SIZE": os.environ.get("LOG_QUEUE_SIZE", "10000"),
+    "LOG_FLUSH_SECONDS": os.environ.get("LOG_FLUSH_SECONDS", "1.0"),
 }
 
 
 class Config(dict):
+    """
+    The app configuration: defaults overridden by the config file and by
+    environment variables.
+
+    Nothing is read until the first lookup, and reading never writes the
+    config file; ``save`` writes it explicitly.
+    """
+
     def __init__(self, config_path: Path, **defaults: Any):
+        super().__init__()
         self.config_path = config_path
-
-        if self._exists:
-            self._read()
-            has_new_config = False
-            for key, value in defaults.items():
-                if key not in self:
-                    has_new_config = True
-                    self[key] = value
-            if has_new_config:
-                self._write()
-        else:
-            config_path.parent.mkdir(parents=True, exist_ok=True)
-            super().__init__(**defaults)
-            self._write()
+        self.defaults = defaults
+        self._loaded = False
 
     @property
     def _exists(self) -> bool:
         return self.config_path.exists()
 
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        load_dotenv()
+        super().update(self.defaults)
+        if self._exists:
+            self._read()
+
     def _write(self) -> None:
         with open(self.config_path, "w", encoding="utf-8") as file:
             string_config = ""
@@ -69,12 +111,51 @@ class Config(dict):
                     key, value = line.strip().split("=", 1)
                     self[key] = value
 
+    def save(self) -> None:
+        """Write the merged configuration to the config file."""
+        self._load()
+        self.config_path.parent.mkdir(parents=True, exist_ok=True)
+        self._write()
+
     def get(self, key: str) -> str:  # type: ignore
+        self._load()
         # Prioritize environment variables over config file.
         value = os.getenv(key) or super().get(key)
         if not value:
             raise UsageError(f"Missing config key: {key}")
         return value
 
+    def __getitem__(self, key: str):
+        self._load()
+        return super().__getitem__(key)
+
+    def __contains__(self, key) -> bool:
+        self._load()
+        return super().__contains__(key)
+
+    def __iter__(self):
+        self._load()
+        return super().__iter__()
+
+    def __len__(self) -> int:
+        self._load()
+        return super().__len__()
+
+    def keys(self):
+        self._load()
+        return super().keys()
+
+    def items(self):
+        self._load()
+        return super().items()
+
+    def values(self):
+        self._load()
+        return super().values()
+
+    def __repr__(self) -> str:
+        self._load()
+        return super().__repr__()
+
 
 appConfig = Config(SUMMARIZER_CONFIG_FOLDER, **DEFAULT_CONFIG)
@@ -1,47 +1,154 @@
+from __future__ import annotations
+
+import logging
 import os
 import sqlite3
 import json
+import time
+import hashlib
+import random
+import threading
 from sqlite3 import connect
 from dataclasses import asdict
+from typing import TYPE_CHECKING
 from youtube_summarizer.config import appConfig
-from youtube_summarizer.video_info import VideoInfoData
+from youtube_summarizer.packed_transcript import PackedTranscript
+
+if TYPE_CHECKING:
+    from youtube_summarizer.video_info import VideoInfoData
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS TRANSCRIPT_FTS USING fts5(
+    text_data,
+    content='TRANSCRIPT_TEXT',
+    content_rowid='id',
+    tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS TRANSCRIPT_TEXT_AI AFTER INSERT ON TRANSCRIPT_TEXT BEGIN
+    INSERT INTO TRANSCRIPT_FTS(rowid, text_data) VALUES (new.id, new.text_data);
+END;
+CREATE TRIGGER IF NOT EXISTS TRANSCRIPT_TEXT_AD AFTER DELETE ON TRANSCRIPT_TEXT BEGIN
+    INSERT INTO TRANSCRIPT_FTS(TRANSCRIPT_FTS, rowid, text_data) VALUES ('delete', old.id, old.text_data);
+END;
+CREATE TRIGGER IF NOT EXISTS TRANSCRIPT_TEXT_AU AFTER UPDATE ON TRANSCRIPT_TEXT BEGIN
+    INSERT INTO TRANSCRIPT_FTS(TRANSCRIPT_FTS, rowid, text_data) VALUES ('delete', old.id, old.text_data);
+    INSERT INTO TRANSCRIPT_FTS(rowid, text_data) VALUES (new.id, new.text_data);
+END;
+"""
+
+JOB_QUEUE_SQL = """
+CREATE TABLE IF NOT EXISTS JOB(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedup_key TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS JOB_READY ON JOB(status, available_at);
+CREATE UNIQUE INDEX IF NOT EXISTS JOB_DEDUP ON JOB(dedup_key)
+    WHERE status IN ('pending', 'running');
+CREATE TABLE IF NOT EXISTS CHUNK(
+    video_id TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    text_data TEXT NOT NULL,
+    token_count INTEGER,
+    content_hash TEXT,
+    summary TEXT,
+    PRIMARY KEY (video_id, chunk_index)
+);
+CREATE TABLE IF NOT EXISTS VIDEO_SUMMARY(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    summary TEXT,
+    chunks_digest TEXT,
+    created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS VIDEO_SUMMARY_VIDEO_ID ON VIDEO_SUMMARY(video_id);
+"""
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+)
+
+
+def configure_connection(cn: sqlite3.Connection) -> sqlite3.Connection:
+    """Apply the write tuned pragmas to a connection."""
+    for pragma in PRAGMAS:
+        cn.execute(pragma)
+    return cn
 
 
 class SummarizeDb:
-    def __init__(self, db_file: str = appConfig.get("DATABASE_PATH")):
+    def __init__(self, db_file: str = None, check_same_thread: bool = True):
         super().__init__()
-        self.db_file = db_file
-        self.cn = connect(self.db_file)
+        self.db_file = db_file or appConfig.get("DATABASE_PATH")
+        self.cn = configure_connection(connect(self.db_file, check_same_thread=check_same_thread))
         self.cur = self.cn.cursor()
 
-    def insert_video(transcript):
+    def insert_video(self, video_data: VideoInfoData, transcript: list[dict], text: str,
+                     language: str = "en", packed: bool = None):
+        """
+        Inserts the data, transcript and text of a video in a single transaction.
 
-        # {'text': str, 'start': float, 'end': float}
-        pass
+        The transaction is rolled back and the error raised when any of the
+        writes fail.
 
-    def insert_transcript(self, id: str, transcript: list[dict]):
+        :param packed: Store the transcript as a single TRANSCRIPT_PACKED record
+            instead of one row per line plus the full text. Defaults to the
+            TRANSCRIPT_STORAGE config. Packed transcripts are not in the full
+            text search index.
+        """
+        if packed is None:
+            packed = appConfig.get("TRANSCRIPT_STORAGE") == "packed"
+        if packed:
+            self.create_packed_transcript()
+        logger.debug("Inserting video %s: %d transcript lines, packed=%s",
+                     video_data.id, len(transcript), packed)
+        with self.cn:
+            self._write_video_data(video_data)
+            if packed:
+                self._write_packed_transcript(video_data.id, transcript, language)
+            else:
+                self._write_transcript(video_data.id, transcript)
+                self._write_text(video_data.id, text, language)
+
+    def _write_transcript(self, id: str, transcript: list[dict]):
         sql = """
             INSERT INTO TRANSCRIPT_TEXT(
                 video_id, text_data, start_time, duration
             ) VALUES (?,?,?,?)
             """
+        self.cur.executemany(
+            sql,
+            (
+                (id, line["text"], float(line["start"]), float(line["duration"]))
+                for line in transcript
+            ),
+        )
+
+    def insert_transcript(self, id: str, transcript: list[dict]):
         try:
-            for line in transcript:
-                print(line)
-                data = (id, line["text"], float(line["start"]), float(line["duration"]))
-                self.cur.execute(sql, data)
-            self.cn.commit()
+            with self.cn:
+                self._write_transcript(id, transcript)
             print(f"Inserted transcript {id}")
         except sqlite3.Error as e:
             print(f"An error occurred: {e}")
-            self.cn.rollback()
-
-    def insert_video_data(self, video_data: VideoInfoData):
-        """
-        Inserts video data into the VIDEO_DATA table.
 
-        :param video_data: VideoInfoData object containing the video information to insert.
-        """
+    def _write_video_data(self, video_data: VideoInfoData):
         # Convert the VideoInfoData dataclass to a dictionary
         video_dict = asdict(video_data)
 
@@ -72,30 +179,129 @@ class SummarizeDb:
             video_dict["regions_allowed"],
             video_dict["thumbnail_url"],
         )
+        self.cur.execute(sql, data)
+
+    def insert_video_data(self, video_data: VideoInfoData):
+        """
+        Inserts video data into the VIDEO_DATA table.
 
+        :param video_data: VideoInfoData object containing the video information to insert.
+        """
         try:
-            self.cur.execute(sql, data)
-            self.cn.commit()
+            with self.cn:
+                self._write_video_data(video_data)
             print("Video data inserted successfully.")
         except sqlite3.Error as e:
             print(f"An error occurred: {e}")
-            self.cn.rollback()
 
-    def insert_text(self, id: str, data: str, language: str = "en"):
+    def _write_text(self, id: str, data: str, language: str = "en"):
         self.cur.execute(
-            "INSERT INTO TRANSCRIPT_TEXT(video_id, language, data) VALUES (:1,:2)",
+            "INSERT INTO TRANSCRIPT_FULL_TEXT(video_id, language, data) VALUES (?,?,?)",
             (id, language, data),
         )
-        self.cn.commit()
+
+    def insert_text(self, id: str, data: str, language: str = "en"):
+        with self.cn:
+            self._write_text(id, data, language)
         print(f"Inserted file {id}")
 
+    def create_packed_transcript(self):
+        self.cn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS TRANSCRIPT_PACKED(
+                video_id TEXT PRIMARY KEY,
+                language TEXT,
+                line_count INTEGER NOT NULL,
+                starts BLOB NOT NULL,
+                durations BLOB NOT NULL,
+                offsets BLOB NOT NULL,
+                text_data BLOB NOT NULL,
+                created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        self.cn.commit()
+
+    def _write_packed_transcript(self, id: str, transcript: list[dict], language: str = "en"):
+        packed = PackedTranscript.from_segments(transcript)
+        self.cur.execute(
+            """
+            INSERT OR REPLACE INTO TRANSCRIPT_PACKED(
+                video_id, language, line_count, starts, durations, offsets, text_data
+            ) VALUES (?,?,?,?,?,?,?)
+            """,
+            (id, language, len(packed), *packed.to_blobs()),
+        )
+
+    def insert_packed_transcript(self, id: str, transcript: list[dict], language: str = "en"):
+        """
+        Inserts the transcript of a video as one TRANSCRIPT_PACKED record,
+        replacing the one already stored.
+
+        :param id: The id of the video.
+        :param transcript: The caption lines, dicts with text, start and duration.
+        """
+        self.create_packed_transcript()
+        with self.cn:
+            self._write_packed_transcript(id, transcript, language)
+        print(f"Inserted packed transcript {id}")
+
+    def get_packed_transcript(self, id: str) -> PackedTranscript:
+        """The packed transcript of a video, None when it is not stored packed."""
+        self.create_packed_transcript()
+        row = self.cn.execute(
+            "SELECT starts, durations, offsets, text_data FROM TRANSCRIPT_PACKED WHERE video_id = ?",
+            (id,),
+        ).fetchone()
+        return PackedTranscript(*row) if row else None
+
+    def get_transcript(self, id: str):
+        """
+        The caption lines of a video in the ``VideoInfo.get_transcript()`` form,
+        whichever way they are stored.
+        """
+        packed = self.get_packed_transcript(id)
+        if packed is not None:
+            return packed
+        rows = self.cn.execute(
+            "SELECT text_data, start_time, duration FROM TRANSCRIPT_TEXT WHERE video_id = ? ORDER BY id",
+            (id,),
+        )
+        return [{"text": row[0], "start": row[1], "duration": row[2]} for row in rows]
+
+    def get_text(self, id: str) -> str:
+        """The most recently stored full text of a video's transcript."""
+        row = self.cn.execute(
+            "SELECT data FROM TRANSCRIPT_FULL_TEXT WHERE video_id = ? ORDER BY id DESC LIMIT 1",
+            (id,),
+        ).fetchone()
+        if row:
+            return row[0]
+        packed = self.get_packed_transcript(id)
+        return packed.text if packed is not None else None
+
+    def get_video_ids(self) -> list[str]:
+        """The ids of the videos with a stored transcript text."""
+        self.create_packed_transcript()
+        return [
+            row[0]
+            for row in self.cn.execute(
+                """
+                SELECT video_id FROM TRANSCRIPT_FULL_TEXT
+                UNION
+                SELECT video_id FROM TRANSCRIPT_PACKED
+                ORDER BY video_id
+                """
+            )
+        ]
+
     def insert_chat_response(self, response: dict):
         sql = """
             INSERT INTO CHAT_RESPONSE (
                 model, message_role, message_content, done_reason,
                 done, total_duration, load_duration, prompt_eval_count,
                 prompt_eval_duration, eval_count, eval_duration
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
         data = (
             response["model"],
@@ -113,17 +319,421 @@ class SummarizeDb:
         try:
             self.cur.execute(sql, data)
             self.cn.commit()
-            print("Video data inserted successfully.")
+            print("Chat response inserted successfully.")
         except sqlite3.Error as e:
             print(f"An error occurred: {e}")
             self.cn.rollback()
 
+    def create_search_index(self, rebuild: bool = False):
+        """
+        Create the full text index of the transcript lines, kept in sync by
+        triggers on TRANSCRIPT_TEXT.
+
+        With ``rebuild`` the index is rebuilt from all existing lines in one
+        pass and merged into a single b-tree, the fast way to index an
+        existing database.
+        """
+        with self.cn:
+            self.cn.executescript(SEARCH_INDEX_SQL)
+            if rebuild:
+                self.cn.execute("INSERT INTO TRANSCRIPT_FTS(TRANSCRIPT_FTS) VALUES ('rebuild')")
+                self.cn.execute("INSERT INTO TRANSCRIPT_FTS(TRANSCRIPT_FTS) VALUES ('optimize')")
+
+    def search(self, query: str, limit: int = 20, video_id: str = None,
+               raw: bool = False) -> list[dict]:
+        """
+        Search the transcript lines, best matches first.
+
+        :param query: The words to search for; with ``raw`` an FTS5 query.
+        :param limit: Maximum number of matches.
+        :param video_id: Only search the lines of this video.
+        :return: The video id, start time, highlighted snippet, rank and a
+            link that starts the video at the match.
+        """
+        if not raw:
+            query = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+        sql = """
+            SELECT t.video_id, t.start_time,
+                snippet(TRANSCRIPT_FTS, 0, '[', ']', '...', 16),
+                bm25(TRANSCRIPT_FTS) AS rank
+            FROM TRANSCRIPT_FTS JOIN TRANSCRIPT_TEXT t ON t.id = TRANSCRIPT_FTS.rowid
+            WHERE TRANSCRIPT_FTS MATCH ?
+        """
+        params = [query]
+        if video_id:
+            sql += " AND t.video_id = ?"
+            params.append(video_id)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        return [
+            {
+                "video_id": row[0],
+                "start_time": row[1],
+                "snippet": row[2],
+                "rank": row[3],
+                "url": f"https://www.youtube.com/watch?v={row[0]}&t={int(row[1] or 0)}s",
+            }
+            for row in self.cn.execute(sql, params)
+        ]
+
+    def create_ingest_progress(self):
+        self.cn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS INGEST_PROGRESS(
+                video_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        self.cn.commit()
+
+    def get_ingest_ids(self, status: str) -> set[str]:
+        rows = self.cn.execute(
+            "SELECT video_id FROM INGEST_PROGRESS WHERE status = ?", (status,)
+        )
+        return {row[0] for row in rows}
+
+    def set_ingest_status(self, video_id: str, status: str, error: str = None):
+        sql = """
+            INSERT INTO INGEST_PROGRESS(video_id, status, attempts, error)
+            VALUES (?, ?, 1, ?)
+            ON CONFLICT(video_id) DO UPDATE SET
+                status = excluded.status,
+                attempts = attempts + 1,
+                error = excluded.error,
+                updated = CURRENT_TIMESTAMP
+        """
+        try:
+            self.cur.execute(sql, (video_id, status, error))
+            self.cn.commit()
+        except sqlite3.Error as e:
+            print(f"An error occurred: {e}")
+            self.cn.rollback()
+
+    def create_job_queue(self):
+        self.cn.executescript(JOB_QUEUE_SQL)
+        for table, column in (("CHUNK", "content_hash"), ("VIDEO_SUMMARY", "chunks_digest")):
+            columns = [row[1] for row in self.cn.execute(f"PRAGMA table_info({table})")]
+            if column not in columns:
+                # Tables created before the column was added.
+                with self.cn:
+                    self.cn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+
+    def enqueue_job(self, kind: str, payload: dict, dedup_key: str = None,
+                    max_attempts: int = 5, delay: float = 0.0) -> int:
+        """
+        Add a job to the queue.
+
+        :param kind: The stage that runs the job, e.g. ``summarize``.
+        :param payload: JSON serializable arguments of the job.
+        :param dedup_key: The job is not added while a pending or running job
+            has the same key.
+        :param delay: Seconds before the job can be claimed.
+        :return: The id of the new job, None when it was a duplicate.
+        """
+        now = time.time()
+        with self.cn:
+            cur = self.cn.execute(
+                """
+                INSERT OR IGNORE INTO JOB(
+                    kind, payload, dedup_key, status, attempts, max_attempts,
+                    available_at, created, updated
+                ) VALUES (?, ?, ?, 'pending', 0, ?, ?, ?, ?)
+                """,
+                (kind, json.dumps(payload), dedup_key, max_attempts, now + delay, now, now),
+            )
+        return cur.lastrowid if cur.rowcount else None
+
+    def claim_job(self, worker_id: str, lease_seconds: float, kinds: list[str] = None,
+                  prefer_kind: str = None) -> dict:
+        """
+        Lease the oldest job that is ready, or whose lease has expired.
+
+        Claiming is a single UPDATE, so two workers never get the same job.
+        A job reclaimed after its lease expired counts as a failed attempt
+        and goes to the dead letter status once it is out of attempts.
+
+        :param prefer_kind: Take a ready job of this kind first, so a worker
+            keeps sending the same model and prompt to Ollama.
+        :return: The job with its decoded payload, None when none is ready.
+        """
+        kind_filter = ""
+        params = []
+        if kinds:
+            kind_filter = f"AND kind IN ({','.join('?' * len(kinds))})"
+            params = list(kinds)
+        params.append(prefer_kind)
+        while True:
+            now = time.time()
+            with self.cn:
+                row = self.cn.execute(
+                    f"""
+                    UPDATE JOB SET
+                        status = 'running',
+                        attempts = attempts + 1,
+                        lease_owner = ?,
+                        lease_expires = ?,
+                        updated = ?
+                    WHERE id = (
+                        SELECT id FROM JOB
+                        WHERE ((status = 'pending' AND available_at <= ?)
+                               OR (status = 'running' AND lease_expires < ?))
+                        {kind_filter}
+                        ORDER BY kind IS ? DESC, available_at, id
+                        LIMIT 1
+                    )
+                    RETURNING id, kind, payload, attempts, max_attempts
+                    """,
+                    [worker_id, now + lease_seconds, now, now, now] + params,
+                ).fetchone()
+            if row is None:
+                return None
+            job = {
+                "id": row[0],
+                "kind": row[1],
+                "payload": json.loads(row[2]),
+                "attempts": row[3],
+                "max_attempts": row[4],
+            }
+            if job["attempts"] <= job["max_attempts"]:
+                return job
+            self._finish_job(job["id"], worker_id, "dead", "The lease expired on the last attempt.")
+
+    def heartbeat_job(self, job_id: int, worker_id: str, lease_seconds: float) -> bool:
+        """Extend the lease of a running job, False when the worker lost it."""
+        now = time.time()
+        with self.cn:
+            cur = self.cn.execute(
+                """
+                UPDATE JOB SET lease_expires = ?, updated = ?
+                WHERE id = ? AND status = 'running' AND lease_owner = ?
+                """,
+                (now + lease_seconds, now, job_id, worker_id),
+            )
+        return cur.rowcount == 1
+
+    def _finish_job(self, job_id: int, worker_id: str, status: str, error: str = None,
+                    available_at: float = None) -> bool:
+        with self.cn:
+            cur = self.cn.execute(
+                """
+                UPDATE JOB SET
+                    status = ?, last_error = COALESCE(?, last_error),
+                    available_at = COALESCE(?, available_at),
+                    lease_owner = NULL, lease_expires = NULL, updated = ?
+                WHERE id = ? AND status = 'running' AND lease_owner = ?
+                """,
+                (status, error, available_at, time.time(), job_id, worker_id),
+            )
+        return cur.rowcount == 1
+
+    def release_job(self, job_id: int, worker_id: str) -> bool:
+        """Give a running job back to the queue without counting the attempt."""
+        with self.cn:
+            cur = self.cn.execute(
+                """
+                UPDATE JOB SET
+                    status = 'pending', attempts = attempts - 1,
+                    lease_owner = NULL, lease_expires = NULL, updated = ?
+                WHERE id = ? AND status = 'running' AND lease_owner = ?
+                """,
+                (time.time(), job_id, worker_id),
+            )
+        return cur.rowcount == 1
+
+    def complete_job(self, job_id: int, worker_id: str) -> bool:
+        """Mark a job done, False when the worker no longer held its lease."""
+        return self._finish_job(job_id, worker_id, "done")
+
+    def fail_job(self, job: dict, worker_id: str, error: str, backoff_seconds: float = 5.0) -> str:
+        """
+        Record a failed attempt. The job is retried after an exponential,
+        jittered backoff, or dead lettered once it is out of attempts.
+
+        :return: The new status of the job.
+        """
+        if job["attempts"] >= job["max_attempts"]:
+            status, available_at = "dead", None
+        else:
+            delay = backoff_seconds * 2 ** (job["attempts"] - 1)
+            status, available_at = "pending", time.time() + delay * random.uniform(0.5, 1.5)
+        self._finish_job(job["id"], worker_id, status, error, available_at)
+        return status
+
+    def retry_dead_jobs(self, kind: str = None) -> int:
+        """Give the dead lettered jobs a fresh set of attempts."""
+        sql = """
+            UPDATE JOB SET status = 'pending', attempts = 0, available_at = ?, updated = ?
+            WHERE status = 'dead'
+        """
+        params = [time.time(), time.time()]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        with self.cn:
+            return self.cn.execute(sql, params).rowcount
+
+    def get_job_counts(self) -> list[tuple]:
+        """The number of jobs per kind and status."""
+        return self.cn.execute(
+            "SELECT kind, status, COUNT(*) FROM JOB GROUP BY kind, status ORDER BY kind, status"
+        ).fetchall()
+
+    def get_video_title(self, id: str) -> str:
+        row = self.cn.execute(
+            "SELECT title FROM VIDEO_DATA WHERE video_id = ? ORDER BY id DESC LIMIT 1", (id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def insert_chunks(self, id: str, chunks: list[str], token_counts: list[int],
+                      hashes: list[str] = None) -> list[int]:
+        """
+        Replace the chunks of a video.
+
+        A chunk whose content hash matches one of the chunks it replaces
+        keeps that summary, the others start without one.
+
+        :param hashes: The content hash of every chunk, without them no
+            summary is kept.
+        :return: The indexes of the chunks that need a summary.
+        """
+        hashes = hashes or [None] * len(chunks)
+        with self.cn:
+            summaries = dict(self.cn.execute(
+                """
+                SELECT content_hash, summary FROM CHUNK
+                WHERE video_id = ? AND content_hash IS NOT NULL AND summary IS NOT NULL
+                """,
+                (id,),
+            ).fetchall())
+            self.cn.execute("DELETE FROM CHUNK WHERE video_id = ?", (id,))
+            rows = [
+                (id, index, chunk, count, content_hash, summaries.get(content_hash))
+                for index, (chunk, count, content_hash)
+                in enumerate(zip(chunks, token_counts, hashes))
+            ]
+            self.cn.executemany(
+                """
+                INSERT INTO CHUNK(video_id, chunk_index, text_data, token_count, content_hash, summary)
+                VALUES (?,?,?,?,?,?)
+                """,
+                rows,
+            )
+        return [row[1] for row in rows if row[5] is None]
+
+    def get_chunk(self, id: str, index: int, content_hash: str = None) -> str:
+        """The text of a chunk, None when it is not stored with ``content_hash``."""
+        row = self.cn.execute(
+            """
+            SELECT text_data FROM CHUNK
+            WHERE video_id = ? AND chunk_index = ? AND (? IS NULL OR content_hash = ?)
+            """,
+            (id, index, content_hash, content_hash),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_chunk_summary(self, id: str, index: int, summary: str,
+                          content_hash: str = None) -> bool:
+        """
+        Store the summary of a chunk.
+
+        :param content_hash: The hash of the chunk the summary was made
+            from, nothing is stored when the chunk at ``index`` was replaced
+            by another one since.
+        :return: True when the summary was stored and every chunk of the
+            video now has one.
+        """
+        with self.cn:
+            updated = self.cn.execute(
+                """
+                UPDATE CHUNK SET summary = ?
+                WHERE video_id = ? AND chunk_index = ? AND (? IS NULL OR content_hash = ?)
+                """,
+                (summary, id, index, content_hash, content_hash),
+            ).rowcount
+            missing = self.cn.execute(
+                "SELECT COUNT(*) FROM CHUNK WHERE video_id = ? AND summary IS NULL", (id,)
+            ).fetchone()[0]
+        return updated > 0 and missing == 0
+
+    def get_chunk_summaries(self, id: str) -> tuple[list[str], list[str]]:
+        """The content hashes and the summaries of the chunks of a video, in order."""
+        rows = self.cn.execute(
+            "SELECT content_hash, summary FROM CHUNK WHERE video_id = ? ORDER BY chunk_index",
+            (id,),
+        ).fetchall()
+        return [row[0] for row in rows], [row[1] for row in rows]
+
+    def get_summary(self, id: str, model: str = None, chunks_digest: str = None) -> str:
+        """
+        The latest summary of a video, by ``model`` when given.
+
+        :param chunks_digest: Only return the summary when it was made from
+            the chunks with this digest.
+        """
+        row = self.cn.execute(
+            """
+            SELECT summary, chunks_digest FROM VIDEO_SUMMARY
+            WHERE video_id = ? AND (? IS NULL OR model = ?)
+            ORDER BY id DESC LIMIT 1
+            """,
+            (id, model, model),
+        ).fetchone()
+        if row is None or (chunks_digest is not None and row[1] != chunks_digest):
+            return None
+        return row[0]
+
+    def insert_summary(self, id: str, model: str, summary: str, chunks_digest: str = None):
+        with self.cn:
+            self.cn.execute(
+                """
+                INSERT INTO VIDEO_SUMMARY(video_id, model, summary, chunks_digest)
+                VALUES (?,?,?,?)
+                """,
+                (id, model, summary, chunks_digest),
+            )
+
+    def create_model_profile(self):
+        self.cn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS MODEL_PROFILE(
+                model TEXT PRIMARY KEY,
+                modified_at TEXT,
+                context_length INTEGER NOT NULL,
+                token_ratio REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+            """
+        )
+
+    def get_model_profile(self, model: str) -> tuple:
+        """The stored ``(modified_at, context_length, token_ratio)`` of a model."""
+        self.create_model_profile()
+        return self.cn.execute(
+            "SELECT modified_at, context_length, token_ratio FROM MODEL_PROFILE WHERE model = ?",
+            (model,),
+        ).fetchone()
+
+    def set_model_profile(self, model: str, modified_at: str, context_length: int,
+                          token_ratio: float):
+        self.create_model_profile()
+        with self.cn:
+            self.cn.execute(
+                """
+                INSERT OR REPLACE INTO MODEL_PROFILE(
+                    model, modified_at, context_length, token_ratio, updated
+                ) VALUES (?,?,?,?,?)
+                """,
+                (model, modified_at, context_length, token_ratio, time.time()),
+            )
 
     @staticmethod
-    def init_db(
-        db: str = appConfig.get("DATABASE_PATH"),
-        schema: str = appConfig.get("SCHEMA_FILE"),
-    ):
+    def init_db(db: str = None, schema: str = None):
+        db = db or appConfig.get("DATABASE_PATH")
+        schema = schema or appConfig.get("SCHEMA_FILE")
         print("Initializing the database.....")
         base_dir = os.path.abspath(os.path.dirname(__file__))
         schema_path = os.path.join(base_dir, schema)
@@ -165,3 +775,98 @@ class SummarizeDb:
             print(f"Dropped the database:{os.path.abspath(db)}.")
         else:
             print(f"Database {os.path.abspath(db)} not found.")
+
+
+class ResponseCache:
+    """
+    Content addressed cache of LLM responses stored next to the summarizer
+    tables. Entries are keyed by a hash of the model, prompt template and
+    input text and the least recently used entries are evicted once the
+    cache holds more than ``max_entries`` responses.
+
+    The connection is shared by the threads of the async summaries, one at
+    a time.
+    """
+
+    def __init__(
+        self,
+        db_file: str = None,
+        max_entries: int = None,
+    ):
+        self.db_file = db_file or appConfig.get("DATABASE_PATH")
+        self.max_entries = max_entries or int(appConfig.get("LLM_CACHE_MAX_ENTRIES"))
+        self.hits = 0
+        self.misses = 0
+        self.cn = configure_connection(connect(self.db_file, check_same_thread=False))
+        self._lock = threading.Lock()
+        self.cn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS LLM_CACHE(
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE INDEX IF NOT EXISTS LLM_CACHE_LAST_USED ON LLM_CACHE(last_used);
+            """
+        )
+
+    @staticmethod
+    def make_key(model: str, prompt_template: str, text: str) -> str:
+        digest = hashlib.sha256()
+        for part in (model, prompt_template, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self.cn.execute(
+                "SELECT response FROM LLM_CACHE WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.cn.execute(
+                "UPDATE LLM_CACHE SET last_used = ? WHERE cache_key = ?", (time.time(), key)
+            )
+            self.cn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, response) -> None:
+        if hasattr(response, "model_dump"):
+            response = response.model_dump()
+        data = json.dumps(response, default=str)
+        with self._lock:
+            try:
+                self.cn.execute(
+                    "INSERT OR REPLACE INTO LLM_CACHE(cache_key, model, response, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, model, data, time.time()),
+                )
+                self.evict()
+                self.cn.commit()
+            except sqlite3.Error as e:
+                print(f"An error occurred: {e}")
+                self.cn.rollback()
+
+    def evict(self) -> None:
+        """Remove the least recently used entries above ``max_entries``."""
+        self.cn.execute(
+            """
+            DELETE FROM LLM_CACHE WHERE cache_key IN (
+                SELECT cache_key FROM LLM_CACHE
+                ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def report(self) -> str:
+        return f"LLM cache: {self.hits} hits, {self.misses} misses."
+
+    def close(self) -> None:
+        self.cn.close()
+
@@ -0,0 +1,194 @@
+import json
+import os
+
+import numpy as np
+
+ID_DTYPE = np.dtype([("video_id", "S24"), ("chunk", "<i4")])
+
+
+class EmbeddingIndex:
+    """
+    Append only index of chunk embeddings backed by memory mapped files.
+
+    ``<path>.f32`` holds the unit length float32 vectors as a row major
+    matrix, ``<path>.ids`` the matching fixed width ``(video_id, chunk)``
+    records and ``<path>.json`` the dimension and embedding model. Opening
+    the index only reads the small json file and the file sizes; the
+    matrix is paged in by the operating system while it is scanned.
+
+    Removed rows keep their place in both files with a blank video id, and
+    the search skips them.
+    """
+
+    def __init__(self, path, dim: int = None, model: str = None):
+        self.path = str(path)
+        self.meta_path = f"{self.path}.json"
+        self.matrix_path = f"{self.path}.f32"
+        self.ids_path = f"{self.path}.ids"
+        if os.path.isfile(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.dim = meta["dim"]
+            self.model = meta.get("model")
+        else:
+            self.dim = dim
+            self.model = model
+
+    def __len__(self) -> int:
+        if not self.dim:
+            return 0
+        # A crash between the two appends leaves extra vectors without ids,
+        # those rows are ignored.
+        return min(
+            _file_size(self.matrix_path) // (self.dim * 4),
+            _file_size(self.ids_path) // ID_DTYPE.itemsize,
+        )
+
+    def _matrix(self, rows: int) -> np.ndarray:
+        return np.memmap(self.matrix_path, dtype="<f4", mode="r", shape=(rows, self.dim))
+
+    def _ids(self, rows: int) -> np.ndarray:
+        return np.memmap(self.ids_path, dtype=ID_DTYPE, mode="r", shape=(rows,))
+
+    def video_ids(self) -> set[str]:
+        rows = len(self)
+        if not rows:
+            return set()
+        return {
+            video_id.decode("utf-8")
+            for video_id in np.unique(self._ids(rows)["video_id"])
+            if video_id
+        }
+
+    def remove(self, video_id: str) -> int:
+        """
+        Blank the ids of the rows of a video, before embedding it again.
+
+        :return: The number of rows removed.
+        """
+        rows = len(self)
+        if not rows:
+            return 0
+        ids = np.memmap(self.ids_path, dtype=ID_DTYPE, mode="r+", shape=(rows,))
+        video_ids = ids["video_id"]
+        matches = video_ids == video_id.encode("utf-8")
+        removed = int(matches.sum())
+        if removed:
+            video_ids[matches] = b""
+            ids.flush()
+        return removed
+
+    def append(self, video_id: str, vectors) -> None:
+        """Append the chunk vectors of a video, in chunk order."""
+        vectors = np.atleast_2d(np.asarray(vectors, dtype="<f4"))
+        if vectors.size == 0:
+            return
+        vectors = _normalize(vectors)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got {vectors.shape[1]}")
+        if not os.path.isfile(self.meta_path):
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                json.dump({"dim": self.dim, "model": self.model}, f)
+
+        ids = np.zeros(len(vectors), dtype=ID_DTYPE)
+        ids["video_id"] = video_id.encode("utf-8")
+        ids["chunk"] = np.arange(len(vectors))
+        with open(self.matrix_path, "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self.ids_path, "ab") as f:
+            f.write(ids.tobytes())
+
+    def search(self, queries, k: int = 10, batch_rows: int = 65536) -> list[list[dict]]:
+        """
+        Top ``k`` chunks by cosine similarity for every query vector.
+
+        The matrix is scanned in blocks of ``batch_rows`` rows, each block
+        scored against all queries with one matrix product.
+        """
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype="<f4")))
+        rows = len(self)
+        best_scores = np.full((len(queries), k), -np.inf, dtype="<f4")
+        best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+        ids = self._ids(rows) if rows else None
+        if rows:
+            matrix = self._matrix(rows)
+            for start in range(0, rows, batch_rows):
+                scores = queries @ np.asarray(matrix[start:start + batch_rows]).T
+                scores[:, ids["video_id"][start:start + batch_rows] == b""] = -np.inf
+                top = min(k, scores.shape[1])
+                candidates = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+                scores = np.concatenate(
+                    [best_scores, np.take_along_axis(scores, candidates, axis=1)], axis=1
+                )
+                candidates = np.concatenate([best_rows, candidates + start], axis=1)
+                order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+                best_scores = np.take_along_axis(scores, order, axis=1)
+                best_rows = np.take_along_axis(candidates, order, axis=1)
+
+        results = []
+        for query_scores, query_rows in zip(best_scores, best_rows):
+            results.append([
+                {
+                    "video_id": ids[row]["video_id"].decode("utf-8"),
+                    "chunk": int(ids[row]["chunk"]),
+                    "score": float(score),
+                }
+                for score, row in zip(query_scores, query_rows)
+                if row >= 0 and score > -np.inf
+            ])
+        return results
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype("<f4")
+
+
+def embed_texts(texts: list[str], model: str, client=None) -> np.ndarray:
+    """Embed the texts with the Ollama embeddings endpoint."""
+    import ollama
+
+    from youtube_summarizer.ratelimit import ollama_controller
+    from youtube_summarizer.scheduler import get_scheduler
+
+    client = client or ollama
+    controller = ollama_controller()
+    with get_scheduler().slot(model, "embed"):
+        if hasattr(client, "embed"):
+            vectors = controller.call(client.embed, model=model, input=texts)["embeddings"]
+        else:
+            vectors = [
+                controller.call(client.embeddings, model=model, prompt=text)["embedding"]
+                for text in texts
+            ]
+    return np.asarray(vectors, dtype="<f4")
+
+
+def embed_video(video_id: str, text: str, index: EmbeddingIndex, model: str,
+                chunk_tokens: int = 512, client=None) -> int:
+    """
+    Split a transcript with ``split_transcript_text``, embed the chunks and
+    append them to the index, in place of the chunks the video already has.
+
+    :return: The number of chunks added.
+    """
+    from youtube_summarizer.ollama_summary import split_transcript_text
+
+    chunks = split_transcript_text(text, max_tokens=chunk_tokens).chunks
+    if not chunks:
+        return 0
+    vectors = embed_texts(chunks, model, client=client)
+    index.remove(video_id)
+    index.append(video_id, vectors)
+    return len(chunks)
@@ -0,0 +1,286 @@
+import contextlib
+import csv
+import io
+import json
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Iterator
+
+from youtube_summarizer.packed_transcript import PackedTranscript
+
+FORMATS = ("jsonl", "csv", "parquet")
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    A set of rows to export.
+
+    :param parts: ``(table, expressions)`` pairs whose rows are concatenated.
+    :param columns: Name and Parquet type of every exported column.
+    :param epoch: ``created`` holds epoch seconds instead of an SQL timestamp.
+    :param model: Whether the rows have a ``model`` column to filter on.
+    :param transform: Turns the selected rows into the exported ones.
+    """
+    parts: tuple
+    columns: tuple
+    epoch: bool = False
+    model: bool = False
+    transform: Callable = None
+
+
+def _transcript_rows(rows: list[tuple]) -> list[tuple]:
+    return [
+        row[:3] + (row[3] if row[4] is None else PackedTranscript(*row[4:]).text,)
+        for row in rows
+    ]
+
+
+def _columns(text: str) -> tuple:
+    return tuple(column.strip() for column in text.split(","))
+
+
+DATASETS = {
+    "videos": Dataset(
+        parts=(("VIDEO_DATA", _columns("""
+            id, video_id, title, upload_date, duration, description, genre, is_paid,
+            is_unlisted, is_family_friendly, channel_id, views, likes, dislikes,
+            regionsAllowed, thumbnail_url, created
+        """)),),
+        columns=(
+            ("id", "int64"), ("video_id", "string"), ("title", "string"),
+            ("upload_date", "string"), ("duration", "string"), ("description", "string"),
+            ("genre", "string"), ("is_paid", "int64"), ("is_unlisted", "int64"),
+            ("is_family_friendly", "int64"), ("channel_id", "string"), ("views", "int64"),
+            ("likes", "int64"), ("dislikes", "int64"), ("regions_allowed", "string"),
+            ("thumbnail_url", "string"), ("created", "string"),
+        ),
+    ),
+    "transcripts": Dataset(
+        parts=(
+            ("TRANSCRIPT_FULL_TEXT",
+             _columns("video_id, language, created, data, NULL, NULL, NULL, NULL")),
+            ("TRANSCRIPT_PACKED",
+             _columns("video_id, language, created, NULL, starts, durations, offsets, text_data")),
+        ),
+        columns=(
+            ("video_id", "string"), ("language", "string"), ("created", "string"),
+            ("text", "string"),
+        ),
+        transform=_transcript_rows,
+    ),
+    "summaries": Dataset(
+        parts=(("VIDEO_SUMMARY", _columns("id, video_id, model, summary, created")),),
+        columns=(
+            ("id", "int64"), ("video_id", "string"), ("model", "string"),
+            ("summary", "string"), ("created", "string"),
+        ),
+        model=True,
+    ),
+    "metrics": Dataset(
+        parts=(("LLM_METRICS", _columns("""
+            id, model, source, video_id, chunk_chars, total_duration, load_duration,
+            prompt_eval_count, prompt_eval_duration, eval_count, eval_duration,
+            ttft_seconds, wall_seconds, created
+        """)),),
+        columns=(
+            ("id", "int64"), ("model", "string"), ("source", "string"), ("video_id", "string"),
+            ("chunk_chars", "int64"), ("total_duration", "int64"), ("load_duration", "int64"),
+            ("prompt_eval_count", "int64"), ("prompt_eval_duration", "int64"),
+            ("eval_count", "int64"), ("eval_duration", "int64"), ("ttft_seconds", "float64"),
+            ("wall_seconds", "float64"), ("created", "float64"),
+        ),
+        epoch=True,
+        model=True,
+    ),
+}
+
+
+def _bound(value: datetime, epoch: bool):
+    """A date bound in the form of the ``created`` column, naive dates are UTC."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    if epoch:
+        return value.timestamp()
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _csv_field(expression: str, type_name: str) -> str:
+    if type_name != "string":
+        return f"ifnull({expression}, '')"
+    # Quoted when it holds a separator, a quote or a line break.
+    return (
+        f"""CASE WHEN {expression} GLOB '*[,"'||char(10, 13)||']*' """
+        f"""THEN '"'||replace({expression}, '"', '""')||'"' ELSE ifnull({expression}, '') END"""
+    )
+
+
+def _encoded_row(dataset: Dataset, expressions: tuple, encoding: str) -> str:
+    """An SQL expression encoding a whole row as a JSON object or a CSV line."""
+    if encoding == "json":
+        pairs = (f"'{name}', {expression}"
+                 for (name, _), expression in zip(dataset.columns, expressions))
+        return f"json_object({', '.join(pairs)})"
+    return "||','||".join(
+        _csv_field(expression, type_name)
+        for (_, type_name), expression in zip(dataset.columns, expressions)
+    )
+
+
+def build_query(cn: sqlite3.Connection, dataset: Dataset, since: datetime = None,
+                until: datetime = None, channel: str = None, model: str = None,
+                encoding: str = None) -> tuple:
+    """
+    The SQL and parameters selecting the rows of ``dataset``. Tables that
+    were never created are left out.
+
+    :param encoding: ``json`` or ``csv`` to select every row as a single
+        string instead, encoded by SQLite, which is several times faster
+        than encoding the rows in Python. Its floats keep 15 significant
+        digits.
+    :return: ``(sql, params)``, the SQL is None when no table exists.
+    """
+    if model is not None and not dataset.model:
+        raise ValueError("The rows of this dataset have no model to filter on.")
+    conditions, params = [], []
+    if since is not None:
+        conditions.append("created >= ?")
+        params.append(_bound(since, dataset.epoch))
+    if until is not None:
+        conditions.append("created < ?")
+        params.append(_bound(until, dataset.epoch))
+    if channel is not None:
+        conditions.append("video_id IN (SELECT video_id FROM VIDEO_DATA WHERE channel_id = ?)")
+        params.append(channel)
+    if model is not None:
+        conditions.append("model = ?")
+        params.append(model)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    tables = {row[0] for row in cn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    selects = []
+    for table, expressions in dataset.parts:
+        if table not in tables:
+            continue
+        if encoding is not None:
+            select_list = _encoded_row(dataset, expressions, encoding)
+        else:
+            select_list = ", ".join(expressions)
+        selects.append(f"SELECT {select_list} FROM {table}{where}")
+    if not selects:
+        return None, []
+    return " UNION ALL ".join(selects), params * len(selects)
+
+
+def iter_batches(cn: sqlite3.Connection, dataset: Dataset, batch_size: int = 10000,
+                 encoding: str = None, **filters) -> Iterator[list[tuple]]:
+    """
+    Yield the rows of ``dataset`` in batches of ``batch_size``.
+
+    The rows are stepped through with ``fetchmany``, so at most one batch
+    is held in memory however large the table.
+    """
+    sql, params = build_query(cn, dataset, encoding=encoding, **filters)
+    if sql is None:
+        return
+    cursor = cn.execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield dataset.transform(rows) if dataset.transform is not None else rows
+    finally:
+        cursor.close()
+
+
+def write_jsonl(out, columns: list[str], batches: Iterator[list[tuple]]) -> int:
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    count = 0
+    for rows in batches:
+        out.write("\n".join([encode(dict(zip(columns, row))) for row in rows]))
+        out.write("\n")
+        count += len(rows)
+    return count
+
+
+def write_encoded(out, batches: Iterator[list[tuple]], header: str = None,
+                  newline: str = "\n") -> int:
+    """Write rows selected with an ``encoding``, one per line."""
+    if header is not None:
+        out.write(header + newline)
+    count = 0
+    for rows in batches:
+        out.write(newline.join([row[0] for row in rows]))
+        out.write(newline)
+        count += len(rows)
+    return count
+
+
+def write_csv(out, columns: list[str], batches: Iterator[list[tuple]]) -> int:
+    # Every batch is formatted in memory and written at once, the csv module
+    # would otherwise make one write per row.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for rows in batches:
+        writer.writerows(rows)
+        out.write(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+        count += len(rows)
+    out.write(buffer.getvalue())
+    return count
+
+
+def write_parquet(path: str, columns: tuple, batches: Iterator[list[tuple]]) -> int:
+    """Write the batches as the row groups of a Parquet file, needs ``pyarrow``."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Exporting to Parquet needs pyarrow: pip install pyarrow") from None
+
+    schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in columns])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in batches:
+            arrays = [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*rows), schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(rows)
+    return count
+
+
+def export(name: str, fmt: str, out, cn: sqlite3.Connection, batch_size: int = 10000,
+           **filters) -> int:
+    """
+    Stream a dataset from the database to ``out``.
+
+    :param name: One of ``DATASETS``.
+    :param fmt: One of ``FORMATS``.
+    :param out: A text file for ``jsonl`` and ``csv``, a path for ``parquet``.
+    :param filters: ``since``, ``until``, ``channel`` and ``model``, see
+        ``build_query``.
+    :return: The number of rows written.
+    """
+    dataset = DATASETS[name]
+    columns = [column for column, _ in dataset.columns]
+    encoded = fmt != "parquet" and dataset.transform is None
+    encoding = ("csv" if fmt == "csv" else "json") if encoded else None
+    batches = iter_batches(cn, dataset, batch_size, encoding=encoding, **filters)
+    with contextlib.closing(batches):
+        if fmt == "parquet":
+            return write_parquet(out, dataset.columns, batches)
+        if encoding == "csv":
+            # The line terminator of the csv module.
+            return write_encoded(out, batches, header=",".join(columns), newline="\r\n")
+        if encoding == "json":
+            return write_encoded(out, batches)
+        if fmt == "csv":
+            return write_csv(out, columns, batches)
+        return write_jsonl(out, columns, batches)
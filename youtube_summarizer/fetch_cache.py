@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+from youtube_summarizer.config import FETCH_CACHE_PATH, appConfig
+
+# The file name of an entry, see ``FetchCache._path``.
+ENTRY_RE = re.compile(r"[0-9a-f]{40}\.gz")
+
+
+class OfflineCacheMiss(LookupError):
+    pass
+
+
+class FetchCache:
+    """
+    Disk cache of raw fetches, watch page html and transcript segments.
+
+    Every entry is a gzip file under ``root/<kind>/``, only those files are
+    counted and evicted, whatever else is under ``root``. Entries older than
+    the ttl of their kind are refetched, and the least recently used
+    entries are removed once the cache grows past ``max_bytes``. In offline
+    mode the cache never fetches: stale entries are served and a missing
+    entry raises ``OfflineCacheMiss``.
+    """
+
+    def __init__(self, root: Path = FETCH_CACHE_PATH, ttls: dict = None,
+                 max_bytes: int = 1024 * 1024 * 1024, offline: bool = False):
+        self.root = Path(root)
+        self.ttls = ttls or {}
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, kind: str, key: str) -> Path:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self.root / kind / digest[:2] / f"{digest}.gz"
+
+    def get(self, kind: str, key: str):
+        path = self._path(kind, key)
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        ttl = self.ttls.get(kind)
+        if not self.offline and ttl is not None and time.time() - mtime > ttl:
+            return None
+        try:
+            with gzip.open(path, "rb") as f:
+                data = f.read()
+        except (OSError, EOFError):
+            return None
+        # The modification time records the fetch, the access time the last
+        # use, so eviction removes the least recently used entries first.
+        try:
+            os.utime(path, (time.time(), mtime))
+        except OSError:
+            # Evicted meanwhile or not ours to touch, the data is still good.
+            pass
+        return data
+
+    def put(self, kind: str, key: str, data: bytes) -> None:
+        path = self._path(kind, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            f.write(data)
+        with self._lock:
+            # The entry may replace an expired one, whose size is no longer held.
+            try:
+                replaced = path.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+            if self._size is None:
+                self._size = sum(size for _, _, size in self._entries())
+            else:
+                self._size += path.stat().st_size - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def get_or_fetch(self, kind: str, key: str, fetch: Callable[[], bytes]) -> bytes:
+        data = self.get(kind, key)
+        if data is not None:
+            return data
+        if self.offline:
+            raise OfflineCacheMiss(f"No cached {kind} for {key} in offline mode")
+        data = fetch()
+        self.put(kind, key, data)
+        return data
+
+    def get_or_fetch_json(self, kind: str, key: str, fetch: Callable[[], object]):
+        data = self.get_or_fetch(
+            kind, key, lambda: json.dumps(fetch()).encode("utf-8")
+        )
+        return json.loads(data)
+
+    def _entries(self):
+        """The ``(path, last use, size)`` of the entries, the files named like one in a kind."""
+        for path in self.root.glob("*/??/*.gz"):
+            if not ENTRY_RE.fullmatch(path.name) or path.parent.name != path.name[:2]:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield path, stat.st_atime, stat.st_size
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until the cache is at 90% of its budget."""
+        target = self.max_bytes * 0.9
+        for path, _, size in sorted(self._entries(), key=lambda entry: entry[1]):
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except FileNotFoundError:
+                pass
+
+
+@lru_cache(maxsize=None)
+def get_fetch_cache() -> FetchCache:
+    """The process wide fetch cache, configured from the app config."""
+    return FetchCache(
+        root=FETCH_CACHE_PATH,
+        ttls={
+            "html": float(appConfig.get("FETCH_CACHE_HTML_TTL")),
+            "transcript": float(appConfig.get("FETCH_CACHE_TRANSCRIPT_TTL")),
+        },
+        max_bytes=int(float(appConfig.get("FETCH_CACHE_MAX_MB")) * 1024 * 1024),
+    )
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+
+from youtube_summarizer.config import appConfig
+from youtube_summarizer.ratelimit import get_controller
+
+
+class HttpClient:
+    """
+    Shared HTTP session for the YouTube fetches.
+
+    Keeps a pool of keep-alive connections per host, negotiates compressed
+    transfer (brotli when a brotli package is installed, gzip and deflate
+    otherwise) and applies a connect and read timeout to every request.
+    Responses carrying an ``ETag`` or ``Last-Modified`` header are
+    remembered, so fetching the same url again sends a conditional request
+    and a ``304 Not Modified`` answer reuses the stored body.
+
+    Every request goes through the ``HostController`` of its host: at most
+    ``rate_per_second`` requests a second, an adaptive number in flight,
+    and a 429 or 5xx answer is retried after its ``Retry-After`` or a
+    jittered backoff.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "https://www.youtube.com",
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        pool_size: int = 16,
+        max_conditional_entries: int = 32,
+        rate_per_second: float = 0.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.rate_per_second = rate_per_second
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_conditional_entries = max_conditional_entries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(make_headers(accept_encoding=True))
+        self.session.headers["Accept-Language"] = "en-US,en;q=0.9"
+        self._conditional = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str, conditional: bool = True) -> bytes:
+        """Fetch ``url`` and return the decoded body."""
+        headers = {}
+        with self._lock:
+            cached = self._conditional.get(url) if conditional else None
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = get_controller(url, self.rate_per_second).call(self._get, url, headers)
+        if response.status_code == 304 and cached is not None:
+            with self._lock:
+                self._conditional.move_to_end(url)
+            return cached[2]
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if conditional and (etag or last_modified):
+            with self._lock:
+                self._conditional[url] = (etag, last_modified, response.content)
+                self._conditional.move_to_end(url)
+                while len(self._conditional) > self.max_conditional_entries:
+                    self._conditional.popitem(last=False)
+        return response.content
+
+    def _get(self, url: str, headers: dict) -> requests.Response:
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def watch_page(self, video_id: str) -> bytes:
+        return self.get(f"{self.base_url}/watch?v={video_id}")
+
+    def fetch_transcript(self, video_id: str, languages=("en",)) -> list[dict]:
+        """Fetch the transcript segments of a video over the shared session."""
+        from youtube_transcript_api import YouTubeTranscriptApi
+
+        try:
+            api = YouTubeTranscriptApi(http_client=self.session)
+        except TypeError:
+            # Before 1.0 the api only had static methods with their own session.
+            return YouTubeTranscriptApi.get_transcript(video_id, languages=languages)
+        transcript = get_controller(self.base_url, self.rate_per_second).call(
+            api.fetch, video_id, languages=languages
+        )
+        return transcript.to_raw_data()
+
+    def close(self):
+        self.session.close()
+
+
+@lru_cache(maxsize=None)
+def get_http_client() -> HttpClient:
+    """The process wide client, configured from the app config."""
+    return HttpClient(
+        base_url=appConfig.get("YOUTUBE_BASE_URL"),
+        connect_timeout=float(appConfig.get("HTTP_CONNECT_TIMEOUT")),
+        read_timeout=float(appConfig.get("HTTP_READ_TIMEOUT")),
+        pool_size=int(appConfig.get("HTTP_POOL_SIZE")),
+        rate_per_second=float(appConfig.get("HTTP_RATE_PER_SECOND")),
+    )
@@ -0,0 +1,79 @@
+import logging
+import sys
+import timeit
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, TextIO
+
+from youtube_summarizer.database import SummarizeDb
+from youtube_summarizer.video_info import VideoInfo
+
+logger = logging.getLogger(__name__)
+
+
+def read_video_ids(stream: TextIO) -> list[str]:
+    """
+    Read video ids from a file like object, one per line.
+
+    Blank lines and lines starting with ``#`` are ignored and duplicates are
+    dropped while keeping the original order.
+    """
+    video_ids = []
+    seen = set()
+    for line in stream:
+        video_id = line.strip()
+        if not video_id or video_id.startswith("#") or video_id in seen:
+            continue
+        seen.add(video_id)
+        video_ids.append(video_id)
+    return video_ids
+
+
+def fetch_video(video_id: str):
+    """Fetch the metadata, transcript and text of a video."""
+    info = VideoInfo(video_id)
+    return info.video_data, info.get_transcript(), info.get_text()
+
+
+def ingest_batch(video_ids: Iterable[str], db: SummarizeDb, workers: int = 8,
+                 retry_failed: bool = True):
+    """
+    Fetch many videos with a thread pool and store them in the database.
+
+    Only the worker threads touch the network. Every database write happens
+    on the calling thread, which is the single writer. The outcome of each
+    video is recorded in INGEST_PROGRESS, so a rerun skips the videos that
+    are already done.
+
+    :return: The number of videos ingested and the number that failed.
+    """
+    db.create_ingest_progress()
+    skip = db.get_ingest_ids("done")
+    if not retry_failed:
+        skip |= db.get_ingest_ids("failed")
+    pending = [video_id for video_id in video_ids if video_id not in skip]
+    print(f"Ingesting {len(pending)} videos, {len(skip)} already processed.")
+
+    done = failed = 0
+    start_time = timeit.default_timer()
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {pool.submit(fetch_video, video_id): video_id for video_id in pending}
+        for future in as_completed(futures):
+            video_id = futures[future]
+            try:
+                video_data, transcript, text = future.result()
+                db.insert_video(video_data, transcript, text)
+                db.set_ingest_status(video_id, "done")
+                done += 1
+                logger.debug("Ingested %s", video_id)
+            except Exception as e:
+                logger.warning("Ingest of %s failed: %s: %s", video_id, type(e).__name__, e)
+                db.set_ingest_status(video_id, "failed", error=f"{type(e).__name__}: {e}")
+                failed += 1
+            print(f"[{done + failed}/{len(pending)}] {video_id}", file=sys.stderr)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    elapsed_time = timeit.default_timer() - start_time
+    print(f"Ingested {done} videos, {failed} failed in {elapsed_time:.1f} seconds.")
+    return done, failed
@@ -0,0 +1,239 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Iterable
+
+from youtube_summarizer.config import appConfig
+from youtube_summarizer.database import ResponseCache, SummarizeDb
+
+logger = logging.getLogger(__name__)
+
+# The pipeline of a video: every stage enqueues the next one.
+STAGES = ("ingest", "chunk", "summarize", "reduce")
+
+
+def _enqueue(db: SummarizeDb, kind: str, payload: dict, dedup_key: str):
+    return db.enqueue_job(
+        kind, payload, dedup_key=dedup_key,
+        max_attempts=int(appConfig.get("JOB_MAX_ATTEMPTS")),
+    )
+
+
+def enqueue_videos(db: SummarizeDb, video_ids: Iterable[str], stage: str = "ingest") -> int:
+    """
+    Queue videos at the ``ingest`` stage, or at ``chunk`` for videos whose
+    text is already stored.
+
+    A video queued again is chunked again, and only the chunks whose text
+    changed since its last run are summarised.
+
+    :return: The number of jobs added, videos already queued are skipped.
+    """
+    db.create_job_queue()
+    added = 0
+    for video_id in video_ids:
+        if _enqueue(db, stage, {"video_id": video_id}, f"{stage}:{video_id}") is not None:
+            added += 1
+    return added
+
+
+def run_ingest(db: SummarizeDb, cache: ResponseCache, payload: dict):
+    from youtube_summarizer.ingest import fetch_video
+
+    video_id = payload["video_id"]
+    video_data, transcript, text = fetch_video(video_id)
+    db.insert_video(video_data, transcript, text)
+    _enqueue(db, "chunk", {"video_id": video_id}, f"chunk:{video_id}")
+
+
+def run_chunk(db: SummarizeDb, cache: ResponseCache, payload: dict):
+    from youtube_summarizer.ollama_summary import (
+        OLLAMA_MODEL, chunk_hash, chunks_digest, split_transcript_text,
+    )
+
+    video_id = payload["video_id"]
+    text = db.get_text(video_id)
+    if text is None:
+        raise LookupError(f"No transcript stored for {video_id}.")
+    title = db.get_video_title(video_id)
+    result = split_transcript_text(text, title=title, stable=True)
+    hashes = [chunk_hash(chunk, title) for chunk in result.chunks]
+    missing = db.insert_chunks(video_id, result.chunks, result.token_counts, hashes)
+    if not missing and db.get_summary(
+        video_id, OLLAMA_MODEL, chunks_digest=chunks_digest(hashes)
+    ) is not None:
+        logger.debug("Chunks of %s unchanged, summary kept", video_id)
+        return
+    for index in missing:
+        # A job queued for an earlier chunk at this index does not store its summary.
+        _enqueue(db, "summarize", {"video_id": video_id, "chunk": index, "hash": hashes[index]},
+                 f"summarize:{video_id}:{index}:{hashes[index]}")
+    if not missing:
+        _enqueue(db, "reduce", {"video_id": video_id}, f"reduce:{video_id}")
+
+
+def run_summarize(db: SummarizeDb, cache: ResponseCache, payload: dict):
+    from youtube_summarizer.ollama_summary import summarise
+
+    video_id, index = payload["video_id"], payload["chunk"]
+    content_hash = payload.get("hash")
+    chunk = db.get_chunk(video_id, index, content_hash)
+    if chunk is None and content_hash is not None:
+        logger.debug("Chunk %d of %s replaced since queued, skipped", index, video_id)
+        return
+    if chunk is None:
+        raise LookupError(f"No chunk {index} stored for {video_id}.")
+    result = summarise(chunk, title=db.get_video_title(video_id), cache=cache)
+    if db.set_chunk_summary(video_id, index, result["message"]["content"], content_hash):
+        _enqueue(db, "reduce", {"video_id": video_id}, f"reduce:{video_id}")
+
+
+def run_reduce(db: SummarizeDb, cache: ResponseCache, payload: dict):
+    from youtube_summarizer.ollama_summary import OLLAMA_MODEL, chunks_digest, reduce_levels
+    from youtube_summarizer.scheduler import default_concurrency
+
+    video_id = payload["video_id"]
+    hashes, summaries = db.get_chunk_summaries(video_id)
+    if not summaries or None in summaries:
+        raise LookupError(f"The chunks of {video_id} are not all summarised.")
+    # The summaries of a level are reduced in parallel.
+    levels = reduce_levels(
+        [summaries], title=db.get_video_title(video_id), concurrency=default_concurrency(),
+        cache=cache,
+    )
+    db.insert_summary(video_id, OLLAMA_MODEL, levels[-1][0], chunks_digest=chunks_digest(hashes))
+
+
+HANDLERS = {
+    "ingest": run_ingest,
+    "chunk": run_chunk,
+    "summarize": run_summarize,
+    "reduce": run_reduce,
+}
+
+
+class Heartbeat(threading.Thread):
+    """Renews the lease of a running job until stopped, on its own connection."""
+
+    def __init__(self, db_file: str, job_id: int, worker_id: str, lease_seconds: float):
+        super().__init__(daemon=True)
+        self.db_file = db_file
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+        self.lost = threading.Event()
+
+    def run(self):
+        db = SummarizeDb(self.db_file)
+        try:
+            while not self.stopped.wait(self.lease_seconds / 3):
+                if not db.heartbeat_job(self.job_id, self.worker_id, self.lease_seconds):
+                    self.lost.set()
+                    return
+        finally:
+            db.cn.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def work(db_file: str = None, kinds: list[str] = None, lease_seconds: float = None,
+         exit_when_idle: bool = False, poll_interval: float = 1.0, worker_id: str = None) -> int:
+    """
+    Claim and run jobs until interrupted.
+
+    A failed job is retried with backoff and dead lettered once it is out
+    of attempts. A job whose lease was lost, e.g. because the worker stalled
+    past it, is left to the worker that reclaimed it.
+
+    :param kinds: Only run these stages, all of them by default.
+    :param exit_when_idle: Return once no job is ready instead of polling.
+    :return: The number of jobs completed.
+    """
+    db = SummarizeDb(db_file)
+    db.create_job_queue()
+    cache = ResponseCache(db.db_file)
+    lease_seconds = lease_seconds or float(appConfig.get("JOB_LEASE_SECONDS"))
+    backoff_seconds = float(appConfig.get("JOB_BACKOFF_SECONDS"))
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    completed = 0
+    last_kind = None
+
+    while True:
+        job = db.claim_job(worker_id, lease_seconds, kinds, prefer_kind=last_kind)
+        if job is None:
+            if exit_when_idle:
+                return completed
+            time.sleep(poll_interval)
+            continue
+
+        last_kind = job["kind"]
+        heartbeat = Heartbeat(db.db_file, job["id"], worker_id, lease_seconds)
+        heartbeat.start()
+        start_time = time.monotonic()
+        try:
+            HANDLERS[job["kind"]](db, cache, job["payload"])
+        except KeyboardInterrupt:
+            heartbeat.stop()
+            db.release_job(job["id"], worker_id)
+            return completed
+        except Exception as e:
+            heartbeat.stop()
+            status = db.fail_job(job, worker_id, f"{type(e).__name__}: {e}", backoff_seconds)
+            logger.warning("Job %d %s %s failed, now %s: %s",
+                           job["id"], job["kind"], job["payload"], status, e)
+            print(f"Job {job['id']} {job['kind']} {job['payload']} failed ({status}): {e}")
+            continue
+        heartbeat.stop()
+        if heartbeat.lost.is_set() or not db.complete_job(job["id"], worker_id):
+            print(f"Job {job['id']} {job['kind']} lost its lease, result left to its new owner.")
+            continue
+        completed += 1
+        logger.debug("Job %d %s done in %.2f seconds",
+                     job["id"], job["kind"], time.monotonic() - start_time)
+        print(f"Job {job['id']} {job['kind']} {job['payload']} done.")
+
+
+def _worker_main(ollama_host: str, kinds, lease_seconds, exit_when_idle):
+    from youtube_summarizer.logging_config import configure_logging
+
+    if ollama_host:
+        # Set before the ollama client is created by the first import.
+        os.environ["OLLAMA_HOST"] = ollama_host
+    configure_logging()
+    try:
+        work(kinds=kinds, lease_seconds=lease_seconds, exit_when_idle=exit_when_idle)
+    except KeyboardInterrupt:
+        pass
+
+
+def run_workers(processes: int, ollama_hosts: list[str] = None, kinds: list[str] = None,
+                lease_seconds: float = None, exit_when_idle: bool = False):
+    """
+    Run ``processes`` workers, spread over the Ollama hosts round robin.
+    """
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    hosts = list(ollama_hosts or []) or [None]
+    workers = [
+        context.Process(
+            target=_worker_main,
+            args=(hosts[index % len(hosts)], kinds, lease_seconds, exit_when_idle),
+            name=f"worker-{index}",
+        )
+        for index in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.join()
@@ -1,83 +1,282 @@
-from datetime import datetime as date_time
-from logging import getLogger, Handler
-from sqlite3 import connect
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 
+from youtube_summarizer.config import appConfig
 
-class DatabaseHandler(Handler):
-    def __init__(self, db_file):
+LOGGER_NAME = "youtube_summarizer"
+
+_formatter = logging.Formatter()
+
+LOG_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS LOG(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    created_iso TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    level_name TEXT NOT NULL,
+    logger TEXT NOT NULL,
+    message TEXT,
+    module TEXT,
+    lineno INTEGER,
+    thread TEXT
+);
+CREATE INDEX IF NOT EXISTS LOG_CREATED ON LOG(created);
+"""
+
+
+class DatabaseHandler(logging.Handler):
+    """
+    Writes log records to the LOG table of a sqlite database.
+
+    Meant to run behind a ``BatchingQueueListener``: the connection is opened
+    by the listener thread on the first write and every batch of records is
+    a single transaction. ``created`` holds the epoch seconds and
+    ``created_iso`` the UTC ISO 8601 time, so both sort chronologically.
+    """
+
+    def __init__(self, db_file: str):
         super().__init__()
         self.db_file = db_file
-        self.db_file = connect(self.db_file)
-        self.db_file.execute(
-            "CREATE TABLE IF NOT EXISTS logs (date TEXT, "
-            "time TEXT, lvl INTEGER, lvl_name TEXT, msg TEXT, "
-            "logger TEXT, lineno INTEGER)"
-        )
+        self.cn = None
 
-    def emit(self, record):
-        """
-        Conditionally emit the specified logging record.
-
-        Emission depends on filters which may have been added to the handler.
-        Wrap the actual emission of the record with acquisition/release of
-        the I/O thread lock. Returns whether the filter passed the record for
-        emission.
-        """
-        self.db_file.execute(
-            'INSERT INTO logs VALUES (:1,:2,:3,:4, :5, :6, :7)', (
-                date_time.now().strftime('%A, the %d of %B, %Y'),
-                date_time.now().strftime('%I:%M %p'),
-                record.levelno,
-                record.levelname,
-                record.msg,
-                record.name,
-                record.lineno
-            )
+    def _connect(self) -> sqlite3.Connection:
+        if self.cn is None:
+            self.cn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.cn.execute("PRAGMA journal_mode=WAL")
+            self.cn.execute("PRAGMA synchronous=NORMAL")
+            self.cn.executescript(LOG_TABLE_SQL)
+        return self.cn
+
+    def _row(self, record: logging.LogRecord) -> tuple:
+        created_iso = datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+            timespec="milliseconds"
+        )
+        return (
+            record.created,
+            created_iso,
+            record.levelno,
+            record.levelname,
+            record.name,
+            self.format(record),
+            record.module,
+            record.lineno,
+            record.threadName,
         )
-        self.db_file.commit()
-        self.db_file.close()
 
+    def emit_batch(self, records: list[logging.LogRecord]):
+        """Insert the records in one transaction."""
+        try:
+            cn = self._connect()
+            with cn:
+                cn.executemany(
+                    """
+                    INSERT INTO LOG(
+                        created, created_iso, level, level_name, logger,
+                        message, module, lineno, thread
+                    ) VALUES (?,?,?,?,?,?,?,?,?)
+                    """,
+                    [self._row(record) for record in records],
+                )
+        except Exception:
+            self.handleError(records[-1])
 
-logger = getLogger(__name__)
-logger.setLevel(10)
+    def emit(self, record: logging.LogRecord):
+        self.emit_batch([record])
 
-logger_database_handler = DatabaseHandler("summarizer_log.db")
+    def close(self):
+        if self.cn is not None:
+            self.cn.close()
+            self.cn = None
+        super().close()
 
-logger.addHandler(logger_database_handler)
-logger_database_handler.setLevel(10)
 
-logger.log(msg="Something happened", level=10)
+class DroppingQueueHandler(QueueHandler):
+    """
+    A ``QueueHandler`` that never blocks the logging thread.
+
+    When the bounded queue is full the new record is dropped and counted in
+    ``dropped``, the listener reports the count with its next batch. A
+    ``listener`` given to the handler is started by the first record, so a
+    process that never logs never starts its thread.
+    """
 
-print(
-    connect("test.db")
-    .execute('SELECT name FROM sqlite_master WHERE type = "table"')
-    .fetchall()
-)
+    def __init__(self, log_queue: queue.Queue, listener: QueueListener = None):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.listener = listener
+        self._start_lock = threading.Lock()
 
+    def _start_listener(self):
+        with self._start_lock:
+            listener, self.listener = self.listener, None
+            if listener is not None:
+                listener.start()
+                atexit.register(listener.stop)
 
-def configure_logging(log_file="app.log", level=logging.DEBUG):
-    """Configures logging for the Flask application.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike the base class, the record is not copied: loggers that use this
+        # handler do not propagate, so no other handler sees the record.
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = _formatter.formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
 
-    Args:
-        log_file (str, optional): Path to the log file. Defaults to 'app.log'.
-        level (int, optional): Logging level. Defaults to logging.DEBUG.
+    def enqueue(self, record: logging.LogRecord):
+        if self.listener is not None:
+            self._start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingQueueListener(QueueListener):
     """
-    logger = logging.getLogger(__name__)
-    logger.setLevel(level)
+    A ``QueueListener`` that hands records to its handlers in batches.
 
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.DEBUG)
+    The thread waits for a record, then drains the queue until the batch is
+    full or ``flush_interval`` seconds have passed. Handlers with an
+    ``emit_batch`` method get the whole batch, the others one record at a
+    time.
+    """
 
-    # create formatter
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    def __init__(self, log_queue: queue.Queue, *handlers, batch_size: int = 500,
+                 flush_interval: float = 1.0, queue_handler: DroppingQueueHandler = None):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_handler = queue_handler
+        self._reported_drops = 0
+        self._lock = threading.Lock()
+
+    def _drop_record(self):
+        if self.queue_handler is None:
+            return None
+        dropped = self.queue_handler.dropped - self._reported_drops
+        if not dropped:
+            return None
+        self._reported_drops += dropped
+        return logging.makeLogRecord({
+            "name": LOGGER_NAME,
+            "levelno": logging.WARNING,
+            "levelname": "WARNING",
+            "msg": f"Dropped {dropped} log records, the log queue was full.",
+        })
+
+    def _flush(self, batch: list[logging.LogRecord]):
+        drop_record = self._drop_record()
+        if drop_record is not None:
+            batch.append(drop_record)
+        if not batch:
+            return
+        for handler in self.handlers:
+            records = [record for record in batch if record.levelno >= handler.level]
+            if not records:
+                continue
+            if hasattr(handler, "emit_batch"):
+                handler.emit_batch(records)
+            else:
+                for record in records:
+                    handler.handle(record)
+
+    def _monitor(self):
+        q = self.queue
+        stopping = False
+        while not stopping:
+            record = q.get()
+            if record is self._sentinel:
+                break
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = q.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if record is self._sentinel:
+                    stopping = True
+                    break
+                batch.append(record)
+            self._flush(batch)
+        self._flush([])
+
+    def enqueue_sentinel(self):
+        # The queue may be full, wait for the listener to make room.
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        with self._lock:
+            if self._thread is not None:
+                super().stop()
+                for handler in self.handlers:
+                    handler.close()
+            atexit.unregister(self.stop)
+
+
+_listener: BatchingQueueListener = None
+
+
+def configure_logging(level=None, db_file: str = None, log_file: str = None,
+                      queue_size: int = None, flush_interval: float = None):
+    """
+    Route the records of the package loggers through a bounded queue to a
+    background thread that writes them to the log database in batches.
+
+    Logging on the calling thread only formats the record and puts it on
+    the queue. The listener thread is started by the first record, and
+    stopped, with the last batch written, at exit or when logging is
+    configured again.
+
+    :param level: Level of the package logger, the LOG_LEVEL config by default.
+    :param db_file: The log database, the LOG_DATABASE_PATH config by default.
+    :param log_file: Also write the records to this text file.
+    :param queue_size: Records kept in the queue before new ones are dropped.
+    :param flush_interval: Longest time in seconds a record waits to be written.
+    :return: The listener, started once a record is logged.
+    """
+    global _listener
+    level = level or appConfig.get("LOG_LEVEL")
+    db_file = db_file or appConfig.get("LOG_DATABASE_PATH")
+    queue_size = queue_size or int(appConfig.get("LOG_QUEUE_SIZE"))
+    flush_interval = flush_interval or float(appConfig.get("LOG_FLUSH_SECONDS"))
+
+    handlers = [DatabaseHandler(db_file)]
+    if log_file:
+        file_handler = logging.FileHandler(log_file, delay=True)
+        file_handler.setFormatter(
+            logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        )
+        handlers.append(file_handler)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    listener = BatchingQueueListener(
+        log_queue, *handlers, flush_interval=flush_interval, queue_handler=queue_handler
     )
-    # add formatter to ch
-    ch.setFormatter(formatter)
+    queue_handler.listener = listener
 
-    # add to file
-    fh = logging.FileHandler(log_file)
-    fh.setLevel(level)
-    logger.addHandler(fh)
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        if isinstance(handler, DroppingQueueHandler):
+            logger.removeHandler(handler)
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
 
-    return logger
+    if _listener is not None:
+        # Writes what the previous handler queued before its thread ends.
+        _listener.stop()
+    _listener = listener
+    return listener
@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+import timeit
+import uuid
+from contextlib import nullcontext
+from dataclasses import dataclass
+
+from youtube_summarizer.config import appConfig
+from youtube_summarizer.ratelimit import ollama_controller
+from youtube_summarizer.scheduler import get_scheduler
+from youtube_summarizer.telemetry import record_llm_call
+from youtube_summarizer.tokenizer import get_tokenizer
+
+logger = logging.getLogger(__name__)
+
+# Text sent to a model once to compare its token count with tiktoken's.
+CALIBRATION_TEXT = """
+So today we're going to talk about how these models actually work, and I
+think the interesting question is not what they can do but why. Let's start
+with a simple example: you give the system a sentence, it splits it into
+pieces, and every piece becomes a vector of numbers. Then the network looks
+at all of those vectors at once and decides which ones matter for the next
+word. That's basically attention. Now, people often ask me, does it really
+understand language? Honestly, I don't know, and I'm not sure anyone does.
+What we can measure is the result: on most benchmarks it's right about 80 or
+90 percent of the time, and in 2023 that was a huge jump. Anyway, let's look
+at the data, because the numbers are kind of surprising, right?
+"""
+
+# Share of the context kept free for the chat template and counting error.
+SAFETY_MARGIN = 0.05
+
+# Largest share of the context kept for the response, so a small context
+# still leaves most of its room to the text.
+RESPONSE_SHARE = 0.25
+
+# Fewest tiktoken tokens of text a chunk must be able to hold.
+MIN_CHUNK_TOKENS = 256
+
+
+@dataclass
+class ModelProfile:
+    """
+    The context window of an Ollama model, and how many of its tokens a
+    tiktoken token is worth.
+
+    :param context_length: The ``num_ctx`` requested for the model: its own
+        context length, capped by the OLLAMA_MAX_CONTEXT config.
+    :param token_ratio: The model's ``prompt_eval_count`` per tiktoken
+        token, measured on a sample transcript.
+    """
+    model: str
+    context_length: int
+    token_ratio: float = 1.0
+    modified_at: str = None
+    calibrated: bool = False
+
+    def response_reserve(self, response_tokens: int) -> int:
+        """The model tokens kept for the response, at most ``RESPONSE_SHARE`` of the context."""
+        return min(response_tokens, int(self.context_length * RESPONSE_SHARE))
+
+    def chunk_budget(self, prompt_tokens: int, response_tokens: int) -> int:
+        """
+        The tiktoken tokens of text that fit in a call next to the prompt
+        and the response.
+
+        :param prompt_tokens: Tiktoken count of the prompt without the text.
+        :param response_tokens: Model tokens wanted for the response, see
+            ``response_reserve``.
+        :raises ValueError: The prompt and the response leave less than
+            ``MIN_CHUNK_TOKENS`` for the text.
+        """
+        reserve = self.response_reserve(response_tokens)
+        available = (self.context_length - reserve) * (1 - SAFETY_MARGIN)
+        budget = int(available / self.token_ratio) - prompt_tokens
+        if budget < MIN_CHUNK_TOKENS:
+            raise ValueError(
+                f"The {self.context_length} token context of {self.model} leaves {budget} "
+                f"tokens of text next to a {prompt_tokens} token prompt and a {reserve} "
+                f"token response, at least {MIN_CHUNK_TOKENS} are needed. "
+                "Use a model with a larger context or raise OLLAMA_MAX_CONTEXT."
+            )
+        return budget
+
+    def options(self) -> dict:
+        """The Ollama options that give the calls the context the chunks are sized for."""
+        return {"num_ctx": self.context_length}
+
+
+def read_model_info(model: str) -> tuple:
+    """
+    Read the context length and modification time of a local model.
+
+    :return: ``(context_length, modified_at)``, the context length is None
+        when the metadata has none.
+    """
+    import ollama
+
+    info = ollama_controller().call(ollama.show, model)
+    context_length = None
+    for key, value in (info.modelinfo or {}).items():
+        if key.endswith(".context_length"):
+            context_length = int(value)
+    modified_at = info.modified_at.isoformat() if info.modified_at else None
+    return context_length, modified_at
+
+
+def calibrate(model: str, context_length: int) -> float:
+    """
+    Send ``CALIBRATION_TEXT`` to the model for a single token of response
+    and compare its ``prompt_eval_count`` with the tiktoken count.
+
+    A random prefix keeps the server from reusing a cached prompt, which
+    would lower the count. The chat template is counted with the text, so
+    the ratio errs on the side of smaller chunks.
+
+    A thread that already holds a slot of the model calibrates within it,
+    waiting for a second one could wait forever.
+    """
+    import ollama
+
+    text = f"[{uuid.uuid4().hex[:8]}] {CALIBRATION_TEXT.strip()}"
+    scheduler = get_scheduler()
+    with nullcontext() if scheduler.holds(model) else scheduler.slot(model, "calibrate") as slot:
+        start_time = timeit.default_timer()
+        result = ollama_controller().call(
+            ollama.chat,
+            model=model,
+            messages=[{"role": "user", "content": text}],
+            stream=False,
+            options={"num_ctx": context_length, "num_predict": 1},
+            keep_alive=appConfig.get("OLLAMA_KEEP_ALIVE"),
+        )
+        if slot is not None:
+            slot.observe(result)
+    record_llm_call(result, model, "calibrate", len(text), timeit.default_timer() - start_time)
+    return result["prompt_eval_count"] / get_tokenizer().count(text)
+
+
+# Seconds a profile that could not be calibrated is used before trying again.
+FALLBACK_SECONDS = 60.0
+
+_profiles = {}
+_retry_at = {}
+_profiles_lock = threading.Lock()
+
+
+def get_model_profile(model: str, refresh: bool = False, db_file: str = None) -> ModelProfile:
+    """
+    The profile of a model, calibrated once and stored in the MODEL_PROFILE
+    table.
+
+    The stored profile is used as long as the model was not pulled again.
+    When Ollama cannot be reached the profile falls back to the
+    OLLAMA_MAX_CONTEXT config and a ratio of one, and is not stored. A
+    calibrated profile is kept for the rest of the process, a fallback one
+    for ``FALLBACK_SECONDS``, so a daemon started before Ollama picks up
+    the real profile.
+
+    The lookup runs outside the lock, the first lookups of a model at the
+    same time may each calibrate it.
+
+    :param refresh: Calibrate again even when a profile is stored.
+    """
+    with _profiles_lock:
+        profile = _profiles.get(model)
+        if not refresh and profile is not None and (
+            profile.calibrated or time.monotonic() < _retry_at.get(model, 0.0)
+        ):
+            return profile
+
+    profile = _load_model_profile(model, refresh, db_file)
+    with _profiles_lock:
+        _profiles[model] = profile
+        _retry_at[model] = time.monotonic() + FALLBACK_SECONDS
+    return profile
+
+
+def _load_model_profile(model: str, refresh: bool, db_file: str) -> ModelProfile:
+    from youtube_summarizer.database import SummarizeDb
+
+    max_context = int(appConfig.get("OLLAMA_MAX_CONTEXT"))
+    try:
+        context_length, modified_at = read_model_info(model)
+    except Exception as e:
+        logger.warning("Could not read the metadata of %s: %s", model, e)
+        print(f"Could not read the metadata of {model}, assuming {max_context} tokens.")
+        return ModelProfile(model, max_context)
+    context_length = min(context_length or max_context, max_context)
+
+    db = SummarizeDb(db_file)
+    try:
+        stored = db.get_model_profile(model)
+        if not refresh and stored is not None and stored[:2] == (modified_at, context_length):
+            return ModelProfile(model, context_length, stored[2], modified_at, True)
+        try:
+            token_ratio = calibrate(model, context_length)
+        except Exception as e:
+            logger.warning("Could not calibrate %s: %s", model, e)
+            print(f"Could not calibrate {model}, assuming a token ratio of one.")
+            return ModelProfile(model, context_length, modified_at=modified_at)
+        db.set_model_profile(model, modified_at, context_length, token_ratio)
+        logger.debug("Calibrated %s: %d tokens of context, ratio %.3f",
+                     model, context_length, token_ratio)
+        return ModelProfile(model, context_length, token_ratio, modified_at, True)
+    finally:
+        db.cn.close()
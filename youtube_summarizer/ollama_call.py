@@ -1,11 +1,40 @@
+import json
+import timeit
+
 import ollama
 
+from youtube_summarizer.config import appConfig
+from youtube_summarizer.database import ResponseCache
+from youtube_summarizer.ratelimit import ollama_controller
+from youtube_summarizer.scheduler import get_scheduler
+from youtube_summarizer.telemetry import record_llm_call
+
 
 def get_model(name: str = "llama3.1"):
     ollama.pull(name)
 
 
-def chat_with_model(model: str, messages):
-    response = ollama.chat(model, messages)
+def chat_with_model(model: str, messages, cache: ResponseCache = None):
+    if cache is not None:
+        key = ResponseCache.make_key(model, "chat", json.dumps(messages, sort_keys=True))
+        cached = cache.get(key)
+        if cached is not None:
+            print(cached)
+            return cached
+    with get_scheduler().slot(model, "chat") as slot:
+        start_time = timeit.default_timer()
+        response = ollama_controller().call(
+            ollama.chat, model, messages, keep_alive=appConfig.get("OLLAMA_KEEP_ALIVE")
+        )
+        slot.observe(response)
+    record_llm_call(
+        response,
+        model,
+        "chat",
+        sum(len(message.get("content", "")) for message in messages),
+        timeit.default_timer() - start_time,
+    )
     print(response)
+    if cache is not None:
+        cache.put(key, model, response)
     return response
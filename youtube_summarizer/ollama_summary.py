@@ -1,13 +1,28 @@
+import asyncio
+import hashlib
+import json
+import logging
 import os
 import sys
 import timeit
+from contextlib import nullcontext
+from functools import lru_cache
 
 import ollama
-import spacy
-import tiktoken
 
+from youtube_summarizer.chunker import TextChunks, chunk_sentences, chunk_sentences_stable
+from youtube_summarizer.config import appConfig
+from youtube_summarizer.database import ResponseCache, SummarizeDb
+from youtube_summarizer.model_profile import get_model_profile
+from youtube_summarizer.ratelimit import ollama_controller
+from youtube_summarizer.scheduler import get_scheduler
+from youtube_summarizer.streaming import stream_response
+from youtube_summarizer.telemetry import metrics_context, record_llm_call
+from youtube_summarizer.tokenizer import get_tokenizer
 from youtube_summarizer.utils import get_filename_without_file_extension
 
+logger = logging.getLogger(__name__)
+
 
 PROMPT = """
 <|im_start|>
@@ -29,6 +44,27 @@ The format of your response needs to be in markdown formatting. Use "- " for bul
 <|im_end|>
 """
 
+REDUCE_PROMPT = """
+<|im_start|>
+As a world class transcript summarizer, combine the partial summaries provided
+into a single bullet point summary of the whole transcript.
+
+First include a suitable title for the summary based on the title within the <TITLE> delimiter.
+Then merge the partial summaries within the <TEXT> delimiter into one bullet point summary,
+removing repeated points.
+
+The format of your response needs to be in markdown formatting. Use "- " for bullet points.
+
+######
+
+<TITLE>
+{title}
+
+<TEXT>
+{chunk}
+<|im_end|>
+"""
+
 OLLAMA_MODEL = "mistral-openorca"
 MODEL = "gpt-3.5-turbo-0125"
 ENCODING = "cl100k_base"
@@ -39,69 +75,450 @@ RESPONSE_TOKENS = 4000
 
 
 def count_tokens(text):
-    """Count tokens in a text string with tiktoken"""
-    enc = tiktoken.encoding_for_model(MODEL)
-    tokens = enc.encode(text)
-    token_count = len(tokens)
-    return token_count
+    """Count tokens in a text string with tiktoken, repeated strings are cached."""
+    return get_tokenizer(MODEL).count(text)
+
+
+def split_text(text_path=None, title=None, stable=False) -> TextChunks:
+    """
+    Split the transcript at ``text_path`` into chunks that fit the model.
+
+    The result unpacks as ``(chunks, total_token_count)``; the per chunk
+    token counts are available as ``token_counts``.
+    """
+    with open(text_path, "r") as f:
+        text = f.read()
+    return split_transcript_text(text, title=title, stable=stable)
 
 
-def split_text(text_path=None, title=None):
-    prompt_tokens = count_tokens(PROMPT.format(chunk="", title=title))
-    max_tokens = MODEL_MAX_TOKENS - prompt_tokens - RESPONSE_TOKENS
+@lru_cache(maxsize=None)
+def get_nlp():
+    """Load the spaCy sentence splitting pipeline once per process."""
+    import spacy
 
     nlp = spacy.load("en_core_web_sm")
     nlp.add_pipe("sentencizer")
+    return nlp
 
-    with open(text_path, "r") as f:
-        text = f.read()
 
-    doc = nlp(text, disable=["tagger", "parser", "ner", "lemmatizer", "textcat"])
-    chunks = []
-    current_chunk = []
+def keep_alive():
+    """How long Ollama keeps the model loaded after a request."""
+    return appConfig.get("OLLAMA_KEEP_ALIVE")
 
-    for sent in doc.sents:
-        sent_text = sent.text.strip()  # This is one sentence
-        sent_tokens = count_tokens(sent_text)
 
-        if sum([count_tokens(chunk) for chunk in current_chunk]) + sent_tokens > max_tokens:
-            # If adding sentence to the current chunk will exceed the token
-            # limit, add the current chunk to the list of chunks and start a new
-            # chunk with the current sentence
-            chunks.append(" ".join(current_chunk))
-            current_chunk = [sent_text]
-        else:
-            # If adding sentence to the current chunk will not exceed the token
-            # limit, add the sentence to the current chunk
-            current_chunk.append(sent_text)
+def split_transcript_text(text, title=None, max_tokens=None, stable=False) -> TextChunks:
+    """
+    Split a transcript into chunks of whole sentences.
 
-    if current_chunk:
-        chunks.append(" ".join(current_chunk))
+    :param max_tokens: Token budget of a chunk, by default what fits in the
+        context of OLLAMA_MODEL next to the prompt and the response, see
+        ``get_model_profile``.
+    :param stable: Cut at content defined boundaries, so a new version of
+        the transcript keeps the chunks its edits do not touch. The chunks
+        are smaller on average than when filled up to the budget.
+    """
+    if max_tokens is None:
+        prompt_tokens = count_tokens(PROMPT.format(chunk="", title=title))
+        max_tokens = get_model_profile(OLLAMA_MODEL).chunk_budget(prompt_tokens, RESPONSE_TOKENS)
 
-    total_token_count = sum([count_tokens(chunk) for chunk in chunks])
-    return chunks, total_token_count
+    doc = get_nlp()(text, disable=["tagger", "parser", "ner", "lemmatizer", "textcat"])
+    sentences = [sent.text.strip() for sent in doc.sents]
+    token_counts = get_tokenizer(MODEL).count_batch(sentences)
+    if stable:
+        return chunk_sentences_stable(sentences, max_tokens, token_counts)
+    return chunk_sentences(sentences, max_tokens, token_counts=token_counts)
 
 
-def summarise(chunk=None, title=None):
-    prompt = PROMPT.format(chunk=chunk, title=title)
+def _cache_key(prompt_template, chunk, title):
+    return ResponseCache.make_key(OLLAMA_MODEL, prompt_template, f"{title}\0{chunk}")
+
+
+def chunk_hash(chunk, title=None):
+    """
+    The content hash of a chunk: a stored summary with the same hash was
+    made from the same text, title, model and prompt.
+    """
+    return _cache_key(PROMPT, chunk, title)
+
+
+def chunks_digest(hashes):
+    """The digest of the content hashes of the chunks of a video, in order."""
+    return hashlib.sha256("\n".join(hash or "" for hash in hashes).encode()).hexdigest()
+
+
+def summarise(chunk=None, title=None, prompt_template=PROMPT, cache=None):
+    if cache is not None:
+        key = _cache_key(prompt_template, chunk, title)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug("Cache hit for a %d character chunk", len(chunk or ""))
+            return cached
+    prompt = prompt_template.format(chunk=chunk, title=title)
+    # Resolved before taking a slot, a first calibration needs one of its own.
+    options = get_model_profile(OLLAMA_MODEL).options()
     print("Prompt sent to Ollama.")
-    result = ollama.chat(
-        model=OLLAMA_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        stream=False,
-    )
+    with get_scheduler().slot(OLLAMA_MODEL, prompt_template) as slot:
+        start_time = timeit.default_timer()
+        result = ollama_controller().call(
+            ollama.chat,
+            model=OLLAMA_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            stream=False,
+            options=options,
+            keep_alive=keep_alive(),
+        )
+        elapsed = timeit.default_timer() - start_time
+        slot.observe(result)
+    logger.debug("Summarised a %d character chunk in %.2f seconds", len(chunk or ""), elapsed)
+    record_llm_call(result, OLLAMA_MODEL, "summarise", len(chunk or ""), elapsed)
+    if cache is not None:
+        cache.put(key, OLLAMA_MODEL, result)
     return result
 
 
-def summarise_all(chunks, title=None):
+def summarise_all(chunks, title=None, prompt_template=PROMPT, cache=None):
     summaries = []
     for chunk in chunks:
-        result = summarise(chunk, title=title)
+        result = summarise(chunk, title=title, prompt_template=prompt_template, cache=cache)
         summaries.append(result)
     return summaries
 
 
+def summarise_stream(chunk=None, title=None, prompt_template=PROMPT, out=None, cache=None):
+    """
+    Summarise one chunk, writing the tokens to stdout and ``out`` as they
+    arrive.
+
+    The returned response has the shape of a non streamed one plus the
+    ``ttft_seconds`` and ``tokens_per_second`` of the chunk.
+    """
+    outputs = [sys.stdout] + ([out] if out is not None else [])
+    if cache is not None:
+        key = _cache_key(prompt_template, chunk, title)
+        cached = cache.get(key)
+        if cached is not None:
+            for output in outputs:
+                output.write(cached["message"]["content"])
+            return cached
+    prompt = prompt_template.format(chunk=chunk, title=title)
+    options = get_model_profile(OLLAMA_MODEL).options()
+    with get_scheduler().slot(OLLAMA_MODEL, prompt_template) as slot:
+        start_time = timeit.default_timer()
+        parts = ollama_controller().call_stream(
+            ollama.chat,
+            model=OLLAMA_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            options=options,
+            keep_alive=keep_alive(),
+        )
+        result = stream_response(
+            parts, lambda part: part["message"]["content"], outputs, start_time
+        )
+        slot.observe(result)
+    result["message"] = {"role": "assistant", "content": result.pop("text")}
+    record_llm_call(
+        result, OLLAMA_MODEL, "summarise_stream", len(chunk or ""),
+        timeit.default_timer() - start_time,
+    )
+    print(
+        f"\nTime to first token: {result['ttft_seconds'] or 0:.2f}s, "
+        f"{result['tokens_per_second']:.1f} tokens/s"
+    )
+    if cache is not None:
+        cache.put(key, OLLAMA_MODEL, result)
+    return result
+
+
+async def summarise_async(
+    client, semaphore, chunk=None, title=None, timeout=None, prompt_template=PROMPT, cache=None
+):
+    """
+    Summarise one chunk with the async client once a worker slot is free.
+
+    The cache, the metrics and the model profile, whose first use may
+    calibrate the model, are read and written on threads, off the event
+    loop. ``timeout`` applies to each attempt of the request.
+
+    Returns the Ollama response and the seconds spent on the request.
+    """
+    if cache is not None:
+        key = _cache_key(prompt_template, chunk, title)
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached, 0.0
+    prompt = prompt_template.format(chunk=chunk, title=title)
+    profile = await asyncio.to_thread(get_model_profile, OLLAMA_MODEL)
+    options = profile.options()
+    async with semaphore, get_scheduler().async_slot(OLLAMA_MODEL, prompt_template) as slot:
+        start_time = timeit.default_timer()
+        result = await ollama_controller().acall(
+            client.chat,
+            model=OLLAMA_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            stream=False,
+            options=options,
+            keep_alive=keep_alive(),
+            attempt_timeout=timeout,
+        )
+        elapsed = timeit.default_timer() - start_time
+        slot.observe(result)
+    # Copies the context, so the metrics keep the video id of the run.
+    await asyncio.to_thread(
+        record_llm_call, result, OLLAMA_MODEL, "summarise_async", len(chunk or ""), elapsed
+    )
+    if cache is not None:
+        await asyncio.to_thread(cache.put, key, OLLAMA_MODEL, result)
+    return result, elapsed
+
+
+async def _summarise_all_async(
+    chunks, title=None, concurrency=4, timeout=None, prompt_template=PROMPT, cache=None
+):
+    client = ollama.AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+    start_time = timeit.default_timer()
+    results = await asyncio.gather(
+        *(
+            summarise_async(client, semaphore, chunk, title, timeout, prompt_template, cache)
+            for chunk in chunks
+        )
+    )
+    wall_time = timeit.default_timer() - start_time
+    chunk_time = sum(elapsed for _, elapsed in results)
+    print(
+        f"Summarised {len(chunks)} chunks with concurrency {concurrency}: "
+        f"{wall_time:.1f}s wall time, {chunk_time:.1f}s summed over chunks."
+    )
+    return [result for result, _ in results]
+
+
+def summarise_all_concurrent(
+    chunks, title=None, concurrency=4, timeout=None, prompt_template=PROMPT, cache=None
+):
+    """
+    Summarise the chunks with up to ``concurrency`` requests in flight.
+
+    The summaries are returned in the same order as the chunks. An attempt
+    that takes longer than ``timeout`` seconds is retried, a request out of
+    attempts raises ``asyncio.TimeoutError``.
+    """
+    return asyncio.run(
+        _summarise_all_async(
+            chunks,
+            title=title,
+            concurrency=concurrency,
+            timeout=timeout,
+            prompt_template=prompt_template,
+            cache=cache,
+        )
+    )
+
+
+def summarise_texts(
+    texts,
+    title=None,
+    concurrency=1,
+    timeout=None,
+    prompt_template=PROMPT,
+    cache=None,
+    stream=False,
+    out=None,
+):
+    """
+    Summarise the texts, in parallel when ``concurrency`` is above one.
+
+    With ``stream`` the texts are summarised one after the other and every
+    summary is streamed to stdout and ``out`` as it is generated.
+    """
+    if stream:
+        summaries = []
+        for text in texts:
+            summaries.append(
+                summarise_stream(text, title, prompt_template, out=out, cache=cache)
+            )
+            if out is not None:
+                out.write("\n")
+    elif concurrency > 1:
+        summaries = summarise_all_concurrent(
+            texts,
+            title=title,
+            concurrency=concurrency,
+            timeout=timeout,
+            prompt_template=prompt_template,
+            cache=cache,
+        )
+    else:
+        summaries = summarise_all(
+            texts, title=title, prompt_template=prompt_template, cache=cache
+        )
+    return [summary["message"]["content"] for summary in summaries]
+
+
+def group_summaries(summaries, title=None):
+    """
+    Group summaries into reduce inputs that fit the model's token budget.
+
+    Falls back to pairing neighbours when no two summaries fit together, so
+    every reduce level is guaranteed to shrink the list.
+    """
+    prompt_tokens = count_tokens(REDUCE_PROMPT.format(chunk="", title=title))
+    max_tokens = get_model_profile(OLLAMA_MODEL).chunk_budget(prompt_tokens, RESPONSE_TOKENS)
+    groups = chunk_sentences(summaries, max_tokens, count_tokens, separator="\n\n").chunks
+    if len(groups) >= len(summaries):
+        groups = [
+            "\n\n".join(summaries[i:i + 2]) for i in range(0, len(summaries), 2)
+        ]
+    return groups
+
+
+def _checkpoint_key(chunks, title):
+    digest = hashlib.sha256()
+    for text in [OLLAMA_MODEL, PROMPT, REDUCE_PROMPT, title or ""] + list(chunks):
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _load_checkpoint(checkpoint_path, key):
+    if not checkpoint_path or not os.path.isfile(checkpoint_path):
+        return []
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("key") != key:
+        return []
+    return checkpoint["levels"]
+
+
+def _save_checkpoint(checkpoint_path, key, levels):
+    if not checkpoint_path:
+        return
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "levels": levels}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def map_reduce(
+    chunks,
+    title=None,
+    concurrency=1,
+    timeout=None,
+    checkpoint_path=None,
+    cache=None,
+    stream=False,
+    out=None,
+):
+    """
+    Summarise the chunks, then reduce the summaries level by level until a
+    single summary remains.
+
+    Every level is written to ``checkpoint_path`` as soon as it completes.
+    A later run over the same chunks, model and prompts resumes from the
+    last completed level instead of starting over.
+
+    :return: The list of levels; the first holds the chunk summaries and
+        the last holds the final summary.
+
+    With ``stream`` every call is streamed to stdout and the chunk summaries
+    are also streamed to ``out``.
+    """
+    key = _checkpoint_key(chunks, title)
+    levels = _load_checkpoint(checkpoint_path, key)
+    if levels:
+        print(f"Resuming from checkpoint at level {len(levels) - 1}.")
+    else:
+        levels = [
+            summarise_texts(
+                chunks, title, concurrency, timeout, cache=cache, stream=stream, out=out
+            )
+        ]
+        _save_checkpoint(checkpoint_path, key, levels)
+
+    return reduce_levels(
+        levels,
+        title=title,
+        concurrency=concurrency,
+        timeout=timeout,
+        cache=cache,
+        stream=stream,
+        on_level=lambda levels: _save_checkpoint(checkpoint_path, key, levels),
+    )
+
+
+def reduce_levels(
+    levels, title=None, concurrency=1, timeout=None, cache=None, stream=False, on_level=None
+):
+    """
+    Reduce the summaries of the last level, level by level, until a single
+    summary remains. ``on_level`` is called with the levels after each one.
+
+    :return: The levels, the last one holds the final summary.
+    """
+    while len(levels[-1]) > 1:
+        groups = group_summaries(levels[-1], title=title)
+        print(f"Reducing {len(levels[-1])} summaries into {len(groups)} at level {len(levels)}.")
+        levels.append(
+            summarise_texts(
+                groups,
+                title,
+                concurrency,
+                timeout,
+                prompt_template=REDUCE_PROMPT,
+                cache=cache,
+                stream=stream,
+            )
+        )
+        if on_level is not None:
+            on_level(levels)
+
+    return levels
+
+
+def summarise_video_chunks(
+    db, video_id, chunks, token_counts, title=None, concurrency=1, timeout=None, cache=None
+):
+    """
+    Summarise the chunks of a stored video, then reduce them, reusing the
+    work of the previous run.
+
+    The chunks replace the stored ones; those with the content hash of a
+    stored chunk keep its summary and only the others are summarised. The
+    stored summary of the video is returned as is when it was made from
+    these same chunks.
+
+    :return: The final summary.
+    """
+    db.create_job_queue()
+    hashes = [chunk_hash(chunk, title) for chunk in chunks]
+    digest = chunks_digest(hashes)
+    missing = db.insert_chunks(video_id, chunks, token_counts, hashes)
+    print(f"{len(chunks) - len(missing)} of {len(chunks)} chunks unchanged.")
+    if not missing:
+        final_summary = db.get_summary(video_id, OLLAMA_MODEL, chunks_digest=digest)
+        if final_summary is not None:
+            return final_summary
+
+    if missing:
+        summaries = summarise_texts(
+            [chunks[index] for index in missing], title, concurrency, timeout, cache=cache
+        )
+        for index, summary in zip(missing, summaries):
+            db.set_chunk_summary(video_id, index, summary, content_hash=hashes[index])
+    levels = reduce_levels(
+        [db.get_chunk_summaries(video_id)[1]],
+        title=title,
+        concurrency=concurrency,
+        timeout=timeout,
+        cache=cache,
+    )
+    final_summary = levels[-1][0] if levels[-1] else ""
+    db.insert_summary(video_id, OLLAMA_MODEL, final_summary, chunks_digest=digest)
+    return final_summary
+
+
 def save_summaries(summaries, filename, output_dir="outputs/summaries"):
+    os.makedirs(output_dir, exist_ok=True)
     summary_path = os.path.join(output_dir, f"{filename}.txt")
     with open(summary_path, "w") as f:
         for summary in summaries:
@@ -111,20 +528,113 @@ def save_summaries(summaries, filename, output_dir="outputs/summaries"):
     return summary_path
 
 
-def summarise_transcript(text_path=None, title=None):
+def save_summary_text(text, filename, output_dir="outputs/summaries"):
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = os.path.join(output_dir, f"{filename}.txt")
+    with open(summary_path, "w") as f:
+        f.write(text)
+        f.write("\n")
+
+    return summary_path
+
+
+def summarise_transcript(
+    text_path=None,
+    title=None,
+    concurrency=1,
+    timeout=None,
+    reduce=True,
+    output_dir="outputs/summaries",
+    use_cache=True,
+    stream=False,
+    video_id=None,
+    db=None,
+    cache=None,
+):
+    """
+    Summarise the transcript at ``text_path`` into ``output_dir``.
+
+    With ``stream`` the summaries are written as they are generated: the
+    chunk summaries go to the summary file, or to ``<name>.chunks.txt`` when
+    they are reduced into a single summary. The LLM metrics of the run are
+    recorded against ``video_id``.
+
+    With ``video_id``, a reduced summary that is not streamed is made
+    incrementally: the chunks and their summaries are stored with the
+    video, and a later run over a new version of the transcript only
+    summarises the chunks that changed.
+
+    :param db: The ``SummarizeDb`` the incremental summary is stored with,
+        one opened for the run by default.
+    :param cache: The ``ResponseCache`` used when ``use_cache``, one opened
+        for the run by default. Connections opened for the run are closed.
+    :return: The path of the summary file.
+    """
+    owned = []
+    if use_cache and cache is None:
+        cache = ResponseCache()
+        owned.append(cache.cn)
+    if video_id is not None and reduce and not stream and db is None:
+        db = SummarizeDb()
+        owned.append(db.cn)
+    try:
+        with metrics_context(video_id=video_id):
+            return _summarise_transcript(
+                text_path, title, concurrency, timeout, reduce, output_dir,
+                cache if use_cache else None, stream, video_id, db,
+            )
+    finally:
+        for cn in owned:
+            cn.close()
+
+
+def _summarise_transcript(
+    text_path, title, concurrency, timeout, reduce, output_dir, cache, stream, video_id, db
+):
     start_time = timeit.default_timer()
-    chunks, total_token_count = split_text(text_path, title=title)
+    incremental = video_id is not None and reduce and not stream
+    result = split_text(text_path, title=title, stable=incremental)
+    chunks, total_token_count = result
     filename = get_filename_without_file_extension(text_path)
-    summaries = summarise_all(chunks, title=title)
-    summary_path = save_summaries(
-        summaries=summaries,
-        filename=filename,
-    )
+    os.makedirs(output_dir, exist_ok=True)
+    if incremental:
+        final_summary = summarise_video_chunks(
+            db, video_id, chunks, result.token_counts, title=title,
+            concurrency=concurrency, timeout=timeout, cache=cache,
+        )
+        summary_path = save_summary_text(final_summary, filename, output_dir)
+    elif reduce:
+        checkpoint_path = os.path.join(output_dir, f"{filename}.levels.json")
+        chunks_path = os.path.join(output_dir, f"{filename}.chunks.txt")
+        with open(chunks_path, "w") if stream else nullcontext() as out:
+            levels = map_reduce(
+                chunks,
+                title=title,
+                concurrency=concurrency,
+                timeout=timeout,
+                checkpoint_path=checkpoint_path,
+                cache=cache,
+                stream=stream,
+                out=out,
+            )
+        final_summary = levels[-1][0] if levels[-1] else ""
+        summary_path = save_summary_text(final_summary, filename, output_dir)
+    elif stream:
+        summary_path = os.path.join(output_dir, f"{filename}.txt")
+        with open(summary_path, "w") as out:
+            summarise_texts(chunks, title, cache=cache, stream=True, out=out)
+    else:
+        summaries = summarise_texts(chunks, title, concurrency, timeout, cache=cache)
+        summary_path = save_summary_text("\n".join(summaries), filename, output_dir)
     end_time = timeit.default_timer()
     elapsed_time = int(end_time - start_time)
     print(f"Total input token count: {total_token_count}")
     print(f"Time taken: {elapsed_time} seconds")
+    if cache is not None:
+        print(cache.report())
+    print(get_scheduler().report())
     print(f"Summary saved to:\n{summary_path}")
+    return summary_path
 
 
 if __name__ == "__main__":
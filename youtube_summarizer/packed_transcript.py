@@ -0,0 +1,94 @@
+import sys
+import zlib
+from array import array
+from collections.abc import Sequence
+
+
+def _floats(data) -> memoryview:
+    """A float32 view of little endian bytes, without copying them on little endian hosts."""
+    if sys.byteorder == "little":
+        return memoryview(data).cast("B").cast("f")
+    values = array("f", bytes(data))
+    values.byteswap()
+    return memoryview(values)
+
+
+def _offsets(data) -> memoryview:
+    if sys.byteorder == "little":
+        return memoryview(data).cast("B").cast("I")
+    values = array("I", bytes(data))
+    values.byteswap()
+    return memoryview(values)
+
+
+class PackedTranscript(Sequence):
+    """
+    A transcript stored as columns instead of one row per caption line.
+
+    The start times and durations are packed float32 arrays, and the caption
+    texts are joined with newlines into one zlib compressed blob with an
+    array of byte offsets, so the decompressed blob is also the full text of
+    the transcript. Indexing builds the ``{"text", "start", "duration"}``
+    dicts of ``VideoInfo.get_transcript()`` on demand, over views of the
+    stored blobs.
+    """
+
+    def __init__(self, starts, durations, offsets, text_blob: bytes):
+        self._starts = _floats(starts)
+        self._durations = _floats(durations)
+        self._offsets = _offsets(offsets)
+        self._text_blob = text_blob
+        self._text = None
+
+    @classmethod
+    def from_segments(cls, segments: list[dict]) -> "PackedTranscript":
+        starts = array("f", (float(segment["start"]) for segment in segments))
+        durations = array("f", (float(segment["duration"]) for segment in segments))
+        encoded = [segment["text"].encode("utf-8") for segment in segments]
+        offsets = array("I", [0])
+        for text in encoded:
+            offsets.append(offsets[-1] + len(text) + 1)
+        if sys.byteorder != "little":
+            for values in (starts, durations, offsets):
+                values.byteswap()
+        text_blob = zlib.compress(b"\n".join(encoded), 6)
+        return cls(starts.tobytes(), durations.tobytes(), offsets.tobytes(), text_blob)
+
+    def to_blobs(self) -> tuple[bytes, bytes, bytes, bytes]:
+        """The starts, durations, offsets and compressed text as stored."""
+        blobs = []
+        for view in (self._starts, self._durations, self._offsets):
+            if sys.byteorder == "little":
+                blobs.append(view.tobytes())
+            else:
+                values = array(view.format, view.tobytes())
+                values.byteswap()
+                blobs.append(values.tobytes())
+        return blobs[0], blobs[1], blobs[2], self._text_blob
+
+    @property
+    def text(self) -> str:
+        """The full transcript text, the caption lines joined with newlines."""
+        return self._text_bytes().decode("utf-8")
+
+    def _text_bytes(self) -> bytes:
+        if self._text is None:
+            self._text = zlib.decompress(self._text_blob)
+        return self._text
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("transcript index out of range")
+        text = self._text_bytes()[self._offsets[index]:self._offsets[index + 1] - 1]
+        return {
+            "text": text.decode("utf-8"),
+            "start": round(self._starts[index], 3),
+            "duration": round(self._durations[index], 3),
+        }
@@ -1,3 +1,5 @@
+TRANSCRIPTION = "transcription"
+
 PROMPTS = {
     TRANSCRIPTION: """ 
 Summarize the transcription below:
@@ -0,0 +1,473 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from youtube_summarizer.config import appConfig
+
+logger = logging.getLogger(__name__)
+
+# Answers that mean the host is overloaded or briefly unavailable.
+OVERLOAD_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Waits for an Ollama model shorter than this are not congestion.
+OLLAMA_QUEUE_SLACK_SECONDS = 0.25
+
+
+class CircuitOpenError(Exception):
+    """The calls to a host keep failing, so new calls fail fast for a while."""
+
+
+def _status_code(error: Exception):
+    status = getattr(error, "status_code", None)
+    if status is None and getattr(error, "response", None) is not None:
+        status = getattr(error.response, "status_code", None)
+    return status
+
+
+def is_overload(error: Exception) -> bool:
+    """
+    Whether a failed call is worth retrying: the host answered with
+    ``OVERLOAD_STATUSES`` or could not be reached in time.
+    """
+    status = _status_code(error)
+    if status is not None:
+        return status in OVERLOAD_STATUSES
+    import requests
+
+    transient = (ConnectionError, TimeoutError, requests.ConnectionError, requests.Timeout)
+    try:
+        import httpx
+
+        transient += (httpx.TransportError,)
+    except ImportError:
+        pass
+    if isinstance(error, transient):
+        return True
+    # Libraries that wrap the HTTP error in their own.
+    return error.__cause__ is not None and is_overload(error.__cause__)
+
+
+def retry_after(error: Exception) -> float:
+    """The seconds of a ``Retry-After`` header on the failed response, or None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Allows ``rate`` calls a second on average and bursts of up to ``burst``.
+    A rate of zero never waits.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Wait for a token."""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold back every call for ``seconds``, e.g. after a ``Retry-After``."""
+        if not self.rate:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+
+class AimdLimiter:
+    """
+    An adaptive limit on the calls in flight, additive increase and
+    multiplicative decrease.
+
+    Every call that comes back within ``tolerance`` times the baseline
+    latency raises the limit by ``1 / limit``, about one more call per
+    round of calls. A slower call means requests are queueing on the host
+    and cuts the limit by ``latency_backoff``; an overload error cuts it by
+    ``error_backoff``. Only calls started after the last cut can cut it
+    again, so one congested round counts once.
+
+    The baseline is the fastest call seen, drifting up slowly so a host
+    that became slower for good is not read as congested forever. A call is
+    only slow when it also exceeds the baseline by ``slack_seconds``, so a
+    near zero baseline, e.g. of a queueing delay, does not count jitter.
+
+    The latency judged is the call's own, or the ``delay`` passed to
+    ``release`` when the caller knows how long the call waited on the host:
+    the length of LLM calls varies too much to compare their latencies.
+    """
+
+    def __init__(self, initial: float = 4, min_limit: float = 1, max_limit: float = 64,
+                 tolerance: float = 2.0, latency_backoff: float = 0.9,
+                 error_backoff: float = 0.5, drift: float = 0.01, slack_seconds: float = 0.0):
+        self.slack_seconds = slack_seconds
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.latency_backoff = latency_backoff
+        self.error_backoff = error_backoff
+        self.drift = drift
+        self.baseline = None
+        self.in_flight = 0
+        self._last_cut = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> float:
+        """Wait until a call fits in the limit. :return: The start time to release with."""
+        with self._cond:
+            while self.in_flight >= max(1, int(self.limit)):
+                self._cond.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started: float, overload: bool = False, delay: float = None):
+        """
+        :param started: What ``acquire`` returned.
+        :param overload: The call failed with an overload error.
+        :param delay: Seconds the call waited on the host, judged instead of
+            its latency.
+        """
+        latency = time.monotonic() - started if delay is None else delay
+        with self._cond:
+            self.in_flight -= 1
+            if overload:
+                self._cut(started, self.error_backoff)
+            else:
+                if self.baseline is None or latency < self.baseline:
+                    self.baseline = latency
+                else:
+                    self.baseline *= 1 + self.drift
+                if latency > self.tolerance * self.baseline + self.slack_seconds:
+                    self._cut(started, self.latency_backoff)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def cancel(self):
+        """Give back the slot of a call that was abandoned, without judging it."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _cut(self, started: float, factor: float):
+        if started < self._last_cut:
+            return
+        self.limit = max(self.min_limit, self.limit * factor)
+        self._last_cut = time.monotonic()
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` overload failures in a row: calls then
+    fail with ``CircuitOpenError`` until ``reset_seconds`` have passed. The
+    next call is a probe, its success closes the circuit again and its
+    failure keeps it open for another ``reset_seconds``.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self._opened + self.reset_seconds - time.monotonic()
+            if remaining <= 0:
+                # Let a probe through, and another one if it does not come back in time.
+                self.state = "half_open"
+                self._opened = time.monotonic()
+                return
+            raise CircuitOpenError(
+                f"Circuit open after {self.failures} failures, retry in {max(0.0, remaining):.0f}s."
+            )
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("Circuit opened after %d failures", self.failures)
+                self.state = "open"
+                self._opened = time.monotonic()
+
+
+class HostController:
+    """
+    The client side limits of the calls to one host: a token bucket rate
+    limit, an adaptive concurrency limit, a circuit breaker and retries with
+    jittered exponential backoff.
+
+    Only overload failures, see ``is_overload``, are retried and counted by
+    the limiter and the breaker; other errors are raised at once.
+
+    :param delay_of: Reads from a result the seconds the call waited on the
+        host, e.g. ``ollama_queue_seconds``, for the limiter to judge instead
+        of the latency. A result it returns None for is not judged.
+    :param slack_seconds: See ``AimdLimiter``.
+    """
+
+    def __init__(self, host: str, rate: float = 0.0, burst: float = None,
+                 initial_concurrency: float = 4, max_concurrency: float = 64,
+                 attempts: int = 4, backoff_seconds: float = 0.5,
+                 failure_threshold: int = 5, reset_seconds: float = 30.0,
+                 delay_of=None, slack_seconds: float = 0.0):
+        self.host = host
+        self.attempts = attempts
+        self.backoff_seconds = backoff_seconds
+        self.delay_of = delay_of
+        self.bucket = TokenBucket(rate, burst)
+        self.limiter = AimdLimiter(initial_concurrency, max_limit=max_concurrency,
+                                   slack_seconds=slack_seconds)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+    def _admit(self) -> float:
+        self.breaker.allow()
+        self.bucket.acquire()
+        return self.limiter.acquire()
+
+    def _record_failure(self, started: float, error: Exception) -> bool:
+        """Record a failed attempt. :return: Whether it failed with an overload."""
+        overload = is_overload(error)
+        self.limiter.release(started, overload)
+        if overload:
+            self.failures += 1
+            self.breaker.record_failure()
+        else:
+            # The host answered, only the request was wrong.
+            self.breaker.record_success()
+        return overload
+
+    def _failed(self, started: float, error: Exception, attempt: int) -> float:
+        """Record a failed attempt. :return: The seconds to wait before retrying."""
+        if not self._record_failure(started, error):
+            raise error
+        wait = retry_after(error)
+        if wait:
+            self.bucket.pause(wait)
+        if attempt >= self.attempts:
+            raise error
+        self.retries += 1
+        delay = max(wait or 0.0, random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1)))
+        logger.debug("Attempt %d on %s failed, retrying in %.2fs: %s",
+                     attempt, self.host, delay, error)
+        return delay
+
+    def _succeeded(self, started: float, result):
+        self.calls += 1
+        if self.delay_of is None:
+            self.limiter.release(started)
+        else:
+            delay = self.delay_of(result)
+            if delay is None:
+                self.limiter.cancel()
+            else:
+                self.limiter.release(started, delay=delay)
+        self.breaker.record_success()
+
+    def call(self, function, *args, **kwargs):
+        """Call ``function`` within the limits of the host, retrying overload failures."""
+        for attempt in range(1, self.attempts + 1):
+            started = self._admit()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                time.sleep(self._failed(started, e, attempt))
+                continue
+            self._succeeded(started, result)
+            return result
+
+    def call_stream(self, function, *args, **kwargs):
+        """
+        Call ``function``, which returns an iterator of response parts, like
+        ``call``. Failures are retried until the first part arrives, the
+        parts after it are passed on as they come.
+
+        The call keeps its concurrency slot until the returned iterator is
+        exhausted or closed, and is judged on its last part.
+        """
+        for attempt in range(1, self.attempts + 1):
+            started = self._admit()
+            try:
+                parts = iter(function(*args, **kwargs))
+                first = next(parts, None)
+            except Exception as e:
+                time.sleep(self._failed(started, e, attempt))
+                continue
+            stream = self._hold(started, first, parts)
+            # Enter the generator, so closing it before the first part gives the slot back.
+            next(stream)
+            return stream
+
+    def _hold(self, started: float, first, parts):
+        """Pass on the parts of a streamed call, then release its slot."""
+        last = first
+        try:
+            yield
+            if first is not None:
+                yield first
+                for last in parts:
+                    yield last
+        except Exception as e:
+            self._record_failure(started, e)
+            raise
+        except BaseException:
+            # Closed early or interrupted, the slot is given back without judging the call.
+            self.limiter.cancel()
+            raise
+        finally:
+            close = getattr(parts, "close", None)
+            if close is not None:
+                close()
+        self._succeeded(started, last)
+
+    async def acall(self, function, *args, attempt_timeout: float = None, **kwargs):
+        """
+        Await ``function(*args, **kwargs)`` like ``call``, waiting for the
+        limits on a thread.
+
+        :param attempt_timeout: Seconds an attempt may take before it is
+            cancelled and retried like an overload, the backoff between the
+            attempts does not count.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self.attempts + 1):
+            admitted = loop.run_in_executor(None, self._admit)
+            try:
+                started = await asyncio.shield(admitted)
+            except asyncio.CancelledError:
+                # The waiting thread cannot be interrupted, release once admitted.
+                admitted.add_done_callback(
+                    lambda done: done.exception() is None and self.limiter.cancel()
+                )
+                raise
+            try:
+                result = await asyncio.wait_for(function(*args, **kwargs), attempt_timeout)
+            except asyncio.CancelledError:
+                self.limiter.cancel()
+                raise
+            except Exception as e:
+                await asyncio.sleep(self._failed(started, e, attempt))
+                continue
+            self._succeeded(started, result)
+            return result
+
+    def summary(self) -> dict:
+        return {
+            "host": self.host,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "baseline_seconds": self.limiter.baseline,
+            "rate_per_second": self.bucket.rate,
+            "circuit": self.breaker.state,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
+
+
+def ollama_queue_seconds(response) -> float:
+    """
+    The seconds an Ollama response waited for the model, loading included:
+    its total duration less the prompt evaluation and the generation. None
+    when the response does not report them, e.g. embeddings and streams.
+    """
+    get = getattr(response, "get", None)
+    if get is None:
+        return None
+    durations = [get(key) for key in ("total_duration", "prompt_eval_duration", "eval_duration")]
+    if None in durations:
+        return None
+    total, prompt_eval, generation = durations
+    return max(0.0, (total - prompt_eval - generation) / 1e9)
+
+
+def host_of(url: str) -> str:
+    """The ``host:port`` of a url, or of a bare ``host:port``."""
+    parts = urlsplit(url if "://" in url else f"http://{url}")
+    return parts.netloc or url
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(url: str, rate: float = 0.0, **options) -> HostController:
+    """
+    The process wide controller of the host of ``url``, created with
+    ``rate`` calls a second and the retry and breaker configs on first use.
+
+    :param options: Further ``HostController`` arguments, used on first use.
+    """
+    host = host_of(url)
+    with _controllers_lock:
+        controller = _controllers.get(host)
+        if controller is None:
+            controller = HostController(
+                host,
+                rate=rate,
+                max_concurrency=float(appConfig.get("ADAPTIVE_MAX_CONCURRENCY")),
+                attempts=int(appConfig.get("RETRY_ATTEMPTS")),
+                backoff_seconds=float(appConfig.get("RETRY_BACKOFF_SECONDS")),
+                failure_threshold=int(appConfig.get("CIRCUIT_FAILURES")),
+                reset_seconds=float(appConfig.get("CIRCUIT_RESET_SECONDS")),
+                **options,
+            )
+            _controllers[host] = controller
+        return controller
+
+
+def ollama_controller() -> HostController:
+    """
+    The controller of the Ollama host the ollama client talks to. It judges
+    congestion by how long the calls waited for the model, a call that
+    waited for another one to finish waits a whole generation.
+    """
+    host = os.environ.get("OLLAMA_HOST") or appConfig.get("OLLAMA_HOST")
+    return get_controller(
+        host, float(appConfig.get("OLLAMA_RATE_PER_SECOND")),
+        delay_of=ollama_queue_seconds, slack_seconds=OLLAMA_QUEUE_SLACK_SECONDS,
+    )
+
+
+def controller_summaries() -> list[dict]:
+    with _controllers_lock:
+        return [controller.summary() for controller in _controllers.values()]
@@ -0,0 +1,202 @@
+import asyncio
+import itertools
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+
+from youtube_summarizer.config import appConfig
+
+
+class Slot:
+    """A granted call. Pass the Ollama response to ``observe`` to record its model load time."""
+
+    def __init__(self, model: str, template: str, seq: int):
+        self.model = model
+        self.template = template
+        self.seq = seq
+        self.granted = False
+        self.load_seconds = None
+
+    def observe(self, response):
+        load_duration = response.get("load_duration") if response is not None else None
+        if load_duration is not None:
+            self.load_seconds = load_duration / 1e9
+
+
+class ModelScheduler:
+    """
+    Orders the Ollama calls of this process so models are swapped as little
+    as possible.
+
+    A call waits for a slot of its model. At most ``max_loaded_models``
+    models are active at a time, like ``OLLAMA_MAX_LOADED_MODELS`` on the
+    server, and each runs up to ``parallel`` calls, like
+    ``OLLAMA_NUM_PARALLEL``. An active model keeps the slots while it has
+    waiting calls, so its queue is drained before another model is loaded,
+    unless it has served ``max_drain`` calls in a row while other models
+    wait. Within a model, calls with the same prompt template as the last
+    one go first.
+
+    The loads are compared with what the same calls would have cost in
+    arrival order, with the server evicting the least recently used model.
+    """
+
+    def __init__(self, parallel: int = None, max_loaded_models: int = None, max_drain: int = 64):
+        self.parallel = parallel or int(appConfig.get("OLLAMA_NUM_PARALLEL"))
+        self.max_loaded_models = max_loaded_models or int(appConfig.get("OLLAMA_MAX_LOADED_MODELS"))
+        self.max_drain = max_drain
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting: list[Slot] = []
+        # model -> in flight calls, calls served since it was loaded, last template
+        self._active: OrderedDict[str, dict] = OrderedDict()
+        self._arrival_lru: OrderedDict[str, None] = OrderedDict()
+        self.calls = 0
+        self.loads = 0
+        self.arrival_loads = 0
+        self._load_seconds = []
+        self._held = threading.local()
+
+    def _arrive(self, model: str):
+        self.calls += 1
+        if model in self._arrival_lru:
+            self._arrival_lru.move_to_end(model)
+            return
+        self.arrival_loads += 1
+        self._arrival_lru[model] = None
+        if len(self._arrival_lru) > self.max_loaded_models:
+            self._arrival_lru.popitem(last=False)
+
+    def _others_waiting(self, model: str) -> bool:
+        """Whether calls of a model that is not loaded are waiting."""
+        return any(
+            slot.model != model and slot.model not in self._active for slot in self._waiting
+        )
+
+    def _must_yield(self, model: str, state: dict) -> bool:
+        return state["served"] >= self.max_drain and self._others_waiting(model)
+
+    def _schedule(self):
+        waiting_models = {slot.model for slot in self._waiting}
+        pending_models = [slot.model for slot in self._waiting if slot.model not in self._active]
+        # Unload idle models that are drained, or have had their turn, to make room.
+        for model in list(self._active):
+            if not pending_models or len(self._active) < self.max_loaded_models:
+                break
+            state = self._active[model]
+            if state["in_flight"] == 0 and (
+                model not in waiting_models or self._must_yield(model, state)
+            ):
+                del self._active[model]
+        # Load the model whose call has waited longest.
+        for model in pending_models:
+            if len(self._active) >= self.max_loaded_models:
+                break
+            if model not in self._active:
+                self._active[model] = {"in_flight": 0, "served": 0, "template": None}
+                self.loads += 1
+        # Grant the free slots of the active models.
+        for model, state in self._active.items():
+            while state["in_flight"] < self.parallel and not self._must_yield(model, state):
+                candidates = [slot for slot in self._waiting if slot.model == model]
+                if not candidates:
+                    break
+                slot = min(candidates, key=lambda s: (s.template != state["template"], s.seq))
+                self._waiting.remove(slot)
+                slot.granted = True
+                state.update(in_flight=state["in_flight"] + 1, served=state["served"] + 1,
+                             template=slot.template)
+        self._cond.notify_all()
+
+    def acquire(self, model: str, template: str = "") -> Slot:
+        """Wait for a slot of ``model``."""
+        with self._cond:
+            slot = Slot(model, template, next(self._seq))
+            self._arrive(model)
+            self._waiting.append(slot)
+            self._schedule()
+            while not slot.granted:
+                self._cond.wait()
+            return slot
+
+    def release(self, slot: Slot):
+        with self._cond:
+            state = self._active.get(slot.model)
+            if state is not None:
+                state["in_flight"] -= 1
+            if slot.load_seconds:
+                # Only the calls that actually waited for a model load report one.
+                self._load_seconds.append(slot.load_seconds)
+            self._schedule()
+
+    @contextmanager
+    def slot(self, model: str, template: str = ""):
+        slot = self.acquire(model, template)
+        held = getattr(self._held, "models", [])
+        self._held.models = held + [model]
+        try:
+            yield slot
+        finally:
+            self._held.models = held
+            self.release(slot)
+
+    def holds(self, model: str) -> bool:
+        """Whether the current thread is inside a ``slot`` of ``model``."""
+        return model in getattr(self._held, "models", ())
+
+    @asynccontextmanager
+    async def async_slot(self, model: str, template: str = ""):
+        future = asyncio.get_running_loop().run_in_executor(None, self.acquire, model, template)
+        try:
+            slot = await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The waiting thread cannot be interrupted, give the slot back once granted.
+            future.add_done_callback(
+                lambda done: done.exception() is None and self.release(done.result())
+            )
+            raise
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    def summary(self) -> dict:
+        with self._cond:
+            mean_load = (
+                sum(self._load_seconds) / len(self._load_seconds) if self._load_seconds else None
+            )
+            saved_loads = self.arrival_loads - self.loads
+            return {
+                "calls": self.calls,
+                "model_loads": self.loads,
+                "arrival_order_loads": self.arrival_loads,
+                "mean_load_seconds": mean_load,
+                "saved_load_seconds": saved_loads * mean_load if mean_load is not None else None,
+            }
+
+    def report(self) -> str:
+        summary = self.summary()
+        saved = summary["saved_load_seconds"]
+        saved_text = f"{saved:.1f}s of load time saved" if saved is not None else "load time unknown"
+        return (
+            f"Scheduler: {summary['calls']} calls, {summary['model_loads']} model loads "
+            f"instead of {summary['arrival_order_loads']} in arrival order, {saved_text}."
+        )
+
+
+def default_concurrency() -> int:
+    """
+    The OLLAMA_CONCURRENCY config: the calls a summary keeps in flight. With
+    ``auto``, as many as the scheduler runs for a model, OLLAMA_NUM_PARALLEL.
+    """
+    value = appConfig.get("OLLAMA_CONCURRENCY")
+    if value == "auto":
+        value = appConfig.get("OLLAMA_NUM_PARALLEL")
+    return int(value)
+
+
+@lru_cache(maxsize=None)
+def get_scheduler() -> ModelScheduler:
+    """The process wide scheduler of the Ollama calls."""
+    return ModelScheduler()
@@ -18,6 +18,7 @@ CREATE TABLE VIDEO_DATA(
 	thumbnail_url TEXT,
 	created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
+CREATE INDEX VIDEO_DATA_VIDEO_ID ON VIDEO_DATA(video_id);
 
 DROP TABLE IF EXISTS TRANSCRIPT;
 CREATE TABLE TRANSCRIPT(
@@ -28,6 +29,7 @@ CREATE TABLE TRANSCRIPT(
 	is_generated INTEGER NOT NULL DEFAULT 1,
 	created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
+CREATE INDEX TRANSCRIPT_VIDEO_ID ON TRANSCRIPT(video_id);
 
 DROP TABLE IF EXISTS TRANSCRIPT_TEXT;
 CREATE TABLE TRANSCRIPT_TEXT(
@@ -37,6 +39,25 @@ CREATE TABLE TRANSCRIPT_TEXT(
 	start_time REAL,
 	duration REAL
 );
+CREATE INDEX TRANSCRIPT_TEXT_VIDEO_ID ON TRANSCRIPT_TEXT(video_id);
+
+DROP TABLE IF EXISTS TRANSCRIPT_FTS;
+CREATE VIRTUAL TABLE TRANSCRIPT_FTS USING fts5(
+	text_data,
+	content='TRANSCRIPT_TEXT',
+	content_rowid='id',
+	tokenize='porter unicode61'
+);
+CREATE TRIGGER TRANSCRIPT_TEXT_AI AFTER INSERT ON TRANSCRIPT_TEXT BEGIN
+	INSERT INTO TRANSCRIPT_FTS(rowid, text_data) VALUES (new.id, new.text_data);
+END;
+CREATE TRIGGER TRANSCRIPT_TEXT_AD AFTER DELETE ON TRANSCRIPT_TEXT BEGIN
+	INSERT INTO TRANSCRIPT_FTS(TRANSCRIPT_FTS, rowid, text_data) VALUES ('delete', old.id, old.text_data);
+END;
+CREATE TRIGGER TRANSCRIPT_TEXT_AU AFTER UPDATE ON TRANSCRIPT_TEXT BEGIN
+	INSERT INTO TRANSCRIPT_FTS(TRANSCRIPT_FTS, rowid, text_data) VALUES ('delete', old.id, old.text_data);
+	INSERT INTO TRANSCRIPT_FTS(rowid, text_data) VALUES (new.id, new.text_data);
+END;
 
 DROP TABLE IF EXISTS TRANSCRIPT_FULL_TEXT;
 CREATE TABLE TRANSCRIPT_FULL_TEXT(
@@ -46,6 +67,7 @@ CREATE TABLE TRANSCRIPT_FULL_TEXT(
 	data TEXT,
 	created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
+CREATE INDEX TRANSCRIPT_FULL_TEXT_VIDEO_ID ON TRANSCRIPT_FULL_TEXT(video_id);
 
 DROP TABLE IF EXISTS CHAT_RESPONSE;
 CREATE TABLE CHAT_RESPONSE(
@@ -63,3 +85,103 @@ CREATE TABLE CHAT_RESPONSE(
 	eval_duration INTEGER, 
 	created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
+
+DROP TABLE IF EXISTS LLM_CACHE;
+CREATE TABLE LLM_CACHE(
+	cache_key TEXT PRIMARY KEY,
+	model TEXT NOT NULL,
+	response TEXT NOT NULL,
+	last_used REAL NOT NULL,
+	created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX LLM_CACHE_LAST_USED ON LLM_CACHE(last_used);
+
+DROP TABLE IF EXISTS TRANSCRIPT_PACKED;
+CREATE TABLE TRANSCRIPT_PACKED(
+	video_id TEXT PRIMARY KEY,
+	language TEXT,
+	line_count INTEGER NOT NULL,
+	starts BLOB NOT NULL,
+	durations BLOB NOT NULL,
+	offsets BLOB NOT NULL,
+	text_data BLOB NOT NULL,
+	created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+DROP TABLE IF EXISTS INGEST_PROGRESS;
+CREATE TABLE INGEST_PROGRESS(
+	video_id TEXT PRIMARY KEY,
+	status TEXT NOT NULL,
+	attempts INTEGER NOT NULL DEFAULT 0,
+	error TEXT,
+	updated TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+DROP TABLE IF EXISTS LLM_METRICS;
+CREATE TABLE LLM_METRICS(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+	model TEXT NOT NULL,
+	source TEXT NOT NULL,
+	video_id TEXT,
+	chunk_chars INTEGER,
+	total_duration INTEGER,
+	load_duration INTEGER,
+	prompt_eval_count INTEGER,
+	prompt_eval_duration INTEGER,
+	eval_count INTEGER,
+	eval_duration INTEGER,
+	ttft_seconds REAL,
+	wall_seconds REAL,
+	created REAL NOT NULL
+);
+CREATE INDEX LLM_METRICS_CREATED ON LLM_METRICS(created);
+
+DROP TABLE IF EXISTS JOB;
+CREATE TABLE JOB(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+	kind TEXT NOT NULL,
+	payload TEXT NOT NULL,
+	dedup_key TEXT,
+	status TEXT NOT NULL,
+	attempts INTEGER NOT NULL DEFAULT 0,
+	max_attempts INTEGER NOT NULL DEFAULT 5,
+	available_at REAL NOT NULL,
+	lease_owner TEXT,
+	lease_expires REAL,
+	last_error TEXT,
+	created REAL NOT NULL,
+	updated REAL NOT NULL
+);
+CREATE INDEX JOB_READY ON JOB(status, available_at);
+CREATE UNIQUE INDEX JOB_DEDUP ON JOB(dedup_key) WHERE status IN ('pending', 'running');
+
+DROP TABLE IF EXISTS CHUNK;
+CREATE TABLE CHUNK(
+	video_id TEXT NOT NULL,
+	chunk_index INTEGER NOT NULL,
+	text_data TEXT NOT NULL,
+	token_count INTEGER,
+	content_hash TEXT,
+	summary TEXT,
+	PRIMARY KEY (video_id, chunk_index)
+);
+
+DROP TABLE IF EXISTS VIDEO_SUMMARY;
+CREATE TABLE VIDEO_SUMMARY(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+	video_id TEXT NOT NULL,
+	model TEXT NOT NULL,
+	summary TEXT,
+	chunks_digest TEXT,
+	created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX VIDEO_SUMMARY_VIDEO_ID ON VIDEO_SUMMARY(video_id);
+
+DROP TABLE IF EXISTS MODEL_PROFILE;
+CREATE TABLE MODEL_PROFILE(
+	model TEXT PRIMARY KEY,
+	modified_at TEXT,
+	context_length INTEGER NOT NULL,
+	token_ratio REAL NOT NULL,
+	updated REAL NOT NULL
+);
@@ -0,0 +1,314 @@
+import contextlib
+import contextvars
+import http.client
+import io
+import json
+import logging
+import os
+import queue
+import sys
+import timeit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from youtube_summarizer.config import appConfig
+
+logger = logging.getLogger(__name__)
+
+
+class ServerError(Exception):
+    """The daemon answered a request with an error."""
+
+
+class DbPool:
+    """
+    A fixed set of ``SummarizeDb`` connections shared by the request threads.
+
+    A connection is used by one thread at a time, so they are opened with
+    ``check_same_thread=False``.
+    """
+
+    def __init__(self, size: int = 4, db_file: str = None):
+        from youtube_summarizer.database import SummarizeDb
+
+        self._connections = queue.Queue()
+        for _ in range(size):
+            self._connections.put(SummarizeDb(db_file, check_same_thread=False))
+
+    @contextlib.contextmanager
+    def connection(self):
+        db = self._connections.get()
+        try:
+            yield db
+        finally:
+            self._connections.put(db)
+
+
+class RequestOutput:
+    """
+    Stands in for ``sys.stdout`` in the daemon: what a request prints while
+    it ``capture``s goes to its own buffer, the rest to the real stdout. The
+    requests that print can then run side by side.
+
+    The buffer is a context variable, so the asyncio tasks of the request
+    and its ``asyncio.to_thread`` calls, which copy the context, print to it
+    too. Threads that do not copy it, like the workers of a
+    ``ThreadPoolExecutor`` or ``run_in_executor``, print to the real stdout.
+    """
+
+    def __init__(self, stdout):
+        self._stdout = stdout
+        self._buffer = contextvars.ContextVar("request_output", default=None)
+
+    def _target(self):
+        return self._buffer.get() or self._stdout
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stdout, name)
+
+    @contextlib.contextmanager
+    def capture(self):
+        buffer = io.StringIO()
+        token = self._buffer.set(buffer)
+        try:
+            yield buffer
+        finally:
+            self._buffer.reset(token)
+
+
+class SummarizerService:
+    """
+    The resources a CLI invocation would load on every run, kept warm: the
+    spaCy pipeline, the tokenizer, a database connection pool and the Ollama
+    model, loaded with the OLLAMA_KEEP_ALIVE config.
+
+    Each endpoint takes and returns a JSON object. The summarizer prints its
+    progress, what a request printed is returned as its ``output`` once
+    ``serve`` has installed the ``RequestOutput``.
+    """
+
+    def __init__(self, pool_size: int = 4):
+        self.pool = DbPool(pool_size)
+        self.output = RequestOutput(sys.stdout)
+        self.started = timeit.default_timer()
+
+    def warm_up(self, preload_model: bool = True):
+        from youtube_summarizer import ollama_summary
+        from youtube_summarizer.model_profile import get_model_profile
+        from youtube_summarizer.ratelimit import ollama_controller
+        from youtube_summarizer.tokenizer import get_tokenizer
+
+        start_time = timeit.default_timer()
+        get_tokenizer(ollama_summary.MODEL).encoding
+        ollama_summary.get_nlp()
+        if preload_model:
+            import ollama
+
+            try:
+                # A generate request without a prompt only loads the model, with
+                # the context size of the summaries so their first call reuses it.
+                profile = get_model_profile(ollama_summary.OLLAMA_MODEL)
+                ollama_controller().call(
+                    ollama.generate, model=ollama_summary.OLLAMA_MODEL,
+                    options=profile.options(), keep_alive=ollama_summary.keep_alive(),
+                )
+            except Exception as e:
+                print(f"Could not preload {ollama_summary.OLLAMA_MODEL}: {e}")
+        print(f"Warmed up in {timeit.default_timer() - start_time:.2f} seconds.")
+
+    def health(self, payload: dict) -> dict:
+        from youtube_summarizer.ratelimit import controller_summaries
+        from youtube_summarizer.scheduler import get_scheduler
+
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime_seconds": timeit.default_timer() - self.started,
+            "scheduler": get_scheduler().summary(),
+            "hosts": controller_summaries(),
+        }
+
+    def count(self, payload: dict) -> dict:
+        from youtube_summarizer import ollama_summary
+        from youtube_summarizer.tokenizer import get_tokenizer
+
+        counts = get_tokenizer(ollama_summary.MODEL).count_batch(payload["texts"])
+        return {"token_counts": counts.tolist()}
+
+    def split(self, payload: dict) -> dict:
+        from youtube_summarizer.ollama_summary import split_transcript_text
+
+        result = split_transcript_text(
+            payload["text"], title=payload.get("title"), max_tokens=payload.get("max_tokens")
+        )
+        return {"chunks": result.chunks, "token_counts": result.token_counts}
+
+    def summarize(self, payload: dict) -> dict:
+        from youtube_summarizer.database import ResponseCache
+        from youtube_summarizer.ollama_summary import summarise_transcript
+        from youtube_summarizer.scheduler import default_concurrency
+
+        video_id = payload.get("video_id")
+        use_cache = payload.get("use_cache", True)
+        # Only an incremental summary needs a connection for the whole run.
+        with self.pool.connection() if video_id else contextlib.nullcontext() as db:
+            cache = ResponseCache() if use_cache else None
+            try:
+                with self.output.capture() as output:
+                    summary_path = summarise_transcript(
+                        payload["path"],
+                        payload.get("title", ""),
+                        concurrency=payload.get("concurrency") or default_concurrency(),
+                        timeout=payload.get("timeout"),
+                        reduce=payload.get("reduce", True),
+                        output_dir=payload.get("output_dir", "outputs/summaries"),
+                        use_cache=use_cache,
+                        video_id=video_id,
+                        db=db,
+                        cache=cache,
+                    )
+            finally:
+                if cache is not None:
+                    cache.close()
+        return {"summary_path": summary_path, "output": output.getvalue()}
+
+    def search(self, payload: dict) -> dict:
+        with self.pool.connection() as db:
+            matches = db.search(
+                payload["query"],
+                limit=payload.get("limit", 20),
+                video_id=payload.get("video_id"),
+                raw=payload.get("raw", False),
+            )
+        return {"matches": matches}
+
+    def chat(self, payload: dict) -> dict:
+        from youtube_summarizer.database import ResponseCache
+        from youtube_summarizer.ollama_call import chat_with_model
+
+        cache = ResponseCache() if payload.get("use_cache", True) else None
+        try:
+            with self.output.capture() as output:
+                response = chat_with_model(payload["model"], payload["messages"], cache=cache)
+                with self.pool.connection() as db:
+                    db.insert_chat_response(response)
+        finally:
+            if cache is not None:
+                cache.close()
+        if hasattr(response, "model_dump"):
+            response = response.model_dump()
+        return {
+            "response": response,
+            "output": output.getvalue(),
+            "cache_report": cache.report() if cache is not None else None,
+        }
+
+
+ROUTES = {
+    ("GET", "/health"): "health",
+    ("POST", "/count"): "count",
+    ("POST", "/split"): "split",
+    ("POST", "/summarize"): "summarize",
+    ("POST", "/search"): "search",
+    ("POST", "/chat"): "chat",
+}
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    service: SummarizerService = None
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, method: str):
+        endpoint = ROUTES.get((method, self.path))
+        if endpoint is None:
+            self._send_json(404, {"error": f"No endpoint {method} {self.path}"})
+            return
+        start_time = timeit.default_timer()
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length)) if length else {}
+            result = getattr(self.service, endpoint)(payload)
+        except Exception as e:
+            logger.exception("Request %s %s failed", method, self.path)
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        self._send_json(200, result)
+        logger.debug("%s %s in %.1f ms", method, self.path,
+                     (timeit.default_timer() - start_time) * 1000)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def serve(host: str = None, port: int = None, preload_model: bool = True, pool_size: int = 4):
+    """
+    Run the summarizer daemon on ``host``:``port`` until interrupted.
+
+    Only bind it to a local address: the endpoints read and write files on
+    behalf of the caller.
+    """
+    host = host or appConfig.get("SERVER_HOST")
+    port = port or int(appConfig.get("SERVER_PORT"))
+    service = SummarizerService(pool_size)
+    service.warm_up(preload_model=preload_model)
+    handler = type("Handler", (RequestHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"Serving on http://{host}:{port}, keep alive {appConfig.get('OLLAMA_KEEP_ALIVE')}.")
+    stdout, sys.stdout = sys.stdout, service.output
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout = stdout
+        server.server_close()
+
+
+def call_server(path: str, payload: dict = None, timeout: float = None):
+    """
+    Call an endpoint of the daemon.
+
+    :param path: The endpoint, e.g. ``/summarize``; a GET without ``payload``.
+    :param timeout: Seconds to wait for the answer, no limit by default.
+    :return: The decoded answer, or None when no daemon is listening.
+    """
+    cn = http.client.HTTPConnection(
+        appConfig.get("SERVER_HOST"), int(appConfig.get("SERVER_PORT")), timeout=1.0
+    )
+    try:
+        try:
+            cn.connect()
+        except OSError:
+            return None
+        cn.sock.settimeout(timeout)
+        if payload is None:
+            cn.request("GET", path)
+        else:
+            body = json.dumps(payload).encode("utf-8")
+            cn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+        response = cn.getresponse()
+        result = json.loads(response.read())
+    finally:
+        cn.close()
+    if response.status != 200:
+        raise ServerError(result.get("error", f"HTTP {response.status}"))
+    return result
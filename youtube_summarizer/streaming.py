@@ -0,0 +1,41 @@
+import timeit
+from typing import Callable, Iterable, TextIO
+
+
+def stream_response(parts: Iterable[dict], get_text: Callable[[dict], str],
+                    outputs: list[TextIO], start_time: float) -> dict:
+    """
+    Write a streamed Ollama response to ``outputs`` as the tokens arrive.
+
+    :param parts: The streamed response parts, the last one has ``done`` set.
+    :param get_text: Returns the text of a part.
+    :param outputs: Files the text is written and flushed to.
+    :param start_time: When the request was sent, by ``timeit.default_timer``.
+        The first part has usually arrived by the time ``parts`` is iterated.
+    :return: The final part with the full ``text``, the time to first token
+        in seconds and the generation rate in tokens per second.
+    """
+    first_token_time = None
+    texts = []
+    final = {}
+    for part in parts:
+        text = get_text(part)
+        if text:
+            if first_token_time is None:
+                first_token_time = timeit.default_timer() - start_time
+            texts.append(text)
+            for out in outputs:
+                out.write(text)
+                out.flush()
+        if part.get("done"):
+            final = dict(part)
+    elapsed = timeit.default_timer() - start_time
+
+    eval_count = final.get("eval_count") or len(texts)
+    eval_duration = (final.get("eval_duration") or 0) / 1e9
+    if not eval_duration:
+        eval_duration = elapsed - (first_token_time or 0)
+    final["text"] = "".join(texts)
+    final["ttft_seconds"] = first_token_time
+    final["tokens_per_second"] = eval_count / eval_duration if eval_duration else 0.0
+    return final
@@ -1,22 +1,84 @@
+import json
+import sys
+import timeit
+
 import requests
 
-from youtube_summarizer.prompts import PROMPTS
+from youtube_summarizer.config import appConfig
+from youtube_summarizer.prompts import PROMPTS, TRANSCRIPTION
+from youtube_summarizer.ratelimit import OVERLOAD_STATUSES, get_controller
+from youtube_summarizer.scheduler import get_scheduler
+from youtube_summarizer.streaming import stream_response
+from youtube_summarizer.telemetry import record_llm_call
 
 api_base_url = "http://127.0.0.1:5000"
 
 
-def summarize(model: str, transcription_text: str):
+def _post(url: str, payload: dict, stream: bool = False) -> requests.Response:
+    timeout = (float(appConfig.get("HTTP_CONNECT_TIMEOUT")), float(appConfig.get("OLLAMA_TIMEOUT")))
+    response = requests.post(url, json=payload, stream=stream, timeout=timeout)
+    if response.status_code in OVERLOAD_STATUSES:
+        # Raised to be retried, the other answers are returned as before.
+        response.raise_for_status()
+    return response
+
+
+def _stream(url: str, payload: dict):
+    """The parts of a streamed response, the connection is closed with the generator."""
+    with _post(url, payload, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                yield json.loads(line)
+
+
+def summarize(model: str, transcription_text: str, stream: bool = False, out=None):
+    """
+    Summarize the transcription with the Ollama generate endpoint.
+
+    With ``stream`` the tokens are written to stdout and to ``out`` as they
+    arrive and the final part is returned with the full text and the time
+    to first token and tokens per second; otherwise the response is returned.
+    The request is retried while the server is overloaded, for a streamed
+    one only until the answer starts.
+    """
     check_ollama_running()
-    prompt_text = PROMPTS.replace("{transcription_text}", transcription_text)
+    prompt_text = PROMPTS[TRANSCRIPTION].replace("{transcription_text}", transcription_text)
     payload = {
         "model": model,
         "prompt": prompt_text,
-        "stream": False,
-        "keep_alive": "5s",
+        "stream": stream,
+        "keep_alive": appConfig.get("OLLAMA_KEEP_ALIVE"),
     }
     request_url = api_base_url + "/api/generate"
-    response = requests.post(request_url, json=payload)
-    return response
+    controller = get_controller(api_base_url, float(appConfig.get("OLLAMA_RATE_PER_SECOND")))
+    if not stream:
+        with get_scheduler().slot(model, TRANSCRIPTION) as slot:
+            start_time = timeit.default_timer()
+            response = controller.call(_post, request_url, payload)
+            if response.ok:
+                slot.observe(response.json())
+                record_llm_call(
+                    response.json(), model, "generate", len(transcription_text),
+                    timeit.default_timer() - start_time,
+                )
+        return response
+
+    with get_scheduler().slot(model, TRANSCRIPTION) as slot:
+        start_time = timeit.default_timer()
+        parts = controller.call_stream(_stream, request_url, payload)
+        outputs = [sys.stdout] + ([out] if out is not None else [])
+        result = stream_response(parts, lambda part: part.get("response", ""), outputs, start_time)
+        slot.observe(result)
+    record_llm_call(
+        result, model, "generate_stream", len(transcription_text),
+        timeit.default_timer() - start_time,
+    )
+    print(
+        f"\nTime to first token: {result['ttft_seconds'] or 0:.2f}s, "
+        f"{result['tokens_per_second']:.1f} tokens/s"
+    )
+    return result
 
 
 def check_ollama_running():
@@ -0,0 +1,159 @@
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from sqlite3 import connect
+
+from youtube_summarizer.config import appConfig
+from youtube_summarizer.database import configure_connection
+
+METRIC_FIELDS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+
+_video_id = ContextVar("video_id", default=None)
+
+
+@contextmanager
+def metrics_context(video_id: str = None):
+    """Tag the LLM calls made inside the block with ``video_id``."""
+    token = _video_id.set(video_id)
+    try:
+        yield
+    finally:
+        _video_id.reset(token)
+
+
+def percentile(values: list, fraction: float):
+    """Nearest rank percentile of already sorted values."""
+    if not values:
+        return None
+    rank = math.ceil(fraction * len(values))
+    return values[max(0, min(len(values), rank) - 1)]
+
+
+class LlmMetrics:
+    """
+    Records the timings Ollama reports for every LLM call in the
+    LLM_METRICS table and summarises them per model.
+    """
+
+    def __init__(self, db_file: str = None):
+        self.db_file = db_file or appConfig.get("DATABASE_PATH")
+        self.cn = configure_connection(connect(self.db_file, check_same_thread=False))
+        self._lock = threading.Lock()
+        self.cn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS LLM_METRICS(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                model TEXT NOT NULL,
+                source TEXT NOT NULL,
+                video_id TEXT,
+                chunk_chars INTEGER,
+                total_duration INTEGER,
+                load_duration INTEGER,
+                prompt_eval_count INTEGER,
+                prompt_eval_duration INTEGER,
+                eval_count INTEGER,
+                eval_duration INTEGER,
+                ttft_seconds REAL,
+                wall_seconds REAL,
+                created REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS LLM_METRICS_CREATED ON LLM_METRICS(created);
+            """
+        )
+
+    def record(self, response, model: str, source: str, chunk_chars: int = None,
+               wall_seconds: float = None) -> None:
+        """
+        Store the metrics of an Ollama chat or generate response.
+
+        :param response: The response, or the final part of a streamed one.
+        :param model: The model that served the call.
+        :param source: The function that made the call.
+        :param chunk_chars: Size in characters of the text sent to the model.
+        :param wall_seconds: Client side duration of the call.
+        """
+        data = (
+            model,
+            source,
+            _video_id.get(),
+            chunk_chars,
+            *(response.get(field) for field in METRIC_FIELDS),
+            response.get("ttft_seconds"),
+            wall_seconds,
+            time.time(),
+        )
+        sql = """
+            INSERT INTO LLM_METRICS(
+                model, source, video_id, chunk_chars, total_duration, load_duration,
+                prompt_eval_count, prompt_eval_duration, eval_count, eval_duration,
+                ttft_seconds, wall_seconds, created
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        with self._lock:
+            try:
+                with self.cn:
+                    self.cn.execute(sql, data)
+            except sqlite3.Error as e:
+                print(f"An error occurred: {e}")
+
+    def stats(self, since: float, model: str = None) -> list[dict]:
+        """
+        Latency, throughput and model load statistics per model for the
+        calls made after the ``since`` epoch time.
+        """
+        sql = """
+            SELECT model, total_duration, load_duration, eval_count, eval_duration
+            FROM LLM_METRICS WHERE created >= ? AND total_duration IS NOT NULL
+        """
+        params = [since]
+        if model:
+            sql += " AND model = ?"
+            params.append(model)
+        per_model = {}
+        with self._lock:
+            for row in self.cn.execute(sql, params):
+                per_model.setdefault(row[0], []).append(row[1:])
+
+        results = []
+        for name, rows in sorted(per_model.items()):
+            latencies = sorted(total / 1e9 for total, _, _, _ in rows)
+            total_time = sum(total for total, _, _, _ in rows)
+            load_time = sum(load or 0 for _, load, _, _ in rows)
+            eval_tokens = sum(count or 0 for _, _, count, _ in rows)
+            eval_time = sum(duration or 0 for _, _, _, duration in rows) / 1e9
+            results.append({
+                "model": name,
+                "calls": len(rows),
+                "p50_seconds": percentile(latencies, 0.50),
+                "p95_seconds": percentile(latencies, 0.95),
+                "p99_seconds": percentile(latencies, 0.99),
+                "tokens_per_second": eval_tokens / eval_time if eval_time else 0.0,
+                "mean_load_seconds": load_time / len(rows) / 1e9,
+                "load_share": load_time / total_time if total_time else 0.0,
+            })
+        return results
+
+
+@lru_cache(maxsize=None)
+def get_metrics() -> LlmMetrics:
+    """The process wide metrics recorder."""
+    return LlmMetrics()
+
+
+def record_llm_call(response, model: str, source: str, chunk_chars: int = None,
+                    wall_seconds: float = None) -> None:
+    """Record an LLM call with the process wide recorder unless disabled in the config."""
+    if appConfig.get("LLM_METRICS").lower() in ("false", "0", "no"):
+        return
+    get_metrics().record(response, model, source, chunk_chars, wall_seconds)
@@ -0,0 +1,78 @@
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Sequence
+
+from youtube_summarizer.config import appConfig
+
+DEFAULT_MODEL = "gpt-3.5-turbo-0125"
+
+# Every thread of count_batch gets at least this many texts, below that the
+# hand off costs more than the encoding.
+MIN_BATCH = 256
+
+
+class Tokenizer:
+    """
+    Token counting for one tiktoken encoding.
+
+    The encoding is loaded once, on first use. ``count`` keeps an LRU of
+    recent strings, so repeated texts like the prompt templates are encoded
+    once; ``count_batch`` counts a list of texts in one slice per thread (the
+    encoder releases the GIL) and returns the counts as an ``array``.
+
+    Special token markers in the text are counted as plain text.
+    """
+
+    def __init__(self, model: str = DEFAULT_MODEL, threads: int = None, cache_size: int = 1024):
+        self.model = model
+        self.threads = threads or int(appConfig.get("TOKENIZER_THREADS"))
+        self._encoding = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    @property
+    def encoding(self):
+        if self._encoding is None:
+            with self._lock:
+                if self._encoding is None:
+                    import tiktoken
+
+                    self._encoding = tiktoken.encoding_for_model(self.model)
+        return self._encoding
+
+    def _count(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+    def _count_slice(self, texts: Sequence[str]) -> array:
+        encode = self.encoding.encode_ordinary
+        return array("I", (len(encode(text)) for text in texts))
+
+    def count_batch(self, texts: Sequence[str]) -> array:
+        """
+        Count the tokens of many texts, bypassing the LRU.
+
+        :param texts: The texts to count.
+        :return: The token count of every text, in order, as an ``array('I')``.
+        """
+        threads = min(self.threads, len(texts) // MIN_BATCH)
+        if threads <= 1:
+            return self._count_slice(texts)
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix="tokenizer")
+        size = -(-len(texts) // threads)
+        counts = array("I")
+        slices = (texts[start:start + size] for start in range(0, len(texts), size))
+        for part in self._pool.map(self._count_slice, slices):
+            counts.extend(part)
+        return counts
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model: str = DEFAULT_MODEL) -> Tokenizer:
+    """The shared tokenizer of a model."""
+    return Tokenizer(model)
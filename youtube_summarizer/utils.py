@@ -27,3 +27,13 @@ def get_default_data_dir(app_name: str) -> Path:
     return data_path
 
 
+def get_filename_without_file_extension(path: str) -> str:
+    """
+    Get the file name of a path without its directory or extension.
+
+    :param path: Path of the file
+    :type path: str
+    :return: File name without the extension
+    :rtype: str
+    """
+    return Path(path).stem
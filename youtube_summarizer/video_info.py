@@ -1,10 +1,11 @@
-from urllib.request import urlopen
 from rich import print
-from bs4 import BeautifulSoup
 import re
+import json
+import html as html_lib
 from dataclasses import dataclass, asdict
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api.formatters import TextFormatter
+
+from youtube_summarizer.fetch_cache import get_fetch_cache
+from youtube_summarizer.http_client import get_http_client
 
 
 @dataclass
@@ -30,21 +31,51 @@ class VideoInfoData:
 
 class VideoInfo:
 
-    def __init__(self, video_id: str):
+    def __init__(self, video_id: str, extractor: str = "soup", client=None, cache=None):
+        """
+        :param video_id: The id of the YouTube video.
+        :param extractor: ``soup`` builds a full BeautifulSoup tree, ``fast``
+            parses the watch page with the targeted extractor, whose like
+            counts differ for some labels, see ``_find_like_counts``.
+        :param client: The ``HttpClient`` used for the fetches, the shared
+            client by default.
+        :param cache: The ``FetchCache`` of the raw fetches, the shared
+            cache by default.
+        """
         self.video_id = video_id
+        self.extractor = extractor
+        self.client = client or get_http_client()
+        self.cache = cache or get_fetch_cache()
         self.video_data = self._scrape_video_data()
         self.transcript = None
         self.text = None
 
+    @classmethod
+    def from_html(cls, video_id: str, html, extractor: str = "soup", client=None,
+                  cache=None) -> "VideoInfo":
+        """Build the video info from an already fetched watch page."""
+        info = cls.__new__(cls)
+        info.video_id = video_id
+        info.extractor = extractor
+        info.client = client
+        info.cache = cache
+        info.video_data = info._parse_video_data(html)
+        info.transcript = None
+        info.text = None
+        return info
+
     def get_transcript(self):
         if self.transcript == None:
-            self.transcript = YouTubeTranscriptApi.get_transcript(self.video_id)
+            client = self.client or get_http_client()
+            cache = self.cache or get_fetch_cache()
+            self.transcript = cache.get_or_fetch_json(
+                "transcript", self.video_id, lambda: client.fetch_transcript(self.video_id)
+            )
         return self.transcript
 
     def get_text(self):
         if self.text == None:
-            formatter = TextFormatter()
-            self.text = formatter.format_transcript(self.get_transcript())
+            self.text = "\n".join(line["text"] for line in self.get_transcript())
         return self.text
 
 
@@ -54,12 +85,30 @@ class VideoInfo:
     def _remove_comma(self, s: str) -> str:
         return "".join(s.split(","))
 
+    @property
+    def url(self) -> str:
+        return f"https://www.youtube.com/watch?v={self.video_id}"
+
     def _scrape_video_data(self) -> VideoInfoData:
         """Scrap video information into a data object"""
-        url = f"https://www.youtube.com/watch?v={self.video_id}"
-        html = urlopen(url).read()
+        html = self.cache.get_or_fetch(
+            "html", self.video_id, lambda: self.client.watch_page(self.video_id)
+        )
+        return self._parse_video_data(html)
+
+    def _parse_video_data(self, html) -> VideoInfoData:
+        if self.extractor == "fast":
+            video = parse_watch_page(html, self.video_id, self.url)
+        else:
+            video = self._parse_with_soup(html)
+        print(asdict(video))  # Print the video data as a dictionary
+        return video
+
+    def _parse_with_soup(self, html) -> VideoInfoData:
+        from bs4 import BeautifulSoup
+
         soup = BeautifulSoup(html, "lxml")
-        video = VideoInfoData(id=self.video_id, url=url)
+        video = VideoInfoData(id=self.video_id, url=self.url)
 
         item_props = soup.find(id="watch7-content")
         if not item_props or len(item_props.contents) <= 1:
@@ -67,8 +116,6 @@ class VideoInfo:
 
         self._extract_basic_info(item_props, video)
         self._extract_likes_dislikes(soup, video)
-
-        print(asdict(video))  # Print the video data as a dictionary
         return video
 
     def _extract_basic_info(self, item_props, video: VideoInfoData) -> None:
@@ -126,3 +173,158 @@ class VideoInfo:
 
 class MissingIdError(ValueError):
     pass
+
+
+VOID_TAGS = {"meta", "link", "br", "img", "input", "hr"}
+# The attributes of a tag, a quoted value may hold a ``>``.
+ATTRS = r"""(?:"[^"]*"|'[^']*'|[^'">])*"""
+TAG_RE = re.compile(rf"<(/?)([a-zA-Z][\w-]*)({ATTRS})>")
+ATTR_RE = re.compile(r"""([\w-]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s'">]+)))?""")
+WATCH_CONTENT_RE = re.compile(rf"""<div\b{ATTRS}?\bid=["']watch7-content["']{ATTRS}>""")
+INITIAL_DATA_RE = re.compile(r"ytInitialData\"?\]?\s*=\s*")
+DIGITS_RE = re.compile(r"\d[\d,.]*")
+ABBREVIATED_RE = re.compile(r"\d[\d,.]*\s?[KMB]\b")
+
+ITEM_PROPS = {
+    "name": ("title", str),
+    "duration": ("duration", str),
+    "datePublished": ("upload_date", str),
+    "genre": ("genre", str),
+    "paid": ("is_paid", "bool"),
+    "unlisted": ("is_unlisted", "bool"),
+    "isFamilyFriendly": ("is_family_friendly", "bool"),
+    "interactionCount": ("views", int),
+    "channelId": ("channel_id", str),
+    "description": ("description", str),
+    "playerType": ("player_type", str),
+    "regionsAllowed": ("regions_allowed", str),
+}
+
+
+def parse_watch_page(html, video_id: str, url: str = "") -> VideoInfoData:
+    """
+    Extract the video information from a watch page without building a DOM.
+
+    The ``watch7-content`` microdata is read with a single anchored tag scan
+    and the ``ytInitialData`` JSON is decoded once, in place, to find the
+    like and dislike counts. Fills the same ``VideoInfoData`` as the
+    BeautifulSoup based parser, but for the like counts of some labels, see
+    ``_find_like_counts``.
+    """
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+    video = VideoInfoData(id=video_id, url=url)
+
+    item_props = _scan_item_props(html)
+    if not item_props:
+        raise MissingIdError(f"Video with the ID {video_id} does not exist")
+    for key, attrs in item_props:
+        if key == "thumbnailUrl":
+            video.thumbnail_url = attrs.get("href", "")
+        elif key in ITEM_PROPS:
+            field_name, convert = ITEM_PROPS[key]
+            value = attrs.get("content", "")
+            if convert == "bool":
+                value = value.lower() not in ["false", "0"]
+            else:
+                value = convert(value)
+            setattr(video, field_name, value)
+
+    initial_data = _load_initial_data(html)
+    if initial_data is not None:
+        video.likes, video.dislikes = _find_like_counts(initial_data)
+    return video
+
+
+def _scan_item_props(html: str) -> list[tuple[str, dict]]:
+    """Collect the itemprop tags that are direct children of watch7-content."""
+    start = WATCH_CONTENT_RE.search(html)
+    if start is None:
+        return []
+    item_props = []
+    depth = 0
+    for match in TAG_RE.finditer(html, start.end()):
+        closing, tag = match.group(1), match.group(2).lower()
+        if closing:
+            depth -= 1
+            if depth < 0:
+                break
+            continue
+        raw_attrs = match.group(3)
+        if depth == 0 and "itemprop" in raw_attrs:
+            attrs = {
+                key: html_lib.unescape(double or single or bare)
+                for key, double, single, bare in ATTR_RE.findall(raw_attrs)
+            }
+            if "itemprop" in attrs:
+                item_props.append((attrs["itemprop"], attrs))
+        if tag not in VOID_TAGS and not raw_attrs.rstrip().endswith("/"):
+            depth += 1
+    return item_props
+
+
+def _load_initial_data(html: str):
+    match = INITIAL_DATA_RE.search(html)
+    if match is None:
+        return None
+    try:
+        data, _ = json.JSONDecoder().raw_decode(html, match.end())
+        return data
+    except ValueError as e:
+        print(f"Error parsing ytInitialData: {e}")
+        return None
+
+
+def _label_count(label: str) -> int:
+    """The exact count in a button label, 0 for none or a rounded one like ``1.2K``."""
+    if ABBREVIATED_RE.search(label or ""):
+        return 0
+    match = DIGITS_RE.search(label or "")
+    if match is None:
+        return 0
+    try:
+        return int(match.group(0).replace(",", "").replace(".", ""))
+    except ValueError:
+        return 0
+
+
+def _find_like_counts(data) -> tuple[int, int]:
+    """
+    Walk ytInitialData once and read the like and dislike button labels.
+
+    The soup parser's ``_extract_stat`` finds the counts with a regex over
+    the raw script instead. Both read the same counts from the
+    ``toggleButtonRenderer`` layout with labels like ``12,345 likes``, the
+    like button first. Where they differ, this one reads a count that
+    ``_extract_stat`` reports as 0:
+
+    - the dislike button comes first, the regex then matches the LIKE
+      inside DISLIKE;
+    - the label has words before the number, e.g. ``like this video along
+      with 12,345 other people``;
+    - the thousands are separated by dots, e.g. ``12.345``.
+
+    Both give 0 for a rounded count like ``1.2K`` and for buttons without
+    a count, such as the dislike button since YouTube hid those counts.
+    tests/test_video_info.py compares them on the pages saved under
+    tests/fixtures/watch_pages.
+    """
+    counts = {}
+    stack = [data]
+    while stack and len(counts) < 2:
+        node = stack.pop()
+        if isinstance(node, dict):
+            icon = node.get("defaultIcon")
+            if isinstance(icon, dict) and icon.get("iconType") in ("LIKE", "DISLIKE"):
+                label = (
+                    node.get("defaultText", {})
+                    .get("accessibility", {})
+                    .get("accessibilityData", {})
+                    .get("label", "")
+                )
+                counts.setdefault(icon["iconType"], _label_count(label))
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return counts.get("LIKE", 0), counts.get("DISLIKE", 0)
+